@@ -10,15 +10,30 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app.services import sharding
+
+    sharding.configure_binds(app)
     db.init_app(app)
 
-    from app.middleware import api_key_middleware
+    from app import profiling
+    from app.api_keys import ApiKeyRegistry
+    from app.compression import compress_response
+    from app.health import HealthMonitor
+    from app.middleware import api_key_middleware, release_api_key
     from app.routes import api_bp, register_health_routes
 
+    app.extensions["api_keys"] = ApiKeyRegistry.from_config(app.config)
     app.before_request(api_key_middleware)
+    app.teardown_request(release_api_key)
+    profiling.init_app(app)
+    app.after_request(compress_response)
     app.register_blueprint(api_bp, url_prefix="/api")
 
     # Register health routes directly on app (no auth required)
+    app.extensions["health"] = HealthMonitor(app)
+    if not app.testing:
+        # Test apps share their in-memory database connection with the test
+        app.before_request(app.extensions["health"].ensure_started)
     register_health_routes(app)
 
     @app.route("/")
@@ -30,8 +45,26 @@ def create_app(config_class=Config):
                 "endpoints": {
                     "blotter": "/api/blotter?date=YYYY-MM-DD",
                     "positions": "/api/positions?date=YYYY-MM-DD",
+                    "account_positions": (
+                        "/api/accounts/<account_id>/positions?date=YYYY-MM-DD"
+                    ),
+                    "account_alarms": "/api/accounts/<account_id>/alarms?date=YYYY-MM-DD",
+                    "ticker_exposure": "/api/tickers/<ticker>/exposure?date=YYYY-MM-DD",
+                    "position_history": (
+                        "/api/positions/history?account_id=ID"
+                        "&start_date=YYYY-MM-DD&end_date=YYYY-MM-DD"
+                    ),
                     "alarms": "/api/alarms?date=YYYY-MM-DD",
+                    "positions_range": (
+                        "/api/positions/range?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD"
+                    ),
+                    "alarms_range": (
+                        "/api/alarms/range?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD"
+                    ),
+                    "batch": "POST /api/batch",
                     "health": "/health",
+                    "liveness": "/health/live",
+                    "readiness": "/health/ready",
                     "metrics": "/metrics",
                 },
             }
@@ -39,5 +72,6 @@ def create_app(config_class=Config):
 
     with app.app_context():
         db.create_all()
+        sharding.create_tables()
 
     return app
@@ -0,0 +1,143 @@
+"""API keys with per-key rate limits and concurrent-request caps.
+
+Keys come from API_KEY (named "default") and API_KEYS, which holds inline
+JSON or a path to a JSON file listing keys with optional limits:
+
+    [{"name": "reporting", "key": "...", "rate_per_second": 5, "burst": 10,
+      "max_concurrent": 2}]
+
+Limits not given per key fall back to API_RATE_LIMIT_PER_SECOND,
+API_RATE_LIMIT_BURST and API_MAX_CONCURRENT_REQUESTS (0 = unlimited).
+A request costs one token; /api/batch charges one more per further
+sub-query, and the key's later requests wait until that is paid back.
+Presented keys are looked up by their SHA-256 digest, so matching takes
+the same time whichever key is closest. State is per process: each worker
+enforces its own share of a key's limits.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from app.config import load_json_setting
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(key):
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; one token per request"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """0 if a token was taken, else seconds until one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def spend(self, count):
+        """Take `count` tokens unconditionally, going below zero if need be"""
+        self._refill()
+        self.tokens -= count
+
+
+class ApiKey:
+    def __init__(self, name, key, rate_per_second=0, burst=0, max_concurrent=0):
+        self.name = name
+        self.digest = _digest(key)
+        self.bucket = (
+            TokenBucket(rate_per_second, burst or rate_per_second)
+            if rate_per_second > 0
+            else None
+        )
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.concurrency_limited = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Admit one request: (True, None) or (False, retry_after_seconds)"""
+        with self._lock:
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                self.concurrency_limited += 1
+                return False, 1
+            if self.bucket is not None:
+                wait = self.bucket.take()
+                if wait:
+                    self.rate_limited += 1
+                    return False, max(1, math.ceil(wait))
+            self.in_flight += 1
+            self.requests += 1
+            return True, None
+
+    def charge(self, count):
+        """Charge `count` more tokens to an admitted request's rate limit"""
+        if self.bucket is None or count <= 0:
+            return
+        with self._lock:
+            self.bucket.spend(count)
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def usage(self):
+        return {
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "concurrency_limited": self.concurrency_limited,
+            "in_flight": self.in_flight,
+        }
+
+
+class ApiKeyRegistry:
+    def __init__(self, keys=()):
+        self._keys = {}
+        for api_key in keys:
+            self._keys[api_key.digest] = api_key
+
+    @classmethod
+    def from_config(cls, config):
+        defaults = {
+            "rate_per_second": float(config.get("API_RATE_LIMIT_PER_SECOND") or 0),
+            "burst": int(config.get("API_RATE_LIMIT_BURST") or 0),
+            "max_concurrent": int(config.get("API_MAX_CONCURRENT_REQUESTS") or 0),
+        }
+        keys = []
+        if config.get("API_KEY"):
+            keys.append(ApiKey("default", config["API_KEY"], **defaults))
+        try:
+            for entry in load_json_setting(config.get("API_KEYS")):
+                keys.append(ApiKey(**{**defaults, **entry}))
+        except (ValueError, TypeError) as e:
+            logger.error(f"Ignoring invalid API_KEYS: {str(e)}")
+        return cls(keys)
+
+    def lookup(self, key):
+        """The ApiKey for a presented key, or None"""
+        if not key:
+            return None
+        return self._keys.get(_digest(key))
+
+    def usage(self):
+        """Per-key usage counters, keyed by key name"""
+        return {api_key.name: api_key.usage() for api_key in self._keys.values()}
@@ -0,0 +1,213 @@
+"""Response compression negotiated from Accept-Encoding.
+
+Large JSON bodies are compressed with zstd, brotli (when the optional
+`brotli` package is installed) or gzip, whichever the client prefers.
+Streamed responses are compressed chunk by chunk as they are sent.
+
+A compressed body is tagged with its own strong ETag (the identity ETag plus
+"+<encoding>") and kept in a small in-process LRU cache keyed by URL, ETag
+and encoding. Since the ETag changes with the data version, a cached body is
+never stale, and a hot date is compressed once rather than on every request.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+
+from app.config import Config
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+class _ZstdCompressor:
+    def __init__(self, level):
+        import zstandard
+
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level):
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def _brotli_available():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# In server preference order, for clients that rate several encodings equally
+_COMPRESSORS = OrderedDict(
+    [("zstd", _ZstdCompressor), ("br", _BrotliCompressor), ("gzip", _GzipCompressor)]
+)
+if not _brotli_available():
+    del _COMPRESSORS["br"]
+
+
+def negotiate_encoding():
+    """Best encoding the client accepts, or None for an identity response"""
+    if Config.RESPONSE_COMPRESSION_LEVEL <= 0:
+        return None
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in _COMPRESSORS:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    """Compress a whole body in one call"""
+    compressor = _COMPRESSORS[encoding](Config.RESPONSE_COMPRESSION_LEVEL)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_stream(chunks, encoding):
+    compressor = _COMPRESSORS[encoding](Config.RESPONSE_COMPRESSION_LEVEL)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def strip_encoding(etag):
+    """Identity ETag of a (possibly compressed) representation's ETag"""
+    base, _, encoding = etag.rpartition("+")
+    return base if base and encoding in _COMPRESSORS else etag
+
+
+def _cache_key(etag, encoding):
+    return request.full_path, etag, encoding
+
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+        return entry
+
+
+def _cache_put(key, entry):
+    global _cache_bytes
+    limit = Config.RESPONSE_COMPRESSION_CACHE_BYTES
+    size = len(entry[0])
+    if size > limit // 4:
+        return
+    with _cache_lock:
+        if key in _cache:
+            return
+        _cache[key] = entry
+        _cache_bytes += size
+        while _cache_bytes > limit:
+            _, (body, _) = _cache.popitem(last=False)
+            _cache_bytes -= len(body)
+
+
+def clear_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def cached_response(etag):
+    """Pre-compressed response for the current request and identity ETag.
+
+    Returns None on a miss, or when the client takes no encoding we cache.
+    """
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return None
+    entry = _cache_get(_cache_key(etag, encoding))
+    if entry is None:
+        return None
+
+    body, mimetype = entry
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(f"{etag}+{encoding}")
+    return response
+
+
+def compress_response(response):
+    """after_request hook: compress the body if it is worth it and accepted"""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or not (response.mimetype or "").startswith(_COMPRESSIBLE_TYPES)
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if request.method == "HEAD":
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < Config.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        response.set_data(compress(body, encoding))
+
+        etag, weak = response.get_etag()
+        if etag and not weak and Config.RESPONSE_COMPRESSION_CACHE_BYTES > 0:
+            _cache_put(
+                _cache_key(etag, encoding), (response.get_data(), response.mimetype)
+            )
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}+{encoding}", weak)
+    return response
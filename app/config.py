@@ -1,3 +1,4 @@
+import json
 import os
 
 from dotenv import load_dotenv
@@ -5,6 +6,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def load_json_setting(value):
+    """A setting holding either inline JSON or a path to a JSON file"""
+    if not value:
+        return []
+    if os.path.isfile(value):
+        with open(value, encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def load_choice_setting(name, choices):
+    """An environment setting limited to `choices`, the first being the default;
+    an unknown value fails at startup instead of silently meaning the default"""
+    value = (os.environ.get(name) or choices[0]).strip().lower()
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}, not {value!r}")
+    return value
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "dev-secret-key-change-in-production"
     SQLALCHEMY_DATABASE_URI = (
@@ -13,9 +33,32 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Sharded storage: comma-separated database URLs. Trades are spread over
+    # them by a hash of account_id (see app/services/sharding.py); everything
+    # else stays on the primary database above. Empty = one database.
+    SHARD_DATABASE_URLS = [
+        url.strip()
+        for url in (os.environ.get("SHARD_DATABASE_URLS") or "").split(",")
+        if url.strip()
+    ]
+    # Long-running ingestion daemons keep pooled connections for hours;
+    # check them before use so a dropped RDS connection is replaced quietly.
+    SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": True}
+
     # API Security
     API_KEY = os.environ.get("API_KEY") or "dev-api-key-change-in-production"
 
+    # Additional API keys with optional per-key limits (inline JSON or a path
+    # to a JSON file, see app/api_keys.py), and the default limits for every
+    # key: token-bucket requests per second and burst, and concurrent
+    # requests in flight per worker process. 0 (the default) disables a limit.
+    API_KEYS = os.environ.get("API_KEYS") or ""
+    API_RATE_LIMIT_PER_SECOND = float(os.environ.get("API_RATE_LIMIT_PER_SECOND") or 0)
+    API_RATE_LIMIT_BURST = int(os.environ.get("API_RATE_LIMIT_BURST") or 0)
+    API_MAX_CONCURRENT_REQUESTS = int(
+        os.environ.get("API_MAX_CONCURRENT_REQUESTS") or 0
+    )
+
     # SFTP Configuration
     SFTP_HOST = os.environ.get("SFTP_HOST") or "localhost"
     SFTP_PORT = int(os.environ.get("SFTP_PORT") or 22)
@@ -29,3 +72,133 @@ class Config:
         os.environ.get("ALERT_SERVICE_URL") or "http://localhost:5001/alerts"
     )
     ALERT_API_KEY = os.environ.get("ALERT_API_KEY") or "alert-api-key"
+
+    # Data Quality
+    DATA_QUALITY_MAX_BAD_ROWS = int(os.environ.get("DATA_QUALITY_MAX_BAD_ROWS") or 1000)
+    DATA_QUALITY_SAMPLE_SIZE = int(os.environ.get("DATA_QUALITY_SAMPLE_SIZE") or 5)
+
+    # Local disk watcher (scripts/ingest_files.py INGEST_MODE=watch)
+    INGEST_WATCH_POLL_INTERVAL = float(
+        os.environ.get("INGEST_WATCH_POLL_INTERVAL") or 2
+    )
+    INGEST_WATCH_SETTLE_SECONDS = float(
+        os.environ.get("INGEST_WATCH_SETTLE_SECONDS") or 2
+    )
+
+    # S3 streaming ingestion: objects at least this large are fetched with
+    # concurrent byte-range GETs instead of a single streamed GET
+    S3_RANGED_GET_THRESHOLD = int(
+        os.environ.get("S3_RANGED_GET_THRESHOLD") or 64 * 1024 * 1024
+    )
+    S3_RANGED_GET_PART_SIZE = int(
+        os.environ.get("S3_RANGED_GET_PART_SIZE") or 8 * 1024 * 1024
+    )
+    S3_RANGED_GET_CONCURRENCY = int(os.environ.get("S3_RANGED_GET_CONCURRENCY") or 8)
+    S3_PROCESSED_PREFIX = os.environ.get("S3_PROCESSED_PREFIX") or "processed/"
+
+    # Objects ingested concurrently by one batch ingestion task. Keep at or
+    # below the SQLAlchemy pool size so workers never wait on a connection.
+    INGEST_BATCH_CONCURRENCY = int(os.environ.get("INGEST_BATCH_CONCURRENCY") or 4)
+
+    # Rows per bulk insert, and per-source column mappings for the format
+    # registry (inline JSON or a path to a JSON file, see app/services/formats.py)
+    INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE") or 5000)
+    INGEST_SOURCE_MAPPINGS = os.environ.get("INGEST_SOURCE_MAPPINGS") or ""
+
+    # Intra-file parallel parsing: local uncompressed files of at least
+    # INGEST_PARALLEL_MIN_BYTES are split into byte ranges and parsed on this
+    # many processes (1 disables it)
+    INGEST_PARALLEL_WORKERS = int(os.environ.get("INGEST_PARALLEL_WORKERS") or 1)
+    INGEST_PARALLEL_MIN_BYTES = int(
+        os.environ.get("INGEST_PARALLEL_MIN_BYTES") or 64 * 1024 * 1024
+    )
+
+    # Chunked commits: commit, with a resumable byte-offset checkpoint, about
+    # every this many rows so a crash only loses the current chunk.
+    # 0 keeps one transaction per file.
+    INGEST_CHECKPOINT_ROWS = int(os.environ.get("INGEST_CHECKPOINT_ROWS") or 0)
+
+    # "direct" inserts into trades as the file is parsed; "staging" loads a
+    # temporary table (COPY on PostgreSQL) and publishes the whole file to
+    # trades in one INSERT ... SELECT. Chunked (checkpointed) loads stay direct.
+    INGEST_LOAD_MODE = load_choice_setting("INGEST_LOAD_MODE", ("direct", "staging"))
+
+    # Cumulative position history: snapshots of every holding are taken on a
+    # fixed grid of dates this many days apart (7 = every Sunday), so the
+    # opening position of a history request is one snapshot plus at most
+    # this many days of deltas
+    POSITION_SNAPSHOT_INTERVAL_DAYS = int(
+        os.environ.get("POSITION_SNAPSHOT_INTERVAL_DAYS") or 7
+    )
+
+    # Positions/alarms: "window" computes ticker values and account totals in
+    # one scan with SUM() OVER (PARTITION BY account_id); "join" is the
+    # original subquery-and-join shape. Alarms fire above the threshold (%).
+    POSITION_QUERY_ENGINE = os.environ.get("POSITION_QUERY_ENGINE") or "window"
+    ALARM_THRESHOLD_PERCENT = float(os.environ.get("ALARM_THRESHOLD_PERCENT") or 20)
+    # Most sub-queries accepted by one POST /api/batch request
+    BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES") or 50)
+
+    # API response compression (zstd, br with the optional brotli package,
+    # gzip) for clients that send Accept-Encoding. Bodies under MIN_BYTES are
+    # sent as is; LEVEL 0 disables compression. Compressed bodies of
+    # responses with a data-version ETag are cached, up to CACHE_BYTES.
+    RESPONSE_COMPRESSION_MIN_BYTES = int(
+        os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES") or 1024
+    )
+    RESPONSE_COMPRESSION_LEVEL = int(os.environ.get("RESPONSE_COMPRESSION_LEVEL") or 5)
+    RESPONSE_COMPRESSION_CACHE_BYTES = int(
+        os.environ.get("RESPONSE_COMPRESSION_CACHE_BYTES") or 64 * 1024 * 1024
+    )
+
+    # Health checks: a background thread probes the database this often and
+    # the health routes answer from its latest result. Readiness fails when
+    # that result is older than STALE_AFTER, the database is down, or a
+    # replica lags more than MAX_REPLICA_LAG_SECONDS. A pool at least
+    # MAX_POOL_SATURATION (fraction) checked out is only warned about.
+    HEALTH_PROBE_INTERVAL_SECONDS = float(
+        os.environ.get("HEALTH_PROBE_INTERVAL_SECONDS") or 5
+    )
+    HEALTH_STALE_AFTER_SECONDS = float(
+        os.environ.get("HEALTH_STALE_AFTER_SECONDS") or 30
+    )
+    HEALTH_MAX_POOL_SATURATION = float(
+        os.environ.get("HEALTH_MAX_POOL_SATURATION") or 0.9
+    )
+    HEALTH_MAX_REPLICA_LAG_SECONDS = float(
+        os.environ.get("HEALTH_MAX_REPLICA_LAG_SECONDS") or 30
+    )
+
+    # Cold-tier archival (scripts/archive_trades.py): trade dates older than
+    # ARCHIVE_AFTER_DAYS are moved to one zstd-compressed Parquet file per
+    # date under ARCHIVE_LOCATION, a local directory or s3://bucket/prefix.
+    ARCHIVE_LOCATION = os.environ.get("ARCHIVE_LOCATION") or ""
+    ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS") or 92)
+
+    # Per-file ingestion stage spans (app/services/ingestion_trace.py):
+    # "none" (default) disables them, "jsonl" appends them to
+    # INGEST_TRACE_PATH (required), "otel" sends them to the OpenTelemetry
+    # tracer provider, and "package.module:Class" plugs in a custom exporter.
+    INGEST_TRACE_EXPORTER = os.environ.get("INGEST_TRACE_EXPORTER") or "none"
+    INGEST_TRACE_PATH = os.environ.get("INGEST_TRACE_PATH") or ""
+
+    # Opt-in profiling (app/profiling.py): API requests with an X-Profile
+    # header equal to PROFILE_TOKEN, or a PROFILE_SAMPLE_RATE fraction of
+    # them, get a sampling profile and SQL timings, logged and written as
+    # JSON under PROFILE_OUTPUT_DIR when set. Statements slower than
+    # SLOW_QUERY_LOG_MS are logged with their parameters (0 = off).
+    PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or ""
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE") or 0)
+    PROFILE_SAMPLE_INTERVAL_MS = float(
+        os.environ.get("PROFILE_SAMPLE_INTERVAL_MS") or 5
+    )
+    PROFILE_OUTPUT_DIR = os.environ.get("PROFILE_OUTPUT_DIR") or ""
+    SLOW_QUERY_LOG_MS = float(os.environ.get("SLOW_QUERY_LOG_MS") or 0)
+
+    # Range analytics: scripts/export_trade_snapshots.py writes Parquet
+    # snapshots of each trade date under ANALYTICS_SNAPSHOT_LOCATION, and the
+    # /positions/range and /alarms/range endpoints aggregate them with DuckDB
+    # using up to ANALYTICS_THREADS threads. Empty disables the engine and every
+    # date is read from the database.
+    ANALYTICS_SNAPSHOT_LOCATION = os.environ.get("ANALYTICS_SNAPSHOT_LOCATION") or ""
+    ANALYTICS_THREADS = int(os.environ.get("ANALYTICS_THREADS") or 4)
@@ -0,0 +1,155 @@
+"""Liveness and readiness served from a status snapshot.
+
+A background thread probes the database every HEALTH_PROBE_INTERVAL_SECONDS
+and records the result, the connection pool's saturation and, on a
+PostgreSQL replica, its replay lag. The health routes only read that
+snapshot, so an ALB or ECS probe never waits for a pooled connection.
+
+The probe opens its own connection outside the app's pool, and a saturated
+pool is reported as a warning (and logged) rather than failing readiness:
+a busy task that still serves requests is not taken out of the target
+group, and so not replaced by ECS, under load.
+
+The prober starts before the first request each worker process serves, so
+scripts and ingestion workers that create the app never run it. Its first
+probe runs in the background too; until it completes readiness reports
+that no probe has, and liveness already answers.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app import db
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_is_in_recovery() THEN "
+    "COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "ELSE 0 END"
+)
+
+
+def pool_status(engine):
+    """Checked-out connections against pool capacity, without touching the pool"""
+    pool = engine.pool
+    try:
+        size = pool.size()
+        checked_out = pool.checkedout()
+    except AttributeError:
+        # Pools without a fixed size (SQLite's static and per-thread pools)
+        return {"size": None, "checked_out": None, "saturation": None}
+
+    capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+    return {
+        "size": size,
+        "checked_out": checked_out,
+        "saturation": round(checked_out / capacity, 3) if capacity else None,
+    }
+
+
+class HealthMonitor:
+    def __init__(self, app):
+        self.app = app
+        self.snapshot = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._probe_engine = None
+
+    def _engine_for_probe(self, engine):
+        """An unpooled engine on the app's database, so the probe never waits
+        for (or fails on) a checked-out pool"""
+        if engine.dialect.name == "sqlite":
+            return engine
+        if self._probe_engine is None:
+            self._probe_engine = create_engine(engine.url, poolclass=NullPool)
+        return self._probe_engine
+
+    def probe(self):
+        """Check the database once and replace the snapshot"""
+        started = time.monotonic()
+        snapshot = {
+            "database": "healthy",
+            "replica_lag_seconds": None,
+            "checked_at": datetime.utcnow(),
+        }
+        with self.app.app_context():
+            engine = db.engine
+            try:
+                with self._engine_for_probe(engine).connect() as connection:
+                    if engine.dialect.name == "postgresql":
+                        lag = connection.execute(_REPLICA_LAG_SQL).scalar()
+                        snapshot["replica_lag_seconds"] = round(float(lag), 3)
+                    else:
+                        connection.execute(text("SELECT 1"))
+            except Exception as e:
+                snapshot["database"] = f"unhealthy: {str(e)}"
+            snapshot["pool"] = pool_status(engine)
+
+        snapshot["probe_seconds"] = round(time.monotonic() - started, 3)
+        self.snapshot = snapshot
+        for warning in self.warnings():
+            logger.warning(f"Health probe: {warning}")
+        return snapshot
+
+    def _run(self):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error(f"Health probe failed: {str(e)}")
+            time.sleep(Config.HEALTH_PROBE_INTERVAL_SECONDS)
+
+    def ensure_started(self):
+        """Start the prober, once per process; never waits for a probe"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="health-prober", daemon=True
+            )
+            self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def readiness(self):
+        """(ready, reasons) judged from the latest snapshot"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return False, ["no health probe has completed"]
+
+        reasons = []
+        age = (datetime.utcnow() - snapshot["checked_at"]).total_seconds()
+        if age > Config.HEALTH_STALE_AFTER_SECONDS:
+            reasons.append(f"last health probe finished {age:.0f}s ago")
+        if snapshot["database"] != "healthy":
+            reasons.append(f"database {snapshot['database']}")
+        lag = snapshot["replica_lag_seconds"]
+        if lag is not None and lag > Config.HEALTH_MAX_REPLICA_LAG_SECONDS:
+            reasons.append(f"replica {lag:.0f}s behind")
+        return not reasons, reasons
+
+    def warnings(self):
+        """Signals from the latest snapshot that do not fail readiness"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return []
+        saturation = snapshot["pool"]["saturation"]
+        if saturation is not None and saturation >= Config.HEALTH_MAX_POOL_SATURATION:
+            return [f"connection pool {saturation:.0%} checked out"]
+        return []
+
+    def to_dict(self):
+        snapshot = dict(self.snapshot or {})
+        if "checked_at" in snapshot:
+            snapshot["checked_at"] = snapshot["checked_at"].isoformat()
+        return snapshot
@@ -1,17 +1,31 @@
-from flask import current_app, jsonify, request
-
-from app.config import Config
+from flask import current_app, g, jsonify, request
 
 
 def api_key_middleware():
     # Skip authentication for health check endpoints
-    if request.path in ["/health", "/metrics", "/"]:
+    if request.path in ["/health", "/health/live", "/health/ready", "/metrics", "/"]:
         return None
 
-    api_key = request.headers.get("X-API-Key") or request.args.get("api_key")
-    expected_key = current_app.config.get("API_KEY", Config.API_KEY)
+    api_key = current_app.extensions["api_keys"].lookup(
+        request.headers.get("X-API-Key") or request.args.get("api_key")
+    )
 
-    if not api_key or api_key != expected_key:
+    if api_key is None:
         return jsonify({"error": "Unauthorized: Invalid or missing API key"}), 401
 
+    admitted, retry_after = api_key.acquire()
+    if not admitted:
+        response = jsonify({"error": "Too many requests for this API key"})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    g.api_key = api_key
     return None
+
+
+def release_api_key(exc=None):
+    """teardown_request hook: free the concurrent-request slot taken above"""
+    api_key = g.pop("api_key", None)
+    if api_key is not None:
+        api_key.release()
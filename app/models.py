@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Index
+from sqlalchemy import Index, UniqueConstraint
 
 from app import db
 
@@ -41,3 +41,249 @@ class Trade(db.Model):
             "source_system": self.source_system,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+# Columns written by the ingestion writers; id and created_at are generated
+TRADE_COLUMNS = [
+    column.name
+    for column in Trade.__table__.columns
+    if column.name not in ("id", "created_at")
+]
+
+
+class PositionDelta(db.Model):
+    """Net change in an account's holding of a ticker on one trade date.
+
+    Maintained by the ingestion writers, so cumulative positions never need
+    a scan of raw trades.
+    """
+
+    __tablename__ = "position_deltas"
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.String(50), nullable=False)
+    ticker = db.Column(db.String(20), nullable=False)
+    trade_date = db.Column(db.Date, nullable=False, index=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    market_value = db.Column(db.Numeric(18, 2), nullable=False, default=0)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "account_id", "ticker", "trade_date", name="uq_position_delta"
+        ),
+        Index("idx_position_delta_account_date", "account_id", "trade_date"),
+    )
+
+
+class PositionSnapshot(db.Model):
+    """Cumulative holding of a ticker per account at the end of as_of_date"""
+
+    __tablename__ = "position_snapshots"
+
+    id = db.Column(db.Integer, primary_key=True)
+    as_of_date = db.Column(db.Date, nullable=False)
+    account_id = db.Column(db.String(50), nullable=False)
+    ticker = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.BigInteger, nullable=False)
+    market_value = db.Column(db.Numeric(18, 2), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "as_of_date", "account_id", "ticker", name="uq_position_snapshot"
+        ),
+    )
+
+
+class TradeDateVersion(db.Model):
+    """Data version and trade count of one trade date, kept up to date by ingestion.
+
+    Backs the ETag and Last-Modified headers of the per-date API endpoints
+    and the trade totals in /metrics.
+    """
+
+    __tablename__ = "trade_date_versions"
+
+    trade_date = db.Column(db.Date, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    trade_count = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class TradeArchive(db.Model):
+    """A trade date moved out of trades into a Parquet file.
+
+    hot_watermarks maps each trades database ("default", or a shard key) to
+    the highest trade id archived from it; rows above it arrived later and
+    are still read from the hot table.
+    """
+
+    __tablename__ = "trade_archives"
+
+    trade_date = db.Column(db.Date, primary_key=True)
+    location = db.Column(db.String(500), nullable=False)
+    row_count = db.Column(db.BigInteger, nullable=False)
+    hot_watermarks = db.Column(db.JSON, nullable=False, default=dict)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class TradeSnapshot(db.Model):
+    """Parquet export of a trade date for the range analytics engine.
+
+    The snapshot is current while version matches the date's
+    TradeDateVersion; after a later ingest the date is read from the
+    database until it is exported again.
+    """
+
+    __tablename__ = "trade_snapshots"
+
+    trade_date = db.Column(db.Date, primary_key=True)
+    location = db.Column(db.String(500), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.BigInteger, nullable=False)
+    exported_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class IngestionCheckpoint(db.Model):
+    """Progress of a file ingested with chunked commits, so a rerun can resume"""
+
+    __tablename__ = "ingestion_checkpoints"
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(512), nullable=False, unique=True)
+    # Size and content hash (or S3 ETag) of the file the checkpoint belongs to
+    fingerprint = db.Column(db.String(128), nullable=True)
+    # Bytes of (decompressed) input covered by committed rows
+    byte_offset = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_committed = db.Column(db.Integer, nullable=False, default=0)
+    bad_rows = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default="in_progress")
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def restart(self, fingerprint):
+        """Start over, e.g. because a different file arrived under the same name"""
+        self.fingerprint = fingerprint
+        self.byte_offset = 0
+        self.rows_committed = 0
+        self.bad_rows = 0
+        self.status = "in_progress"
+        self.started_at = datetime.utcnow()
+        self.completed_at = None
+
+    def advance(self, byte_offset, rows, bad_rows):
+        """Record a chunk; commit it in the same transaction as its rows"""
+        self.byte_offset = byte_offset
+        self.rows_committed += rows
+        self.bad_rows += bad_rows
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "fingerprint": self.fingerprint,
+            "byte_offset": self.byte_offset,
+            "rows_committed": self.rows_committed,
+            "bad_rows": self.bad_rows,
+            "status": self.status,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "completed_at": (
+                self.completed_at.isoformat() if self.completed_at else None
+            ),
+        }
+
+
+class IngestionBatch(db.Model):
+    """One ingestion run over several files (an SFTP, local or S3 batch)"""
+
+    __tablename__ = "ingestion_batches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    transport = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="running")
+    files = db.Column(db.Integer, nullable=False, default=0)
+    failed_files = db.Column(db.Integer, nullable=False, default=0)
+    rows = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    started_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "transport": self.transport,
+            "status": self.status,
+            "files": self.files,
+            "failed_files": self.failed_files,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class IngestionRun(db.Model):
+    """Outcome and stage timings of one ingested file, from its trace.
+
+    stage_ms maps each traced stage (download, detect, parse, db_write,
+    commit, ...) to its total milliseconds.
+    """
+
+    __tablename__ = "ingestion_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(
+        db.Integer, db.ForeignKey("ingestion_batches.id"), nullable=True, index=True
+    )
+    source = db.Column(db.String(512), nullable=False)
+    transport = db.Column(db.String(20), nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    bytes = db.Column(db.BigInteger, nullable=True)
+    rows = db.Column(db.Integer, nullable=True)
+    bad_rows = db.Column(db.Integer, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=False)
+    stage_ms = db.Column(db.JSON, nullable=False, default=dict)
+    started_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "batch_id": self.batch_id,
+            "source": self.source,
+            "transport": self.transport,
+            "status": self.status,
+            "error": self.error,
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "bad_rows": self.bad_rows,
+            "duration_ms": self.duration_ms,
+            "stage_ms": self.stage_ms,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+        }
+
+
+class ShardCommit(db.Model):
+    """One ingest commit's trade inserts on a shard, made ahead of the primary.
+
+    On a shard, trade_id_ranges lists the ids ([first, last] runs) the commit
+    inserted. The ingest's primary transaction records the same token with no
+    ranges as its acknowledgement. A shard row without one belongs to a
+    commit whose primary side never landed; its trades are deleted before the
+    source is ingested again (see ShardWriter.recover).
+    """
+
+    __tablename__ = "shard_commits"
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), nullable=False, index=True)
+    source = db.Column(db.String(512), nullable=False, index=True)
+    trade_id_ranges = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
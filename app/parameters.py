@@ -0,0 +1,41 @@
+"""Query parameter parsing shared by the GET endpoints and /api/batch.
+
+Each parser takes the raw value (or values) and raises ValueError with the
+message the API returns in its 400 response, so a sub-query in a batch is
+validated exactly like the request it stands for.
+"""
+
+from datetime import datetime
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def parse_date(value, name="date"):
+    """A required YYYY-MM-DD date"""
+    if not value:
+        raise ValueError(f"{name} parameter is required")
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT).date()
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD") from None
+
+
+def parse_list(values):
+    """Values of a repeated and/or comma-separated parameter, deduplicated"""
+    result = []
+    for value in values:
+        result.extend(v.strip() for v in str(value).split(",") if v.strip())
+    return list(dict.fromkeys(result))
+
+
+def parse_threshold(value):
+    """Optional alarm threshold percentage; None means the configured default"""
+    if value is None:
+        return None
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        threshold = None
+    if threshold is None or not 0 <= threshold <= 100:
+        raise ValueError("threshold must be a number between 0 and 100")
+    return threshold
@@ -0,0 +1,294 @@
+"""Opt-in request and CLI profiling, and slow-query logging.
+
+An API request is profiled when it carries an X-Profile header matching
+PROFILE_TOKEN, or when it is picked by PROFILE_SAMPLE_RATE. A profiled
+request records:
+
+- a sampling profile: a background thread snapshots the request thread's
+  stack every PROFILE_SAMPLE_INTERVAL_MS, and the stacks are counted in
+  folded form (root;...;leaf), ready for flamegraph tools. Time spent under
+  SQLAlchemy's loading code is ORM hydration, under json/jsonify is
+  serialization;
+- every SQL statement's duration and parameters, from engine events.
+
+The profile is logged (and written as JSON under PROFILE_OUTPUT_DIR when
+set), and the response gets a Server-Timing header with the total and SQL
+time. Independently, any statement slower than SLOW_QUERY_LOG_MS is logged
+with its parameters, for requests, scripts and ingestion alike.
+
+profiled() profiles a whole process run the same way, sampling every thread;
+scripts/ingest_files.py --profile uses it.
+"""
+
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Statements kept per profile (the totals cover all of them)
+MAX_RECORDED_QUERIES = 500
+# Longest parameter repr logged or recorded per statement
+MAX_PARAMS_CHARS = 1000
+
+_current = ContextVar("profile", default=None)
+_process_profile = None
+_hooks_installed = False
+
+
+def _params_repr(parameters):
+    text = repr(parameters)
+    if len(text) > MAX_PARAMS_CHARS:
+        return f"{text[:MAX_PARAMS_CHARS]}... ({len(text)} chars)"
+    return text
+
+
+class SamplingProfiler:
+    """Counts the folded stacks of some threads (all others if None) at an interval"""
+
+    def __init__(self, thread_ids=None, interval=None):
+        self.thread_ids = thread_ids
+        self.interval = (interval or Config.PROFILE_SAMPLE_INTERVAL_MS) / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (
+                    self.thread_ids is not None and thread_id not in self.thread_ids
+                ):
+                    continue
+                self.stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+class Profile:
+    def __init__(self, label, thread_ids=None):
+        self.label = label
+        self.profiler = SamplingProfiler(thread_ids)
+        self.queries = []
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.seconds = None
+        self._lock = threading.Lock()
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.profiler.start()
+
+    def stop(self):
+        if self.seconds is None:
+            self.profiler.stop()
+            self.seconds = time.perf_counter() - self._started
+
+    def add_query(self, statement, parameters, seconds):
+        with self._lock:
+            self.query_count += 1
+            self.query_seconds += seconds
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append(
+                    {
+                        "statement": statement,
+                        "parameters": _params_repr(parameters),
+                        "duration_ms": round(seconds * 1000, 3),
+                    }
+                )
+
+    def to_dict(self, top=None):
+        stacks = self.profiler.stacks.most_common(top)
+        return {
+            "label": self.label,
+            "duration_ms": round(self.seconds * 1000, 3),
+            "sql": {
+                "count": self.query_count,
+                "duration_ms": round(self.query_seconds * 1000, 3),
+                "queries": self.queries,
+            },
+            "samples": self.profiler.samples,
+            "sample_interval_ms": self.profiler.interval * 1000,
+            "stacks": dict(stacks),
+        }
+
+    def report(self):
+        """Log the profile, and write it under PROFILE_OUTPUT_DIR when set"""
+        path = None
+        if Config.PROFILE_OUTPUT_DIR:
+            os.makedirs(Config.PROFILE_OUTPUT_DIR, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9]+", "-", self.label).strip("-")[:80]
+            path = os.path.join(
+                Config.PROFILE_OUTPUT_DIR,
+                f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{slug}.json",
+            )
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+        summary = self.to_dict(top=10)
+        summary["sql"]["queries"] = sorted(
+            summary["sql"]["queries"], key=lambda q: -q["duration_ms"]
+        )[:5]
+        logger.info(f"Profile {self.label}: {json.dumps(summary)}")
+        if path:
+            logger.info(f"Profile written to {path}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+
+    profile = _current.get() or _process_profile
+    if profile is not None:
+        profile.add_query(statement, parameters, seconds)
+
+    threshold = Config.SLOW_QUERY_LOG_MS
+    if threshold > 0 and seconds * 1000 >= threshold:
+        logger.warning(
+            f"Slow query ({seconds * 1000:.1f} ms): {statement} "
+            f"parameters={_params_repr(parameters)}"
+        )
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def install_query_hooks():
+    """Time every statement on every engine (shards included), once per process"""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _hooks_installed = True
+
+
+def _requested():
+    if request.blueprint != "api":
+        return False
+    token = request.headers.get("X-Profile")
+    if token and Config.PROFILE_TOKEN:
+        return hmac.compare_digest(token, Config.PROFILE_TOKEN)
+    return Config.PROFILE_SAMPLE_RATE > 0 and (
+        random.random() < Config.PROFILE_SAMPLE_RATE
+    )
+
+
+def start_request_profile():
+    """before_request hook"""
+    if not _requested():
+        return None
+    # The label is logged, so it leaves out an api_key query parameter
+    query = "&".join(
+        f"{name}={value}"
+        for name, value in request.args.items(multi=True)
+        if name != "api_key"
+    )
+    label = f"{request.method} {request.path}" + (f"?{query}" if query else "")
+    profile = Profile(label, thread_ids={threading.get_ident()})
+    g.profile = profile
+    g.profile_token = _current.set(profile)
+    profile.start()
+    return None
+
+
+def finish_request_profile(response):
+    """after_request hook: stop the profile and add Server-Timing"""
+    profile = g.get("profile")
+    if profile is None:
+        return response
+    profile.stop()
+    response.headers["Server-Timing"] = (
+        f"total;dur={profile.seconds * 1000:.1f}, "
+        f"sql;dur={profile.query_seconds * 1000:.1f};"
+        f'desc="{profile.query_count} queries"'
+    )
+    return response
+
+
+def end_request_profile(exc=None):
+    """teardown_request hook: report the profile, also after an error"""
+    profile = g.pop("profile", None)
+    if profile is None:
+        return
+    _current.reset(g.pop("profile_token"))
+    profile.stop()
+    try:
+        profile.report()
+    except Exception as e:
+        logger.error(f"Could not report profile {profile.label}: {str(e)}")
+
+
+def init_app(app):
+    """Register the request hooks; call before registering compression so the
+    profile's after_request runs last"""
+    install_query_hooks()
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(end_request_profile)
+
+
+@contextmanager
+def profiled(label):
+    """Profile every thread of the process, e.g. a CLI run, until exit"""
+    global _process_profile
+    install_query_hooks()
+    profile = Profile(label)
+    _process_profile = profile
+    profile.start()
+    try:
+        yield profile
+    finally:
+        _process_profile = None
+        profile.stop()
+        profile.report()
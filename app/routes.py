@@ -1,10 +1,14 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import wraps
 
-from flask import Blueprint, jsonify, request
-from sqlalchemy import case, func
+from flask import Blueprint, current_app, g, jsonify, make_response, request
 
-from app import db
-from app.models import Trade
+from app import compression, db, health, parameters
+from app.config import Config
+from app.services import batch_queries, ingestion_runs, position_queries
+from app.services.analytics import MAX_RANGE_DAYS, AnalyticsService
+from app.services.data_versions import DataVersionService
+from app.services.position_history import PositionHistoryService
 
 api_bp = Blueprint("api", __name__)
 
@@ -12,55 +16,148 @@ api_bp = Blueprint("api", __name__)
 def register_health_routes(app):
     """Register health check routes directly on app (no auth)"""
 
+    def health_monitor():
+        return current_app.extensions["health"]
+
     @app.route("/health", methods=["GET"])
     def health_check():
-        """Health check endpoint for observability"""
-        try:
-            # Check database connection
-            db.session.execute(db.text("SELECT 1"))
-            db_status = "healthy"
-        except Exception as e:
-            db_status = f"unhealthy: {str(e)}"
+        """Health check endpoint for observability, from the latest probe"""
+        monitor = health_monitor()
+        ready, reasons = monitor.readiness()
+        warnings = monitor.warnings()
 
         return jsonify(
             {
-                "status": "healthy" if db_status == "healthy" else "degraded",
-                "database": db_status,
+                "status": "healthy" if ready and not warnings else "degraded",
+                "reasons": reasons,
+                "warnings": warnings,
+                **monitor.to_dict(),
                 "timestamp": datetime.utcnow().isoformat(),
             }
         )
 
+    @app.route("/health/live", methods=["GET"])
+    def liveness():
+        """Liveness: the process serves requests and its prober is running"""
+        alive = health_monitor().is_alive()
+        return (
+            jsonify(
+                {
+                    "status": "alive" if alive else "prober stopped",
+                    "timestamp": datetime.utcnow().isoformat(),
+                }
+            ),
+            200 if alive else 503,
+        )
+
+    @app.route("/health/ready", methods=["GET"])
+    def readiness():
+        """Readiness: a fresh probe found the database, pool and replica usable"""
+        monitor = health_monitor()
+        ready, reasons = monitor.readiness()
+        return (
+            jsonify(
+                {
+                    "status": "ready" if ready else "not ready",
+                    "reasons": reasons,
+                    "warnings": monitor.warnings(),
+                    **monitor.to_dict(),
+                    "timestamp": datetime.utcnow().isoformat(),
+                }
+            ),
+            200 if ready else 503,
+        )
+
     @app.route("/metrics", methods=["GET"])
     def metrics():
-        """Basic metrics endpoint for observability"""
-        total_trades = Trade.query.count()
-        latest_trade = Trade.query.order_by(Trade.trade_date.desc()).first()
+        """Basic metrics endpoint for observability.
+
+        Trade totals come from the per-date counts ingestion maintains, so a
+        scrape never counts the trades table.
+        """
+        total_trades, latest_trade_date = DataVersionService.totals()
 
         return jsonify(
             {
                 "total_trades": total_trades,
                 "latest_trade_date": (
-                    latest_trade.trade_date.isoformat() if latest_trade else None
+                    latest_trade_date.isoformat() if latest_trade_date else None
                 ),
+                "api_keys": current_app.extensions["api_keys"].usage(),
+                "database_pool": health.pool_status(db.engine),
                 "timestamp": datetime.utcnow().isoformat(),
             }
         )
 
 
+def conditional_on_date(view):
+    """Serve the `date` parameter's data version as ETag and Last-Modified.
+
+    The version is read before the view runs, so a client whose copy is
+    current gets a 304 without any trade query, and a body already compressed
+    for this version is served from the compression cache. A missing or
+    invalid date is left to the view to report.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            query_date = datetime.strptime(
+                request.args.get("date", ""), "%Y-%m-%d"
+            ).date()
+        except ValueError:
+            return view(*args, **kwargs)
+
+        version, updated_at = DataVersionService.get(query_date)
+        etag = f"{query_date.isoformat()}.{version}"
+        last_modified = (
+            updated_at.replace(microsecond=0, tzinfo=timezone.utc)
+            if updated_at
+            else None
+        )
+
+        # Compressed representations carry the identity ETag plus "+<encoding>"
+        matched = None
+        if request.if_none_match:
+            for tag in request.if_none_match.as_set(include_weak=True):
+                if compression.strip_encoding(tag) == etag:
+                    matched = tag
+            if request.if_none_match.star_tag:
+                matched = etag
+        elif last_modified and request.if_modified_since:
+            if last_modified <= request.if_modified_since:
+                matched = etag
+
+        if matched:
+            response = current_app.response_class(status=304)
+            response.set_etag(matched)
+        else:
+            response = compression.cached_response(etag)
+            if response is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+
+        if last_modified:
+            response.last_modified = last_modified
+        return response
+
+    return wrapper
+
+
 @api_bp.route("/blotter", methods=["GET"])
+@conditional_on_date
 def get_blotter():
     """Returns the data from the reports in a simplified format for the given date"""
     date_str = request.args.get("date")
 
-    if not date_str:
-        return jsonify({"error": "date parameter is required"}), 400
-
     try:
-        query_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        query_date = parameters.parse_date(date_str)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    trades = Trade.query.filter_by(trade_date=query_date).all()
+    trades = position_queries.get_trades(query_date)
 
     result = {
         "date": date_str,
@@ -72,124 +169,297 @@ def get_blotter():
 
 
 @api_bp.route("/positions", methods=["GET"])
+@conditional_on_date
 def get_positions():
     """Returns the percentage of funds by ticker for each account for the given date"""
     date_str = request.args.get("date")
 
-    if not date_str:
-        return jsonify({"error": "date parameter is required"}), 400
-
     try:
-        query_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
-
-    # Calculate total market value per account (use absolute values)
-    account_totals = (
-        db.session.query(
-            Trade.account_id,
-            func.sum(func.abs(Trade.market_value)).label("total_value"),
+        query_date = parameters.parse_date(date_str)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result = {"date": date_str, "positions": position_queries.get_positions(query_date)}
+
+    return jsonify(result)
+
+
+@api_bp.route("/positions/history", methods=["GET"])
+def get_position_history():
+    """Returns cumulative holdings per ticker for an account over a date range"""
+    account_id = request.args.get("account_id")
+    start_str = request.args.get("start_date")
+    end_str = request.args.get("end_date")
+
+    if not account_id or not start_str or not end_str:
+        return (
+            jsonify(
+                {"error": "account_id, start_date and end_date parameters are required"}
+            ),
+            400,
         )
-        .filter(Trade.trade_date == query_date)
-        .group_by(Trade.account_id)
-        .subquery()
+
+    try:
+        start_date = parameters.parse_date(start_str, "start_date")
+        end_date = parameters.parse_date(end_str, "end_date")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if start_date > end_date:
+        return jsonify({"error": "start_date must not be after end_date"}), 400
+
+    positions = PositionHistoryService.history(
+        account_id, start_date, end_date, ticker=request.args.get("ticker")
     )
 
-    # Calculate positions with percentages (use absolute values for calculations)
-    positions = (
-        db.session.query(
-            Trade.account_id,
-            Trade.ticker,
-            func.sum(func.abs(Trade.market_value)).label("ticker_value"),
-            func.abs(account_totals.c.total_value).label("total_value"),
-        )
-        .join(account_totals, Trade.account_id == account_totals.c.account_id)
-        .filter(Trade.trade_date == query_date)
-        .group_by(Trade.account_id, Trade.ticker, account_totals.c.total_value)
-        .all()
+    return jsonify(
+        {
+            "account_id": account_id,
+            "start_date": start_str,
+            "end_date": end_str,
+            "positions": positions,
+        }
     )
 
-    result = {"date": date_str, "positions": []}
 
-    for pos in positions:
-        percentage = (
-            (float(pos.ticker_value) / float(pos.total_value) * 100)
-            if pos.total_value
-            else 0
-        )
-        result["positions"].append(
-            {
-                "account_id": pos.account_id,
-                "ticker": pos.ticker,
-                "market_value": float(pos.ticker_value),
-                "percentage": round(percentage, 2),
-            }
-        )
+@api_bp.route("/alarms", methods=["GET"])
+@conditional_on_date
+def get_alarms():
+    """Returns true for any account over the alarm threshold (ALARM_THRESHOLD_PERCENT,
+    or the threshold parameter) in any ticker for the given date"""
+    date_str = request.args.get("date")
+
+    try:
+        query_date = parameters.parse_date(date_str)
+        threshold = _threshold_param()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result = {
+        "date": date_str,
+        "alarms": position_queries.get_alarms(query_date, threshold=threshold),
+    }
 
     return jsonify(result)
 
 
-@api_bp.route("/alarms", methods=["GET"])
-def get_alarms():
-    """Returns true for any account that has over 20% of any ticker for the given date"""
+def _threshold_param():
+    """Optional alarm threshold percentage; None means the configured default"""
+    return parameters.parse_threshold(request.args.get("threshold"))
+
+
+def _list_param(name):
+    """Values of a repeated and/or comma-separated query parameter, deduplicated"""
+    return parameters.parse_list(request.args.getlist(name))
+
+
+def _account_drilldown(key, query, account_ids, with_threshold=False):
+    """Validates date, then account_id, then threshold, as /api/batch does"""
     date_str = request.args.get("date")
 
-    if not date_str:
-        return jsonify({"error": "date parameter is required"}), 400
+    try:
+        query_date = parameters.parse_date(date_str)
+        if not account_ids:
+            raise ValueError("account_id parameter is required")
+        options = {"threshold": _threshold_param()} if with_threshold else {}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {
+            "date": date_str,
+            "account_ids": account_ids,
+            key: query(query_date, account_ids, **options),
+        }
+    )
+
+
+@api_bp.route("/accounts/positions", methods=["GET"])
+@api_bp.route("/accounts/<account_id>/positions", methods=["GET"])
+@conditional_on_date
+def get_account_positions(account_id=None):
+    """Returns positions for one account (path) or several (account_id=A,B)"""
+    account_ids = [account_id] if account_id else _list_param("account_id")
+    return _account_drilldown("positions", position_queries.get_positions, account_ids)
+
+
+@api_bp.route("/accounts/alarms", methods=["GET"])
+@api_bp.route("/accounts/<account_id>/alarms", methods=["GET"])
+@conditional_on_date
+def get_account_alarms(account_id=None):
+    """Returns alarms for one account (path) or several (account_id=A,B)"""
+    account_ids = [account_id] if account_id else _list_param("account_id")
+    return _account_drilldown(
+        "alarms", position_queries.get_alarms, account_ids, with_threshold=True
+    )
+
+
+@api_bp.route("/tickers/exposure", methods=["GET"])
+@api_bp.route("/tickers/<ticker>/exposure", methods=["GET"])
+def get_ticker_exposure(ticker=None):
+    """Returns every account's exposure to one or more tickers on a date or range"""
+    tickers = [ticker] if ticker else _list_param("ticker")
+    date_str = request.args.get("date")
+    start_str = request.args.get("start_date") or date_str
+    end_str = request.args.get("end_date") or date_str
+
+    if not tickers:
+        return jsonify({"error": "ticker parameter is required"}), 400
+    if not start_str or not end_str:
+        return (
+            jsonify({"error": "date (or start_date and end_date) is required"}),
+            400,
+        )
 
     try:
-        query_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
-
-    # Calculate total market value per account (use absolute values)
-    account_totals = (
-        db.session.query(
-            Trade.account_id,
-            func.sum(func.abs(Trade.market_value)).label("total_value"),
+        start_date = parameters.parse_date(start_str, "start_date")
+        end_date = parameters.parse_date(end_str, "end_date")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if start_date > end_date:
+        return jsonify({"error": "start_date must not be after end_date"}), 400
+    if (end_date - start_date).days >= position_queries.MAX_EXPOSURE_DAYS:
+        return (
+            jsonify(
+                {
+                    "error": "Date range too long; at most "
+                    f"{position_queries.MAX_EXPOSURE_DAYS} days"
+                }
+            ),
+            400,
         )
-        .filter(Trade.trade_date == query_date)
-        .group_by(Trade.account_id)
-        .subquery()
+
+    return jsonify(
+        {
+            "tickers": tickers,
+            "start_date": start_str,
+            "end_date": end_str,
+            "exposures": position_queries.get_ticker_exposure(
+                tickers, start_date, end_date
+            ),
+        }
     )
 
-    # Find positions over 20% (use absolute values for calculations)
-    violations = (
-        db.session.query(
-            Trade.account_id,
-            Trade.ticker,
-            func.sum(func.abs(Trade.market_value)).label("ticker_value"),
-            func.abs(account_totals.c.total_value).label("total_value"),
+
+@api_bp.route("/batch", methods=["POST"])
+def run_batch():
+    """Runs several blotter, positions and alarms queries in one request"""
+    payload = request.get_json(silent=True)
+    queries = payload.get("queries") if isinstance(payload, dict) else None
+
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "queries must be a non-empty list"}), 400
+    if len(queries) > Config.BATCH_MAX_QUERIES:
+        return (
+            jsonify({"error": f"Too many queries; at most {Config.BATCH_MAX_QUERIES}"}),
+            400,
         )
-        .join(account_totals, Trade.account_id == account_totals.c.account_id)
-        .filter(Trade.trade_date == query_date)
-        .group_by(Trade.account_id, Trade.ticker, account_totals.c.total_value)
-        .having(
-            (
-                func.sum(func.abs(Trade.market_value))
-                / func.abs(account_totals.c.total_value)
-                * 100
-            )
-            > 20
+
+    # The request took one rate-limit token; each further sub-query costs one
+    api_key = g.get("api_key")
+    if api_key is not None:
+        api_key.charge(len(queries) - 1)
+
+    results = batch_queries.run(queries)
+    return jsonify({"results": results, "count": len(results)})
+
+
+def _date_range_query(key, query, with_threshold=False):
+    start_str = request.args.get("start_date")
+    end_str = request.args.get("end_date")
+
+    if not start_str or not end_str:
+        return (
+            jsonify({"error": "start_date and end_date parameters are required"}),
+            400,
+        )
+
+    try:
+        start_date = parameters.parse_date(start_str, "start_date")
+        end_date = parameters.parse_date(end_str, "end_date")
+        options = {"threshold": _threshold_param()} if with_threshold else {}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if start_date > end_date:
+        return jsonify({"error": "start_date must not be after end_date"}), 400
+    if (end_date - start_date).days >= MAX_RANGE_DAYS:
+        return (
+            jsonify({"error": f"Date range too long; at most {MAX_RANGE_DAYS} days"}),
+            400,
         )
-        .all()
+
+    records = query(start_date, end_date, _list_param("account_id") or None, **options)
+    return jsonify(
+        {
+            "start_date": start_str,
+            "end_date": end_str,
+            key: records,
+            "count": len(records),
+        }
     )
 
-    result = {"date": date_str, "alarms": []}
 
-    for violation in violations:
-        percentage = (
-            (float(violation.ticker_value) / float(violation.total_value) * 100)
-            if violation.total_value
-            else 0
+@api_bp.route("/positions/range", methods=["GET"])
+def get_positions_range():
+    """Returns per-date positions over a date range, optionally for some accounts"""
+    return _date_range_query("positions", AnalyticsService.get_positions)
+
+
+@api_bp.route("/alarms/range", methods=["GET"])
+def get_alarms_range():
+    """Returns per-date alarms over a date range, optionally for some accounts"""
+    return _date_range_query("alarms", AnalyticsService.get_alarms, with_threshold=True)
+
+
+@api_bp.route("/ingestions", methods=["GET"])
+def get_ingestions():
+    """Returns ingestion throughput over a date range, with recent runs and batches"""
+    start_str = request.args.get("start_date")
+    end_str = request.args.get("end_date")
+
+    try:
+        end_date = (
+            parameters.parse_date(end_str, "end_date")
+            if end_str
+            else datetime.utcnow().date()
         )
-        result["alarms"].append(
-            {
-                "account_id": violation.account_id,
-                "ticker": violation.ticker,
-                "percentage": round(percentage, 2),
-                "violation": True,
-            }
+        start_date = (
+            parameters.parse_date(start_str, "start_date")
+            if start_str
+            else end_date - timedelta(days=ingestion_runs.DEFAULT_DAYS - 1)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if start_date > end_date:
+        return jsonify({"error": "start_date must not be after end_date"}), 400
+    if (end_date - start_date).days >= MAX_RANGE_DAYS:
+        return (
+            jsonify({"error": f"Date range too long; at most {MAX_RANGE_DAYS} days"}),
+            400,
         )
 
-    return jsonify(result)
+    limit = request.args.get("limit", "100")
+    max_limit = ingestion_runs.MAX_LIMIT
+    if not limit.isdigit() or not 1 <= int(limit) <= max_limit:
+        return (
+            jsonify({"error": f"limit must be a number between 1 and {max_limit}"}),
+            400,
+        )
+
+    service = ingestion_runs.IngestionRunService
+    transport = request.args.get("transport")
+    status = request.args.get("status")
+    return jsonify(
+        {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            **service.throughput(start_date, end_date, transport),
+            "runs": service.runs(start_date, end_date, transport, status, int(limit)),
+            "batches": service.batches(
+                start_date, end_date, transport, status, int(limit)
+            ),
+        }
+    )
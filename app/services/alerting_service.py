@@ -68,14 +68,16 @@ class AlertingService:
             },
         )
 
-    def send_data_quality_alert(self, filename, issues):
+    def send_data_quality_alert(self, filename, issues, summary=None):
         """Alert for data quality issues"""
-        return self.send_alert(
-            "data_quality",
-            {
-                "filename": filename,
-                "issues": issues,
-                "severity": "low",
-                "message": f"Data quality issues detected in {filename}: {', '.join(issues)}",
-            },
-        )
+        data = {
+            "filename": filename,
+            "issues": issues,
+            "severity": "low",
+            "message": f"Data quality issues detected in {filename}: {', '.join(issues)}",
+        }
+        if summary is not None:
+            data["summary"] = summary
+            if summary.get("rejected"):
+                data["severity"] = "medium"
+        return self.send_alert("data_quality", data)
@@ -0,0 +1,271 @@
+"""Range positions and alarms over Parquet snapshots of trades, with DuckDB.
+
+Positions and alarms across months of dates (a year of concentration
+history for every account) would scan the trades table date after date.
+export_snapshots() writes each trade date to a Parquet file under
+ANALYTICS_SNAPSHOT_LOCATION (the archive's trade_date=YYYY-MM-DD layout) and
+records it with the date's data version. The range queries hand the current
+snapshots to an in-process DuckDB, which runs the grouping and the
+account-total window over the columnar files in parallel, off the primary
+database.
+
+The dates in range are taken from the trades (every shard), the archives
+and the data versions. A date that was never exported, has no data version
+yet (see scripts/reconcile_trade_stats.py), or was ingested into since its
+export (its version moved on), is answered from the database by the
+per-date queries, so the results always match the per-date endpoints.
+Without the optional duckdb package, or with ANALYTICS_SNAPSHOT_LOCATION
+empty, every date takes that path.
+
+One DuckDB database serves the process; each query runs on its own cursor,
+and the S3 extensions and credentials are set up on it once.
+"""
+
+import logging
+import threading
+
+from app import db
+from app.config import Config
+from app.models import Trade, TradeArchive, TradeDateVersion, TradeSnapshot
+from app.services import parquet_store, position_queries, sharding
+
+logger = logging.getLogger(__name__)
+
+# Longest date range a range request may cover
+MAX_RANGE_DAYS = 366
+
+# Same arithmetic as position_queries: absolute market values summed per
+# (date, account, ticker), with the account's total from a window over them.
+# Sums stay DECIMAL until the final cast, as float(Decimal) does there.
+_VALUES_SQL = """
+    SELECT
+        trade_date,
+        account_id,
+        ticker,
+        CAST(ticker_value AS DOUBLE) AS ticker_value,
+        CAST(
+            SUM(ticker_value) OVER (PARTITION BY trade_date, account_id) AS DOUBLE
+        ) AS total_value
+    FROM (
+        SELECT
+            trade_date,
+            account_id,
+            ticker,
+            COALESCE(SUM(ABS(market_value)), 0) AS ticker_value
+        FROM read_parquet($files, hive_partitioning = false)
+        WHERE $account_ids IS NULL OR list_contains($account_ids, account_id)
+        GROUP BY trade_date, account_id, ticker
+    )
+"""
+
+_ALARMS_SQL = f"""
+    SELECT * FROM ({_VALUES_SQL})
+    WHERE total_value > 0 AND ticker_value / total_value * 100 > $threshold
+"""
+
+
+def engine_available():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+_database = None
+_database_lock = threading.Lock()
+_s3_ready = False
+
+
+def _connect(files):
+    """A cursor on the process's DuckDB database, set up for S3 if needed"""
+    global _database, _s3_ready
+    import duckdb
+
+    with _database_lock:
+        if _database is None:
+            _database = duckdb.connect(config={"threads": Config.ANALYTICS_THREADS})
+        if not _s3_ready and any(location.startswith("s3://") for location in files):
+            for statement in (
+                "INSTALL httpfs",
+                "LOAD httpfs",
+                "INSTALL aws",
+                "LOAD aws",
+                "CREATE SECRET (TYPE s3, PROVIDER credential_chain)",
+            ):
+                _database.execute(statement)
+            _s3_ready = True
+        return _database.cursor()
+
+
+def _scan(sql, files, **params):
+    if not files:
+        return []
+    connection = _connect(files)
+    try:
+        return connection.execute(sql, {"files": files, **params}).fetchall()
+    finally:
+        connection.close()
+
+
+def _in_range(model, start_date, end_date):
+    query = model.query
+    if start_date:
+        query = query.filter(model.trade_date >= start_date)
+    if end_date:
+        query = query.filter(model.trade_date <= end_date)
+    return query
+
+
+def _trade_dates(start_date, end_date):
+    """Dates in range with trades in the trades table or an archive"""
+
+    def dates(session):
+        return (
+            session.query(Trade.trade_date)
+            .filter(Trade.trade_date.between(start_date, end_date))
+            .distinct()
+            .all()
+        )
+
+    rows = sharding.gather(dates) if sharding.is_sharded() else dates(db.session)
+    archived = _in_range(TradeArchive, start_date, end_date)
+    return {row.trade_date for row in rows} | {
+        archive.trade_date for archive in archived
+    }
+
+
+def _plan(start_date, end_date):
+    """(snapshot files to scan, dates to answer from the database)"""
+    versions = {
+        version.trade_date: version.version
+        for version in _in_range(TradeDateVersion, start_date, end_date).filter(
+            TradeDateVersion.trade_count > 0
+        )
+    }
+    dates = set(versions) | _trade_dates(start_date, end_date)
+    if not Config.ANALYTICS_SNAPSHOT_LOCATION or not engine_available():
+        return [], sorted(dates)
+
+    current = {
+        snapshot.trade_date: snapshot.location
+        for snapshot in _in_range(TradeSnapshot, start_date, end_date)
+        if versions.get(snapshot.trade_date) == snapshot.version
+    }
+    return list(current.values()), sorted(dates - set(current))
+
+
+def _percentage(ticker_value, total_value):
+    return round(ticker_value / total_value * 100, 2) if total_value else 0
+
+
+def _order(row):
+    return row["date"], row["account_id"], row["ticker"]
+
+
+class AnalyticsService:
+    @staticmethod
+    def export_snapshots(start_date=None, end_date=None, location=None):
+        """Export every date in range whose snapshot is missing or stale; returns (dates, rows)"""
+        location = location or Config.ANALYTICS_SNAPSHOT_LOCATION
+        if not location:
+            raise ValueError("ANALYTICS_SNAPSHOT_LOCATION is not set")
+
+        snapshots = {
+            snapshot.trade_date: snapshot
+            for snapshot in _in_range(TradeSnapshot, start_date, end_date)
+        }
+        versions = (
+            _in_range(TradeDateVersion, start_date, end_date)
+            .filter(TradeDateVersion.trade_count > 0)
+            .order_by(TradeDateVersion.trade_date)
+            .all()
+        )
+
+        dates = rows = 0
+        for version in versions:
+            trade_date = version.trade_date
+            snapshot = snapshots.get(trade_date)
+            if snapshot is not None and snapshot.version == version.version:
+                continue
+
+            # The version is read before the trades: an ingest in between
+            # lands in the file under the older version, so the date is
+            # only ever re-exported, never served stale
+            trades = position_queries.get_trades(trade_date)
+            path = parquet_store.date_location(
+                location, trade_date, f"trades-v{version.version}"
+            )
+            parquet_store.write_file(path, parquet_store.to_parquet(trades))
+
+            replaced = None
+            if snapshot is None:
+                snapshot = TradeSnapshot(trade_date=trade_date)
+                db.session.add(snapshot)
+            elif snapshot.location != path:
+                replaced = snapshot.location
+            snapshot.location = path
+            snapshot.version = version.version
+            snapshot.row_count = len(trades)
+            db.session.commit()
+
+            if replaced:
+                parquet_store.delete_file(replaced)
+            dates += 1
+            rows += len(trades)
+
+        logger.info(f"Exported {rows} trades from {dates} trade dates to {location}")
+        return dates, rows
+
+    @staticmethod
+    def get_positions(start_date, end_date, account_ids=None):
+        """Per-date positions over a date range, as /api/positions reports them"""
+        files, dates = _plan(start_date, end_date)
+        result = [
+            {
+                "date": trade_date.isoformat(),
+                "account_id": account_id,
+                "ticker": ticker,
+                "market_value": ticker_value,
+                "percentage": _percentage(ticker_value, total_value),
+            }
+            for trade_date, account_id, ticker, ticker_value, total_value in _scan(
+                _VALUES_SQL, files, account_ids=account_ids
+            )
+        ]
+        for trade_date in dates:
+            result.extend(
+                {"date": trade_date.isoformat(), **position}
+                for position in position_queries.get_positions(trade_date, account_ids)
+            )
+        result.sort(key=_order)
+        return result
+
+    @staticmethod
+    def get_alarms(start_date, end_date, account_ids=None, threshold=None):
+        """Per-date alarms over a date range, as /api/alarms reports them"""
+        if threshold is None:
+            threshold = Config.ALARM_THRESHOLD_PERCENT
+
+        files, dates = _plan(start_date, end_date)
+        result = [
+            {
+                "date": trade_date.isoformat(),
+                "account_id": account_id,
+                "ticker": ticker,
+                "percentage": _percentage(ticker_value, total_value),
+                "violation": True,
+            }
+            for trade_date, account_id, ticker, ticker_value, total_value in _scan(
+                _ALARMS_SQL, files, account_ids=account_ids, threshold=threshold
+            )
+        ]
+        for trade_date in dates:
+            result.extend(
+                {"date": trade_date.isoformat(), **alarm}
+                for alarm in position_queries.get_alarms(
+                    trade_date, account_ids, threshold=threshold
+                )
+            )
+        result.sort(key=_order)
+        return result
@@ -0,0 +1,170 @@
+"""Several blotter, positions and alarms queries answered in one request.
+
+POST /api/batch takes sub-queries in the shape of the GET endpoints, a path
+with its query parameters:
+
+    {"queries": [
+        {"id": "pos", "path": "/api/positions?date=2025-01-15"},
+        {"id": "acc", "path": "/api/accounts/alarms",
+         "params": {"date": "2025-01-15", "account_id": "ACC001,ACC002"}}
+    ]}
+
+and returns, in order, each sub-query's status and the body its endpoint
+would have sent. Parameters are validated by the endpoints' own parsers
+(app.parameters), in the same order, so errors match too. All sub-queries run on the request's session, and work is
+shared per date: a date's trades are read once for every blotter query, and
+positions and alarms, which both derive from the (account, ticker) values,
+share one scan. If any sub-query on a date spans all accounts, account
+queries on that date are filtered from its rows; otherwise one scan covers
+the union of the requested accounts.
+"""
+
+import re
+from collections import defaultdict, namedtuple
+from urllib.parse import parse_qs, urlsplit
+
+from app import parameters
+from app.config import Config
+from app.services import position_queries
+
+SubQuery = namedtuple("SubQuery", "kind date_str date account_ids threshold")
+
+_PATHS = {
+    "/api/blotter": "blotter",
+    "/api/positions": "positions",
+    "/api/alarms": "alarms",
+    "/api/accounts/positions": "positions",
+    "/api/accounts/alarms": "alarms",
+}
+_ACCOUNT_PATH = re.compile(r"^/api/accounts/([^/]+)/(positions|alarms)$")
+
+
+class BatchQueryError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _values(params, name):
+    """Every value given for a parameter, from the query string or params"""
+    value = params.get(name)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _parse(query):
+    if not isinstance(query, dict) or not isinstance(query.get("path"), str):
+        raise BatchQueryError("each query needs a path")
+
+    url = urlsplit(query["path"])
+    params = {
+        name: values if len(values) > 1 else values[0]
+        for name, values in parse_qs(url.query).items()
+    }
+    extra = query.get("params") or {}
+    if not isinstance(extra, dict):
+        raise BatchQueryError("params must be an object")
+    params.update(extra)
+
+    account_ids = None
+    match = _ACCOUNT_PATH.match(url.path)
+    if match:
+        account_ids, kind = [match.group(1)], match.group(2)
+    elif url.path in _PATHS:
+        kind = _PATHS[url.path]
+        if url.path.startswith("/api/accounts/"):
+            account_ids = parameters.parse_list(_values(params, "account_id"))
+    else:
+        raise BatchQueryError(f"Unsupported path in batch: {url.path}", 404)
+
+    date_str = params.get("date")
+    try:
+        query_date = parameters.parse_date(date_str)
+        if account_ids is not None and not account_ids:
+            raise ValueError("account_id parameter is required")
+        threshold = (
+            parameters.parse_threshold(params.get("threshold"))
+            if kind == "alarms"
+            else None
+        )
+    except ValueError as e:
+        raise BatchQueryError(str(e)) from None
+
+    return SubQuery(kind, str(date_str), query_date, account_ids, threshold)
+
+
+def _body(query, trades, values):
+    if query.kind == "blotter":
+        return {
+            "date": query.date_str,
+            "records": [trade.to_dict() for trade in trades],
+            "count": len(trades),
+        }
+
+    rows = values
+    if query.account_ids is not None:
+        accounts = set(query.account_ids)
+        rows = [row for row in values if row.account_id in accounts]
+    if query.kind == "positions":
+        records = position_queries.format_positions(rows)
+    else:
+        threshold = query.threshold
+        if threshold is None:
+            threshold = Config.ALARM_THRESHOLD_PERCENT
+        records = position_queries.format_alarms(
+            position_queries.over_threshold(rows, threshold)
+        )
+
+    if query.account_ids is None:
+        return {"date": query.date_str, query.kind: records}
+    return {
+        "date": query.date_str,
+        "account_ids": query.account_ids,
+        query.kind: records,
+    }
+
+
+def run(queries):
+    """[{"id", "status", "body"}, ...] for the sub-queries, in order"""
+    parsed = []
+    for query in queries:
+        try:
+            parsed.append(_parse(query))
+        except BatchQueryError as e:
+            parsed.append(e)
+
+    by_date = defaultdict(dict)
+    for index, query in enumerate(parsed):
+        if isinstance(query, SubQuery):
+            by_date[query.date][index] = query
+
+    bodies = {}
+    for query_date, date_queries in by_date.items():
+        trades = values = None
+        if any(q.kind == "blotter" for q in date_queries.values()):
+            trades = position_queries.get_trades(query_date)
+
+        aggregates = [q for q in date_queries.values() if q.kind != "blotter"]
+        if aggregates:
+            if any(q.account_ids is None for q in aggregates):
+                account_ids = None
+            else:
+                account_ids = list(
+                    dict.fromkeys(a for q in aggregates for a in q.account_ids)
+                )
+            values = position_queries.get_ticker_values(query_date, account_ids)
+
+        for index, query in date_queries.items():
+            bodies[index] = _body(query, trades, values)
+
+    results = []
+    for index, (query, item) in enumerate(zip(parsed, queries)):
+        query_id = item.get("id") if isinstance(item, dict) else None
+        if isinstance(query, BatchQueryError):
+            results.append(
+                {"id": query_id, "status": query.status, "body": {"error": str(query)}}
+            )
+        else:
+            results.append({"id": query_id, "status": 200, "body": bodies[index]})
+    return results
@@ -0,0 +1,107 @@
+import logging
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RowValidationError(ValueError):
+    """Raised by row parsers when a row breaks a data-quality rule"""
+
+    def __init__(self, rule, message):
+        super().__init__(message)
+        self.rule = rule
+
+
+class DataQualityError(Exception):
+    """Raised when a file has too many bad rows to be worth ingesting"""
+
+    def __init__(self, report):
+        super().__init__(
+            f"Rejected {report.filename}: more than {report.max_bad_rows} bad rows"
+        )
+        self.report = report
+
+
+class DataQualityReport:
+    """Per-file tally of rule violations with a bounded number of sample rows.
+
+    Rows are counted, not logged, so a badly formatted file costs a dict
+    increment per bad row instead of a formatted log line.
+    """
+
+    def __init__(self, filename, max_bad_rows=None, sample_size=None):
+        self.filename = filename
+        self.max_bad_rows = (
+            Config.DATA_QUALITY_MAX_BAD_ROWS if max_bad_rows is None else max_bad_rows
+        )
+        self.sample_size = (
+            Config.DATA_QUALITY_SAMPLE_SIZE if sample_size is None else sample_size
+        )
+        self.bad_rows = 0
+        self.rejected = False
+        self.violations = {}
+        self.samples = {}
+
+    @property
+    def has_issues(self):
+        return self.bad_rows > 0
+
+    def record(self, rule, line_number, row, message):
+        """Count a violation; raises DataQualityError once the file is over the limit"""
+        self.bad_rows += 1
+        self.violations[rule] = self.violations.get(rule, 0) + 1
+
+        samples = self.samples.setdefault(rule, [])
+        if len(samples) < self.sample_size:
+            samples.append(
+                {"line": line_number, "row": str(row)[:200], "error": message}
+            )
+
+        self._check_limit()
+
+    def resume(self, bad_rows):
+        """Carry over the bad rows of a file's already committed chunks, so a
+        file cannot pass the limit by failing and resuming"""
+        self.bad_rows += bad_rows
+        self._check_limit()
+
+    def merge(self, summary, **annotations):
+        """Fold in another report's to_dict(), e.g. one built in a parser process.
+
+        `annotations` are added to the merged samples, so a sample can say
+        which part of the file it came from.
+        """
+        self.bad_rows += summary["bad_rows"]
+        for rule, count in summary["violations"].items():
+            self.violations[rule] = self.violations.get(rule, 0) + count
+
+        for rule, rows in summary["samples"].items():
+            samples = self.samples.setdefault(rule, [])
+            for sample in rows[: max(self.sample_size - len(samples), 0)]:
+                samples.append(dict(sample, **annotations))
+
+        if summary.get("rejected"):
+            self.rejected = True
+            raise DataQualityError(self)
+        self._check_limit()
+
+    def _check_limit(self):
+        if self.max_bad_rows and self.bad_rows > self.max_bad_rows:
+            self.rejected = True
+            raise DataQualityError(self)
+
+    def issues(self):
+        """One human-readable line per violated rule"""
+        return [
+            f"{rule}: {count} rows" for rule, count in sorted(self.violations.items())
+        ]
+
+    def to_dict(self):
+        return {
+            "filename": self.filename,
+            "bad_rows": self.bad_rows,
+            "rejected": self.rejected,
+            "violations": dict(self.violations),
+            "samples": {rule: list(rows) for rule, rows in self.samples.items()},
+        }
@@ -0,0 +1,157 @@
+"""Per-trade-date data versions and trade counts.
+
+Ingestion bumps the version of every trade date it wrote, and adds the rows
+it wrote to that date's count, just before the commit that makes those rows
+visible, in the same transaction. The API reads the version before running
+any query, so a response is never labelled with a version newer than its
+data. /metrics sums the counts instead of counting trades.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Trade, TradeArchive, TradeDateVersion
+from app.services import sharding, sql
+
+logger = logging.getLogger(__name__)
+
+
+def _upsert_statement(dialect):
+    return sql.upsert_statement(
+        dialect,
+        TradeDateVersion,
+        ["trade_date"],
+        lambda excluded: {
+            "version": TradeDateVersion.version + 1,
+            "trade_count": TradeDateVersion.trade_count + excluded.trade_count,
+            "updated_at": excluded.updated_at,
+        },
+    )
+
+
+class DataVersionService:
+    @staticmethod
+    def bump(trade_counts):
+        """Bump each date's version and add the rows written to it.
+
+        `trade_counts` maps trade dates to the rows just written. Call right
+        before committing: the version rows stay locked until the commit, so
+        bumping last keeps concurrent ingests of the same date from waiting
+        on each other.
+        """
+        if not trade_counts:
+            return
+
+        now = datetime.utcnow()
+        statement = _upsert_statement(db.session.get_bind().dialect.name)
+        if statement is not None:
+            db.session.execute(
+                statement,
+                [
+                    {
+                        "trade_date": trade_date,
+                        "version": 1,
+                        "trade_count": trade_counts[trade_date],
+                        "updated_at": now,
+                    }
+                    for trade_date in sorted(trade_counts)
+                ],
+            )
+            return
+
+        for trade_date in sorted(trade_counts):
+            row = db.session.get(TradeDateVersion, trade_date)
+            if row is None:
+                db.session.add(
+                    TradeDateVersion(
+                        trade_date=trade_date,
+                        version=1,
+                        trade_count=trade_counts[trade_date],
+                        updated_at=now,
+                    )
+                )
+            else:
+                row.version += 1
+                row.trade_count += trade_counts[trade_date]
+                row.updated_at = now
+
+    @staticmethod
+    def get(trade_date):
+        """(version, updated_at) of a date; (0, None) if ingestion never wrote it"""
+        row = db.session.get(TradeDateVersion, trade_date)
+        if row is None:
+            return 0, None
+        return row.version, row.updated_at
+
+    @staticmethod
+    def totals():
+        """(total trades, latest trade date) from the per-date counts"""
+        total, latest = (
+            db.session.query(
+                func.sum(TradeDateVersion.trade_count),
+                func.max(TradeDateVersion.trade_date),
+            )
+            .filter(TradeDateVersion.trade_count > 0)
+            .one()
+        )
+        return int(total or 0), latest
+
+    @staticmethod
+    def reconcile():
+        """Recount trades per date and fix (and bump) any date that drifted.
+
+        The version rows are locked before trades are counted, so an ingest
+        committing meanwhile adds its rows after the recount rather than
+        being counted twice. Returns the number of dates corrected.
+        """
+        now = datetime.utcnow()
+        stored = {
+            row.trade_date: row for row in TradeDateVersion.query.with_for_update()
+        }
+
+        def count_trades(session):
+            return (
+                session.query(Trade.trade_date, func.count())
+                .group_by(Trade.trade_date)
+                .all()
+            )
+
+        actual = Counter()
+        if sharding.is_sharded():
+            rows = sharding.gather(count_trades)
+        else:
+            rows = count_trades(db.session)
+        for trade_date, count in rows:
+            actual[trade_date] += count
+        for archive in TradeArchive.query:
+            actual[archive.trade_date] += archive.row_count
+
+        corrected = 0
+        for trade_date in sorted(stored.keys() | actual.keys()):
+            count = actual.get(trade_date, 0)
+            row = stored.get(trade_date)
+            if row is None:
+                db.session.add(
+                    TradeDateVersion(
+                        trade_date=trade_date,
+                        version=1,
+                        trade_count=count,
+                        updated_at=now,
+                    )
+                )
+            elif row.trade_count != count:
+                row.version += 1
+                row.trade_count = count
+                row.updated_at = now
+            else:
+                continue
+            corrected += 1
+
+        db.session.commit()
+        if corrected:
+            logger.warning(f"Corrected trade counts for {corrected} trade dates")
+        return corrected
@@ -0,0 +1,223 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import stat
+import struct
+import sys
+import time
+
+from app.config import Config
+from app.services.streams import INGESTIBLE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Flags from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal ctypes binding for inotify, so the watcher needs no extra package"""
+
+    def __init__(self, path, mask):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout):
+        """Return (mask, name) pairs, waiting up to `timeout` seconds for events"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """Yields files dropped into a directory once they are fully written.
+
+    Uses inotify close-write/moved-to events on Linux and falls back to
+    polling, where a file counts as complete once its size and mtime have
+    been stable for `settle_seconds`.
+    """
+
+    def __init__(
+        self,
+        path,
+        extensions=INGESTIBLE_EXTENSIONS,
+        poll_interval=None,
+        settle_seconds=None,
+        use_inotify=True,
+    ):
+        self.path = path
+        self.extensions = tuple(extensions)
+        self.poll_interval = (
+            Config.INGEST_WATCH_POLL_INTERVAL
+            if poll_interval is None
+            else poll_interval
+        )
+        self.settle_seconds = (
+            Config.INGEST_WATCH_SETTLE_SECONDS
+            if settle_seconds is None
+            else settle_seconds
+        )
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        # name -> (size, mtime_ns) of files already handed out, so a file that
+        # failed ingestion is not retried until it is rewritten
+        self._yielded = {}
+        # name -> (size, mtime_ns) seen on the previous poll
+        self._pending = {}
+
+    def _matches(self, name):
+        return name.endswith(self.extensions) and not name.startswith(".")
+
+    def _signature(self, name):
+        try:
+            st = os.stat(os.path.join(self.path, name))
+        except FileNotFoundError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _claim(self, name, signature):
+        if signature is None or self._yielded.get(name) == signature:
+            return False
+        self._yielded[name] = signature
+        return True
+
+    def poll(self):
+        """One polling pass; returns files that have stopped changing"""
+        ready = []
+        now_ns = time.time_ns()
+        current = {}
+
+        for name in sorted(os.listdir(self.path)):
+            if not self._matches(name):
+                continue
+            signature = self._signature(name)
+            if signature is None:
+                continue
+            current[name] = signature
+
+            stable = self._pending.get(name) == signature
+            settled = now_ns - signature[1] >= self.settle_seconds * 1e9
+            if stable and settled and self._claim(name, signature):
+                ready.append(name)
+
+        self._pending = current
+        self._yielded = {n: s for n, s in self._yielded.items() if n in current}
+        return ready
+
+    def _prune(self):
+        self._yielded = {
+            name: signature
+            for name, signature in self._yielded.items()
+            if self._signature(name) is not None
+        }
+
+    def _rescan(self):
+        """Claim settled files that arrived without us seeing an event for them"""
+        now_ns = time.time_ns()
+        ready = []
+        for name in sorted(os.listdir(self.path)):
+            if not self._matches(name):
+                continue
+            signature = self._signature(name)
+            if (
+                signature is not None
+                and now_ns - signature[1] >= self.settle_seconds * 1e9
+                and self._claim(name, signature)
+            ):
+                ready.append(name)
+        return ready
+
+    def _settling(self):
+        """Whether any file is still inside its settle time"""
+        now_ns = time.time_ns()
+        for name in os.listdir(self.path):
+            signature = self._signature(name) if self._matches(name) else None
+            if (
+                signature is not None
+                and now_ns - signature[1] < self.settle_seconds * 1e9
+            ):
+                return True
+        return False
+
+    def _watch_inotify(self, should_stop):
+        inotify = _Inotify(self.path, IN_CLOSE_WRITE | IN_MOVED_TO)
+        logger.info(f"Watching {self.path} with inotify")
+
+        try:
+            # Files that landed while nothing was watching. One still inside
+            # its settle time may have been closed already, with no event
+            # coming for it, so look again once it has settled.
+            yield from self._rescan()
+            rescan_at = (
+                time.monotonic() + self.settle_seconds if self._settling() else None
+            )
+
+            while not should_stop():
+                events = inotify.read(self.poll_interval)
+                if not events:
+                    self._prune()
+                if rescan_at is not None and time.monotonic() >= rescan_at:
+                    rescan_at = None
+                    yield from self._rescan()
+                for mask, name in events:
+                    if mask & IN_Q_OVERFLOW:
+                        logger.warning("inotify queue overflowed, rescanning")
+                        yield from self._rescan()
+                    elif self._matches(name) and self._claim(
+                        name, self._signature(name)
+                    ):
+                        yield name
+        finally:
+            inotify.close()
+
+    def _watch_polling(self, should_stop):
+        logger.info(
+            f"Polling {self.path} every {self.poll_interval}s "
+            f"(settle time {self.settle_seconds}s)"
+        )
+        while not should_stop():
+            yield from self.poll()
+            time.sleep(self.poll_interval)
+
+    def watch(self, should_stop=lambda: False):
+        """Generator of ready file names until `should_stop()` returns True"""
+        if self.use_inotify:
+            try:
+                yield from self._watch_inotify(should_stop)
+                return
+            except OSError as e:
+                logger.warning(f"inotify unavailable ({e}), falling back to polling")
+
+        yield from self._watch_polling(should_stop)
@@ -1,129 +1,443 @@
-import csv
+import hashlib
 import io
+import itertools
 import logging
+import os
+from collections import Counter
 from datetime import datetime
 
+from sqlalchemy import insert
+
 from app import db
-from app.models import Trade
+from app.config import Config
+from app.models import TRADE_COLUMNS, IngestionCheckpoint, Trade
+from app.services import formats, ingestion_trace, sharding
+from app.services.alerting_service import AlertingService
+from app.services.data_quality import DataQualityError, DataQualityReport
+from app.services.data_versions import DataVersionService
+from app.services.parallel_parser import ParallelParser
+from app.services.position_history import PositionHistoryService
+from app.services.staging_loader import StagingLoader
+from app.services.streams import iter_file_lines
 
 logger = logging.getLogger(__name__)
 
 
+def _iter_lines(file_content):
+    """Accept either a whole file as a string or any iterable of text lines"""
+    if isinstance(file_content, str):
+        return io.StringIO(file_content.strip())
+    return file_content
+
+
+def _file_fingerprint(path, chunk_size=1024 * 1024):
+    """Identify a local file by size and a hash of its whole content, stable
+    across copies; a completed fingerprint is never ingested again, so a
+    correction anywhere in the file must change it"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return f"{os.path.getsize(path)}:{digest.hexdigest()}"
+
+
+class _OffsetTracker:
+    """Iterate text lines while counting how many input bytes they cover"""
+
+    def __init__(self, lines, offset=0):
+        self._lines = iter(lines)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        self.offset += len(line.encode("utf-8"))
+        return line
+
+    def skip_to(self, offset, keep_header=False):
+        """Consume lines up to `offset`, optionally handing back the first line"""
+        header = [next(self, "")] if keep_header and offset else []
+        while self.offset < offset:
+            if next(self, None) is None:
+                break
+        return itertools.chain(header, self)
+
+
 class FileIngestionService:
     @staticmethod
-    def parse_format1(file_content):
+    def _parse(format_name, file_content, report):
+        trade_format = formats.get_format(format_name)
+        return [
+            Trade(**values)
+            for batch in trade_format.iter_batches(_iter_lines(file_content), report)
+            for values in batch
+        ]
+
+    @staticmethod
+    def parse_format1(file_content, report=None):
         """Parse CSV format: TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate"""
-        trades = []
-        reader = csv.DictReader(io.StringIO(file_content))
+        report = report or DataQualityReport("<format1>")
+        return FileIngestionService._parse("format1", file_content, report)
 
-        for row in reader:
-            try:
-                trade_date = datetime.strptime(row["TradeDate"], "%Y-%m-%d").date()
-                settlement_date = (
-                    datetime.strptime(row["SettlementDate"], "%Y-%m-%d").date()
-                    if row.get("SettlementDate")
-                    else None
-                )
+    @staticmethod
+    def parse_format2(file_content, report=None):
+        """Parse pipe-delimited format: REPORT_DATE|ACCOUNT_ID|SECURITY_TICKER|SHARES|MARKET_VALUE|SOURCE_SYSTEM"""
+        report = report or DataQualityReport("<format2>")
+        return FileIngestionService._parse("format2", file_content, report)
 
-                quantity = int(row["Quantity"])
-                price = float(row["Price"])
-                market_value = quantity * price
-
-                # Handle SELL trades (negative quantity)
-                if row.get("TradeType", "").upper() == "SELL":
-                    quantity = -abs(quantity)
-                    market_value = -abs(market_value)
-
-                trade = Trade(
-                    trade_date=trade_date,
-                    account_id=row["AccountID"],
-                    ticker=row["Ticker"],
-                    quantity=quantity,
-                    price=price,
-                    market_value=market_value,
-                    trade_type=row.get("TradeType", "BUY"),
-                    settlement_date=settlement_date,
-                )
-                trades.append(trade)
-            except Exception as e:
-                logger.error(f"Error parsing row {row}: {str(e)}")
-                continue
+    @staticmethod
+    def detect_format(file_content):
+        """Detect file format from the first few KB of content"""
+        head, _ = formats.peek_head(_iter_lines(file_content[: formats.SNIFF_BYTES]))
+        return formats.detect_format(head).name
 
-        return trades
+    @staticmethod
+    def send_quality_alert(report):
+        """Emit one consolidated data-quality alert for a file, if it had issues"""
+        if not report.has_issues:
+            return False
+
+        logger.warning(
+            f"Data quality issues in {report.filename}: {report.bad_rows} bad rows "
+            f"({', '.join(report.issues())})"
+        )
+        return AlertingService().send_data_quality_alert(
+            report.filename, report.issues(), summary=report.to_dict()
+        )
 
     @staticmethod
-    def parse_format2(file_content):
-        """Parse pipe-delimited format: REPORT_DATE|ACCOUNT_ID|SECURITY_TICKER|SHARES|MARKET_VALUE|SOURCE_SYSTEM"""
-        trades = []
-        lines = file_content.strip().split("\n")
+    def write_batch(rows, shards=None, position_deltas=None):
+        """Bulk-insert one batch of Trade column dicts in a single executemany.
 
-        for line in lines:
-            if not line.strip():
-                continue
+        The batch's position deltas are added to `position_deltas`, for the
+        caller to apply right before committing, or else written at once in
+        the same transaction. With a ShardWriter, the trades go to their
+        account's shard instead.
+        """
+        if shards is None:
+            db.session.execute(
+                insert(Trade), [{c: row.get(c) for c in TRADE_COLUMNS} for row in rows]
+            )
+        else:
+            shards.write(rows)
+        if position_deltas is None:
+            PositionHistoryService.apply_rows(rows)
+        else:
+            PositionHistoryService.fold_rows(position_deltas, rows)
 
+    @staticmethod
+    def _commit(shards):
+        """Commit the shards' transactions (if sharded), then the primary one"""
+        with ingestion_trace.timed("commit", commits=1):
+            if shards is not None:
+                shards.commit()
+            db.session.commit()
+            if shards is not None:
+                shards.forget()
+
+    @staticmethod
+    def refresh_position_snapshots():
+        """Extend position snapshots after a file has been committed.
+
+        Snapshots are derived data, so a failure is logged rather than failing
+        an ingest that already landed.
+        """
+        try:
+            with ingestion_trace.span("position_snapshots"):
+                PositionHistoryService.refresh_snapshots()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error refreshing position snapshots: {str(e)}")
+
+    @staticmethod
+    def _ingest_batches(batches, report, source_name):
+        """Write parsed batches in one transaction and alert once for the file.
+
+        In staging mode the batches go to a staging table and are published
+        to trades with one set-based statement at the end. Sharded databases
+        are always loaded directly.
+        """
+        count = 0
+        shards = sharding.ShardWriter(source_name) if sharding.is_sharded() else None
+        batches = ingestion_trace.timed_iter("parse", batches)
+        try:
             try:
-                parts = line.split("|")
-                if len(parts) < 6:
-                    continue
-
-                # Parse date from YYYYMMDD format
-                date_str = parts[0]
-                trade_date = datetime.strptime(date_str, "%Y%m%d").date()
-
-                shares = int(parts[3])
-                market_value = float(parts[4])
-
-                trade = Trade(
-                    trade_date=trade_date,
-                    account_id=parts[1],
-                    ticker=parts[2],
-                    quantity=shares,
-                    market_value=market_value,
-                    price=abs(market_value / shares) if shares != 0 else None,
-                    source_system=parts[5] if len(parts) > 5 else None,
-                )
-                trades.append(trade)
-            except Exception as e:
-                logger.error(f"Error parsing line {line}: {str(e)}")
-                continue
+                if shards is not None:
+                    shards.recover()
+                if Config.INGEST_LOAD_MODE == "staging" and shards is None:
+                    loader = StagingLoader()
+                    for batch in batches:
+                        with ingestion_trace.timed("db_write", rows=len(batch)):
+                            loader.write_batch(batch)
+                    with ingestion_trace.span("publish") as span:
+                        count = loader.publish(report)
+                        span.set(rows=count)
+                else:
+                    trade_counts = Counter()
+                    position_deltas = {}
+                    for batch in batches:
+                        with ingestion_trace.timed("db_write", rows=len(batch)):
+                            FileIngestionService.write_batch(
+                                batch, shards, position_deltas
+                            )
+                        trade_counts.update(row["trade_date"] for row in batch)
+                        count += len(batch)
+                    with ingestion_trace.timed("db_write"):
+                        PositionHistoryService.apply_deltas(position_deltas.values())
+                        DataVersionService.bump(trade_counts)
+            finally:
+                ingestion_trace.add("parse", bad_rows=report.bad_rows)
+                # One consolidated alert per file, including files rejected early
+                FileIngestionService.send_quality_alert(report)
 
-        return trades
+            FileIngestionService._commit(shards)
+            logger.info(f"Successfully ingested {count} trades from {source_name}")
+            FileIngestionService.refresh_position_snapshots()
+            return count
+        except Exception as e:
+            db.session.rollback()
+            if shards is not None:
+                shards.rollback()
+            logger.error(f"Error ingesting trades from {source_name}: {str(e)}")
+            raise
+        finally:
+            if shards is not None:
+                shards.close()
 
     @staticmethod
-    def detect_format(file_content):
-        """Detect file format based on content"""
-        first_line = file_content.strip().split("\n")[0] if file_content.strip() else ""
+    def begin_checkpoint(source_name, fingerprint):
+        """Checkpoint to continue from, or None if this file already completed"""
+        checkpoint = IngestionCheckpoint.query.filter_by(source=source_name).first()
 
-        if "|" in first_line:
-            return "format2"
-        elif "," in first_line and "TradeDate" in first_line:
-            return "format1"
+        if checkpoint is None:
+            checkpoint = IngestionCheckpoint(
+                source=source_name, fingerprint=fingerprint
+            )
+            db.session.add(checkpoint)
+        elif checkpoint.fingerprint == fingerprint and checkpoint.status not in (
+            "complete",
+            "rejected",
+        ):
+            if checkpoint.byte_offset:
+                logger.info(
+                    f"Resuming {source_name} at byte {checkpoint.byte_offset} "
+                    f"({checkpoint.rows_committed} rows already committed)"
+                )
+        elif checkpoint.fingerprint == fingerprint and fingerprint is not None:
+            if checkpoint.status == "rejected":
+                logger.warning(
+                    f"{source_name} was rejected for data quality; skipping it "
+                    f"until a corrected file arrives"
+                )
+            return None
         else:
-            raise ValueError("Unknown file format")
+            # A new file under a known name (or one with no fingerprint)
+            if checkpoint.status != "complete" and checkpoint.rows_committed:
+                logger.warning(
+                    f"{source_name} changed since its last partial ingest; "
+                    f"{checkpoint.rows_committed} rows committed from it are kept"
+                )
+            checkpoint.restart(fingerprint)
 
-    @staticmethod
-    def ingest_file(file_path):
-        """Ingest a file and save trades to database"""
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_content = f.read()
+        db.session.commit()
+        return checkpoint
 
-        format_type = FileIngestionService.detect_format(file_content)
+    @staticmethod
+    def _ingest_checkpointed(batches, report, checkpoint, source_name):
+        """Write (batch, byte_offset) pairs, committing a checkpoint every chunk.
 
-        if format_type == "format1":
-            trades = FileIngestionService.parse_format1(file_content)
-        elif format_type == "format2":
-            trades = FileIngestionService.parse_format2(file_content)
-        else:
-            raise ValueError(f"Unsupported format: {format_type}")
+        A chunk is committed once INGEST_CHECKPOINT_ROWS rows are pending and
+        the parser reports a byte offset (None means "not a safe place to
+        resume from"). The checkpoint update shares the chunk's transaction,
+        so a crash leaves rows and offset in step. The file is marked
+        complete only with its final chunk.
 
-        # Save to database
+        Bad rows are counted across runs. A file rejected for data quality is
+        marked rejected and its already committed chunks are kept, with an
+        alert saying so.
+        """
+        count = pending = 0
+        bad_rows = checkpoint.bad_rows
+        offset = checkpoint.byte_offset
+        trade_counts = Counter()
+        position_deltas = {}
+        shards = sharding.ShardWriter(source_name) if sharding.is_sharded() else None
+        batches = ingestion_trace.timed_iter("parse", batches)
         try:
-            for trade in trades:
-                db.session.add(trade)
-            db.session.commit()
-            logger.info(f"Successfully ingested {len(trades)} trades from {file_path}")
-            return len(trades)
+            try:
+                if shards is not None:
+                    # Undo chunks a shard committed but the primary did not
+                    shards.recover()
+                report.resume(bad_rows)
+                for batch, batch_offset in batches:
+                    if batch:
+                        with ingestion_trace.timed("db_write", rows=len(batch)):
+                            FileIngestionService.write_batch(
+                                batch, shards, position_deltas
+                            )
+                        trade_counts.update(row["trade_date"] for row in batch)
+                        count += len(batch)
+                        pending += len(batch)
+                    if batch_offset is None:
+                        continue
+                    offset = batch_offset
+                    if pending >= Config.INGEST_CHECKPOINT_ROWS:
+                        checkpoint.advance(offset, pending, report.bad_rows - bad_rows)
+                        PositionHistoryService.apply_deltas(position_deltas.values())
+                        DataVersionService.bump(trade_counts)
+                        FileIngestionService._commit(shards)
+                        pending, bad_rows = 0, report.bad_rows
+                        trade_counts.clear()
+                        position_deltas.clear()
+            finally:
+                ingestion_trace.add("parse", bad_rows=report.bad_rows)
+                FileIngestionService.send_quality_alert(report)
+
+            checkpoint.advance(offset, pending, report.bad_rows - bad_rows)
+            PositionHistoryService.apply_deltas(position_deltas.values())
+            DataVersionService.bump(trade_counts)
+            checkpoint.status = "complete"
+            checkpoint.completed_at = datetime.utcnow()
+            FileIngestionService._commit(shards)
+            logger.info(
+                f"Successfully ingested {count} trades from {source_name} "
+                f"({checkpoint.rows_committed} in total)"
+            )
+            FileIngestionService.refresh_position_snapshots()
+            return count
+        except DataQualityError as e:
+            db.session.rollback()
+            if shards is not None:
+                shards.rollback()
+            FileIngestionService._reject_checkpoint(checkpoint, report, source_name)
+            logger.error(f"Error ingesting trades from {source_name}: {str(e)}")
+            raise
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Error saving trades to database: {str(e)}")
+            if shards is not None:
+                shards.rollback()
+            logger.error(
+                f"Error ingesting trades from {source_name} after {count} rows; "
+                f"committed chunks are kept and the next run resumes: {str(e)}"
+            )
             raise
+        finally:
+            if shards is not None:
+                shards.close()
+
+    @staticmethod
+    def _reject_checkpoint(checkpoint, report, source_name):
+        """Mark a file rejected for data quality, so it is not resumed"""
+        checkpoint.status = "rejected"
+        checkpoint.bad_rows = report.bad_rows
+        checkpoint.completed_at = datetime.utcnow()
+        db.session.commit()
+
+        if checkpoint.rows_committed:
+            # Trades do not record their file, so the rows cannot be removed
+            message = (
+                f"Rejected for data quality after {checkpoint.rows_committed} rows "
+                f"were committed in earlier chunks; those rows were kept"
+            )
+            logger.warning(f"{source_name}: {message}")
+            AlertingService().send_ingestion_failure_alert(source_name, message)
+
+    @staticmethod
+    def _detect(head, source_name):
+        with ingestion_trace.span("detect") as span:
+            trade_format = formats.detect_format(head)
+            span.set(format=trade_format.name)
+        logger.info(f"Detected {trade_format.name} for {source_name}")
+        return trade_format, DataQualityReport(os.path.basename(source_name))
+
+    @staticmethod
+    def ingest_stream(lines, source_name, fingerprint=None):
+        """Ingest trades from any iterable of text lines (open file, S3 body, ...).
+
+        With INGEST_CHECKPOINT_ROWS set, rows are committed in chunks and a
+        rerun for the same source and fingerprint resumes after the last
+        committed chunk instead of starting over.
+        """
+        if Config.INGEST_CHECKPOINT_ROWS:
+            return FileIngestionService._ingest_stream_checkpointed(
+                lines, source_name, fingerprint
+            )
+
+        head, lines = formats.peek_head(lines)
+        trade_format, report = FileIngestionService._detect(head, source_name)
+
+        batches = trade_format.iter_batches(lines, report, Config.INGEST_BATCH_SIZE)
+        return FileIngestionService._ingest_batches(batches, report, source_name)
+
+    @staticmethod
+    def _ingest_stream_checkpointed(lines, source_name, fingerprint):
+        checkpoint = FileIngestionService.begin_checkpoint(source_name, fingerprint)
+        if checkpoint is None:
+            logger.info(f"{source_name} has nothing left to ingest, skipping")
+            return 0
+
+        # Count leading blank lines here, as peek_head drops them
+        lines = iter(lines)
+        skipped = 0
+        for line in lines:
+            if line.strip():
+                lines = itertools.chain([line], lines)
+                break
+            skipped += len(line.encode("utf-8"))
+
+        head, lines = formats.peek_head(lines)
+        trade_format, report = FileIngestionService._detect(head, source_name)
+
+        tracker = _OffsetTracker(lines, offset=skipped)
+        lines = tracker.skip_to(checkpoint.byte_offset, trade_format.needs_header)
+        batches = (
+            (batch, tracker.offset)
+            for batch in trade_format.iter_batches(
+                lines, report, Config.INGEST_BATCH_SIZE
+            )
+        )
+        return FileIngestionService._ingest_checkpointed(
+            batches, report, checkpoint, source_name
+        )
+
+    @staticmethod
+    def ingest_file(file_path, source_name=None):
+        """Ingest a file and save trades to database.
+
+        `source_name` identifies the file for checkpoints when `file_path` is
+        a temporary copy (e.g. an SFTP download).
+        """
+        source_name = source_name or file_path
+        fingerprint = (
+            _file_fingerprint(file_path) if Config.INGEST_CHECKPOINT_ROWS else None
+        )
+
+        parser = ParallelParser()
+        if not parser.should_split(file_path):
+            with open(file_path, "rb") as f:
+                # gzip/zstd/zip input is detected and decompressed while streaming
+                return FileIngestionService.ingest_stream(
+                    iter_file_lines(f), source_name, fingerprint
+                )
+
+        # Large plain files are parsed on several processes by byte range
+        with open(file_path, "rb") as f:
+            head, _ = formats.peek_head(iter_file_lines(f))
+        trade_format, report = FileIngestionService._detect(head, source_name)
+
+        if not Config.INGEST_CHECKPOINT_ROWS:
+            batches = parser.iter_batches(file_path, trade_format, report)
+            return FileIngestionService._ingest_batches(batches, report, source_name)
+
+        checkpoint = FileIngestionService.begin_checkpoint(source_name, fingerprint)
+        if checkpoint is None:
+            logger.info(f"{source_name} has nothing left to ingest, skipping")
+            return 0
+        batches = parser.iter_batch_offsets(
+            file_path, trade_format, report, start=checkpoint.byte_offset
+        )
+        return FileIngestionService._ingest_checkpointed(
+            batches, report, checkpoint, source_name
+        )
@@ -0,0 +1,490 @@
+"""Registry of input file formats.
+
+Each format sniffs the first few KB of a file and turns its lines into
+batches of Trade column values. New formats plug in by subclassing
+TradeFormat and calling register_format; the ingestion pipeline does not
+change.
+"""
+
+import csv
+import itertools
+import json
+import logging
+from datetime import datetime
+
+from app.config import Config, load_json_setting
+from app.models import Trade
+from app.services.data_quality import RowValidationError
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 4096
+
+ACCOUNT_ID_MAX_LENGTH = Trade.__table__.c.account_id.type.length
+TICKER_MAX_LENGTH = Trade.__table__.c.ticker.type.length
+
+_FORMATS = []
+
+
+def _parse_date(value, fmt, rule):
+    try:
+        return datetime.strptime(value.strip(), fmt).date()
+    except (AttributeError, TypeError, ValueError):
+        raise RowValidationError(rule, f"cannot parse date {value!r}")
+
+
+def _parse_int(value, rule):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowValidationError(rule, f"cannot parse integer {value!r}")
+
+
+def _parse_float(value, rule):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise RowValidationError(rule, f"cannot parse number {value!r}")
+
+
+def _first_line(head):
+    for line in head.splitlines():
+        if line.strip():
+            return line
+    return ""
+
+
+def validate_trade(values):
+    """Validation stage applied to every parsed row before it is written"""
+    account_id = values.get("account_id")
+    ticker = values.get("ticker")
+
+    if not account_id:
+        raise RowValidationError("missing_account_id", "account id is empty")
+    if not ticker:
+        raise RowValidationError("missing_ticker", "ticker is empty")
+    if len(account_id) > ACCOUNT_ID_MAX_LENGTH:
+        raise RowValidationError(
+            "account_id_too_long", f"account id longer than {ACCOUNT_ID_MAX_LENGTH}"
+        )
+    if len(ticker) > TICKER_MAX_LENGTH:
+        raise RowValidationError(
+            "ticker_too_long", f"ticker longer than {TICKER_MAX_LENGTH}"
+        )
+
+    return values
+
+
+class TradeFormat:
+    """Base class for an input format.
+
+    Subclasses implement sniff, iter_records and parse_record; iter_batches
+    applies validation and data-quality accounting and yields lists of
+    Trade column dicts. Formats that can do better than row-at-a-time may
+    override iter_batches directly.
+    """
+
+    name = None
+    # Lower values are sniffed first, so specific formats win over generic ones
+    priority = 100
+    # True when every chunk of the file needs the first line (column names)
+    # to be parsed, e.g. when a file is split for parallel parsing
+    needs_header = False
+
+    def sniff(self, head):
+        """Return True if `head` (the first few KB of the file) is in this format"""
+        raise NotImplementedError
+
+    def iter_records(self, lines):
+        """Yield (line_number, record) for every data record in `lines`"""
+        raise NotImplementedError
+
+    def parse_record(self, record):
+        """Turn one record into Trade column values, raising RowValidationError"""
+        raise NotImplementedError
+
+    def iter_batches(self, lines, report, batch_size=None):
+        batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        batch = []
+
+        for line_number, record in self.iter_records(lines):
+            try:
+                batch.append(validate_trade(self.parse_record(record)))
+            except RowValidationError as e:
+                report.record(e.rule, line_number, record, str(e))
+                continue
+            except Exception as e:
+                report.record("unparseable_row", line_number, record, str(e))
+                continue
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+
+class Format1(TradeFormat):
+    """CSV format: TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate"""
+
+    name = "format1"
+    needs_header = True
+    delimiter = ","
+    date_format = "%Y-%m-%d"
+
+    def sniff(self, head):
+        first_line = _first_line(head)
+        return self.delimiter in first_line and "TradeDate" in first_line
+
+    def iter_records(self, lines):
+        reader = csv.DictReader(lines, delimiter=self.delimiter)
+        for row in reader:
+            yield reader.line_num, row
+
+    def parse_record(self, row):
+        trade_date = _parse_date(
+            row.get("TradeDate"), self.date_format, "invalid_trade_date"
+        )
+        settlement_date = (
+            _parse_date(
+                row["SettlementDate"], self.date_format, "invalid_settlement_date"
+            )
+            if row.get("SettlementDate")
+            else None
+        )
+
+        quantity = _parse_int(row.get("Quantity"), "invalid_quantity")
+        price = _parse_float(row.get("Price"), "invalid_price")
+        market_value = quantity * price
+
+        # Handle SELL trades (negative quantity)
+        if (row.get("TradeType") or "").upper() == "SELL":
+            quantity = -abs(quantity)
+            market_value = -abs(market_value)
+
+        return {
+            "trade_date": trade_date,
+            "account_id": row.get("AccountID"),
+            "ticker": row.get("Ticker"),
+            "quantity": quantity,
+            "price": price,
+            "market_value": market_value,
+            "trade_type": row.get("TradeType", "BUY"),
+            "settlement_date": settlement_date,
+            "source_system": row.get("SourceSystem"),
+        }
+
+
+class Format2(TradeFormat):
+    """Pipe-delimited format: REPORT_DATE|ACCOUNT_ID|SECURITY_TICKER|SHARES|MARKET_VALUE|SOURCE_SYSTEM"""
+
+    name = "format2"
+    # Checked before format1, as the original detection did
+    priority = 90
+
+    def sniff(self, head):
+        return "|" in _first_line(head)
+
+    def iter_records(self, lines):
+        for line_number, line in enumerate(lines, start=1):
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            if line_number == 1 and line.startswith("REPORT_DATE|"):
+                # Optional header row
+                continue
+            yield line_number, line
+
+    def parse_record(self, line):
+        parts = line.split("|")
+        if len(parts) < 6:
+            raise RowValidationError(
+                "malformed_row", f"expected 6 fields, found {len(parts)}"
+            )
+
+        # Parse date from YYYYMMDD format
+        trade_date = _parse_date(parts[0], "%Y%m%d", "invalid_trade_date")
+
+        shares = _parse_int(parts[3], "invalid_quantity")
+        market_value = _parse_float(parts[4], "invalid_market_value")
+
+        return {
+            "trade_date": trade_date,
+            "account_id": parts[1],
+            "ticker": parts[2],
+            "quantity": shares,
+            "market_value": market_value,
+            "price": abs(market_value / shares) if shares != 0 else None,
+            "source_system": parts[5] if len(parts) > 5 else None,
+        }
+
+
+class JsonLinesFormat(TradeFormat):
+    """One JSON object per line, keyed by Trade column names.
+
+    {"trade_date": "2025-01-15", "account_id": "ACC001", "ticker": "AAPL",
+     "quantity": 100, "price": 185.5, "trade_type": "BUY"}
+
+    market_value defaults to quantity * price, and SELL trades are signed
+    negative like format1.
+    """
+
+    name = "jsonl"
+    priority = 10
+
+    def sniff(self, head):
+        first_line = _first_line(head).strip()
+        if not first_line.startswith("{"):
+            return False
+        try:
+            return "account_id" in json.loads(first_line)
+        except ValueError:
+            return False
+
+    def iter_records(self, lines):
+        for line_number, line in enumerate(lines, start=1):
+            if line.strip():
+                yield line_number, line
+
+    def parse_record(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise RowValidationError("malformed_row", f"invalid JSON: {e}")
+        if not isinstance(record, dict):
+            raise RowValidationError("malformed_row", "expected a JSON object")
+
+        quantity = _parse_int(record.get("quantity"), "invalid_quantity")
+        price = (
+            _parse_float(record["price"], "invalid_price")
+            if record.get("price") is not None
+            else None
+        )
+        if record.get("market_value") is not None:
+            market_value = _parse_float(record["market_value"], "invalid_market_value")
+        elif price is not None:
+            market_value = quantity * price
+        else:
+            raise RowValidationError(
+                "invalid_market_value", "either price or market_value is required"
+            )
+
+        trade_type = record.get("trade_type")
+        if (trade_type or "").upper() == "SELL":
+            quantity = -abs(quantity)
+            market_value = -abs(market_value)
+
+        settlement_date = record.get("settlement_date")
+        return {
+            "trade_date": _parse_date(
+                record.get("trade_date"), "%Y-%m-%d", "invalid_trade_date"
+            ),
+            "account_id": record.get("account_id"),
+            "ticker": record.get("ticker"),
+            "quantity": quantity,
+            "price": price,
+            "market_value": market_value,
+            "trade_type": trade_type,
+            "settlement_date": (
+                _parse_date(settlement_date, "%Y-%m-%d", "invalid_settlement_date")
+                if settlement_date
+                else None
+            ),
+            "source_system": record.get("source_system"),
+        }
+
+
+class FixedWidthFormat(TradeFormat):
+    """Fixed-width records, one per line, described by `layout`.
+
+    The default layout is the 72-column custodian extract:
+      1-8 trade date (YYYYMMDD), 9-20 account, 21-30 ticker,
+      31-42 signed quantity, 43-60 signed market value, 61-72 source system
+    """
+
+    name = "fixed_width"
+    priority = 200
+    date_format = "%Y%m%d"
+    layout = (
+        ("trade_date", 0, 8),
+        ("account_id", 8, 20),
+        ("ticker", 20, 30),
+        ("quantity", 30, 42),
+        ("market_value", 42, 60),
+        ("source_system", 60, 72),
+    )
+
+    @property
+    def record_width(self):
+        return max(end for _, _, end in self.layout)
+
+    def sniff(self, head):
+        first_line = _first_line(head).rstrip("\r\n")
+        if any(delimiter in first_line for delimiter in "|,{\t"):
+            return False
+        start, end = next((s, e) for f, s, e in self.layout if f == "trade_date")
+        try:
+            datetime.strptime(first_line[start:end], self.date_format)
+        except ValueError:
+            return False
+        # Trailing blank columns are often trimmed, so allow short lines
+        return self.record_width - 16 <= len(first_line) <= self.record_width
+
+    def iter_records(self, lines):
+        for line_number, line in enumerate(lines, start=1):
+            line = line.rstrip("\r\n")
+            if line.strip():
+                yield line_number, line
+
+    def parse_record(self, line):
+        fields = {name: line[start:end].strip() for name, start, end in self.layout}
+
+        quantity = _parse_int(fields.get("quantity"), "invalid_quantity")
+        market_value = _parse_float(fields.get("market_value"), "invalid_market_value")
+        price = fields.get("price")
+
+        return {
+            "trade_date": _parse_date(
+                fields.get("trade_date"), self.date_format, "invalid_trade_date"
+            ),
+            "account_id": fields.get("account_id"),
+            "ticker": fields.get("ticker"),
+            "quantity": quantity,
+            "market_value": market_value,
+            "price": (
+                _parse_float(price, "invalid_price")
+                if price
+                else (abs(market_value / quantity) if quantity else None)
+            ),
+            "trade_type": fields.get("trade_type") or None,
+            "source_system": fields.get("source_system") or None,
+        }
+
+
+class MappedDelimitedFormat(Format1):
+    """A source's own delimited layout, renamed onto format1's columns.
+
+    Configured per source through INGEST_SOURCE_MAPPINGS, e.g.
+      {"name": "custodian_b", "delimiter": ";", "date_format": "%m/%d/%Y",
+       "source_system": "CUSTODIAN_B",
+       "columns": {"Trade Dt": "TradeDate", "Acct": "AccountID",
+                   "Symbol": "Ticker", "Qty": "Quantity", "Px": "Price"}}
+    """
+
+    priority = 50
+
+    def __init__(
+        self, name, columns, delimiter=",", date_format="%Y-%m-%d", source_system=None
+    ):
+        self.name = name
+        self.columns = columns
+        self.delimiter = delimiter
+        self.date_format = date_format
+        self.source_system = source_system
+
+    def sniff(self, head):
+        header = [field.strip() for field in _first_line(head).split(self.delimiter)]
+        return all(source_column in header for source_column in self.columns)
+
+    def iter_records(self, lines):
+        for line_number, row in super().iter_records(lines):
+            mapped = {
+                self.columns.get((key or "").strip(), key): value
+                for key, value in row.items()
+            }
+            if self.source_system and not mapped.get("SourceSystem"):
+                mapped["SourceSystem"] = self.source_system
+            yield line_number, mapped
+
+
+class MappedFixedWidthFormat(FixedWidthFormat):
+    """A source's own fixed-width layout, configured through INGEST_SOURCE_MAPPINGS.
+
+    "layout" lists [field, start, end] with Trade column names as fields.
+    """
+
+    priority = 150
+
+    def __init__(self, name, layout, date_format="%Y%m%d", source_system=None):
+        self.name = name
+        self.layout = tuple(tuple(field) for field in layout)
+        self.date_format = date_format
+        self.source_system = source_system
+
+    def parse_record(self, line):
+        values = super().parse_record(line)
+        values["source_system"] = values["source_system"] or self.source_system
+        return values
+
+
+def register_format(trade_format):
+    """Add a format to the registry, replacing any format with the same name"""
+    unregister_format(trade_format.name)
+    _FORMATS.append(trade_format)
+    _FORMATS.sort(key=lambda f: f.priority)
+    return trade_format
+
+
+def unregister_format(name):
+    _FORMATS[:] = [f for f in _FORMATS if f.name != name]
+
+
+def get_format(name):
+    for trade_format in _FORMATS:
+        if trade_format.name == name:
+            return trade_format
+    raise ValueError(f"Unsupported format: {name}")
+
+
+def registered_formats():
+    return list(_FORMATS)
+
+
+def detect_format(head):
+    """Pick the registered format that recognises the first few KB of a file"""
+    for trade_format in _FORMATS:
+        if trade_format.sniff(head):
+            return trade_format
+    raise ValueError("Unknown file format")
+
+
+def peek_head(lines, size=SNIFF_BYTES):
+    """Read whole lines until at least `size` characters are buffered.
+
+    Returns the head text and an iterator that still yields every line,
+    so detection never consumes input. Leading blank lines are dropped.
+    """
+    lines = iter(lines)
+    head_lines = []
+    buffered = 0
+
+    for line in lines:
+        if not head_lines and not line.strip():
+            continue
+        head_lines.append(line)
+        buffered += len(line)
+        if buffered >= size:
+            break
+
+    return "".join(head_lines), itertools.chain(head_lines, lines)
+
+
+def register_source_mappings(mappings):
+    """Register per-source formats from a list of mapping dicts"""
+    for mapping in mappings:
+        mapping = dict(mapping)
+        kind = mapping.pop("type", "delimited")
+        if kind == "fixed_width":
+            register_format(MappedFixedWidthFormat(**mapping))
+        else:
+            register_format(MappedDelimitedFormat(**mapping))
+
+
+for _builtin in (Format1(), Format2(), JsonLinesFormat(), FixedWidthFormat()):
+    register_format(_builtin)
+
+try:
+    register_source_mappings(load_json_setting(Config.INGEST_SOURCE_MAPPINGS))
+except (ValueError, TypeError) as e:
+    logger.error(f"Ignoring invalid INGEST_SOURCE_MAPPINGS: {str(e)}")
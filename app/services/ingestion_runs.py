@@ -0,0 +1,237 @@
+"""History of ingested files and batches, for throughput trends.
+
+Every traced file (see ingestion_trace) is recorded in ingestion_runs when
+its trace ends: source, transport, bytes, rows, rejected rows, total
+duration, milliseconds per stage and outcome. batch() records a run over
+several files in ingestion_batches, and its files point back to it.
+
+Records are written in their own session, so a file's record never lands
+in (or is rolled back with) its ingest transaction, and a failure to record
+is logged without failing the ingest.
+
+throughput() aggregates the runs of a date range, overall and per day, for
+capacity planning. Rates and latencies cover succeeded files only; failed
+files are counted separately.
+"""
+
+import logging
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import IngestionBatch, IngestionRun
+
+logger = logging.getLogger(__name__)
+
+# Days covered by /api/ingestions without a start_date
+DEFAULT_DAYS = 30
+# Most runs or batches listed per request
+MAX_LIMIT = 1000
+
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def record(trace):
+    """Store one finished file trace as an ingestion run"""
+    root = trace.root
+    stage_ms = defaultdict(float)
+    bad_rows = None
+    for span in trace.spans:
+        if span is not root:
+            stage_ms[span.name] += span.duration * 1000
+        if span.name == "parse":
+            bad_rows = span.attributes.get("bad_rows")
+
+    session = Session(db.engine)
+    try:
+        session.add(
+            IngestionRun(
+                batch_id=root.attributes.get("batch_id"),
+                source=str(root.attributes.get("source"))[:512],
+                transport=root.attributes.get("transport"),
+                status="failed" if root.status == "error" else "succeeded",
+                error=root.error,
+                bytes=root.attributes.get("bytes"),
+                rows=root.attributes.get("rows"),
+                bad_rows=bad_rows,
+                duration_ms=round(root.duration * 1000, 3),
+                stage_ms={name: round(ms, 3) for name, ms in stage_ms.items()},
+                started_at=_utc(root.start),
+            )
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error(
+            f"Could not record ingestion run for {root.attributes.get('source')}: "
+            f"{str(e)}"
+        )
+    finally:
+        session.close()
+
+
+@contextmanager
+def batch(transport):
+    """Record a run over several files; yields the batch id (None if it could
+    not be recorded) to pass to trace_file(batch_id=...)"""
+    session = Session(db.engine)
+    try:
+        entry = IngestionBatch(transport=transport)
+        session.add(entry)
+        session.commit()
+        batch_id = entry.id
+    except Exception as e:
+        session.rollback()
+        session.close()
+        logger.error(f"Could not record {transport} ingestion batch: {str(e)}")
+        yield None
+        return
+
+    failed = False
+    try:
+        yield batch_id
+    except Exception:
+        failed = True
+        raise
+    finally:
+        try:
+            files, failed_files, rows, size = (
+                session.query(
+                    func.count(IngestionRun.id),
+                    func.coalesce(
+                        func.sum(case((IngestionRun.status == "failed", 1), else_=0)), 0
+                    ),
+                    func.coalesce(func.sum(IngestionRun.rows), 0),
+                    func.coalesce(func.sum(IngestionRun.bytes), 0),
+                )
+                .filter(IngestionRun.batch_id == batch_id)
+                .one()
+            )
+            entry.files = files
+            entry.failed_files = failed_files
+            entry.rows = rows
+            entry.bytes = size
+            entry.status = "failed" if failed or failed_files else "succeeded"
+            entry.finished_at = datetime.utcnow()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Could not finish ingestion batch {batch_id}: {str(e)}")
+        finally:
+            session.close()
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def _aggregate(runs):
+    succeeded = [run for run in runs if run.status == "succeeded"]
+    seconds = sum(run.duration_ms for run in succeeded) / 1000
+    rows = sum(run.rows or 0 for run in succeeded)
+    size = sum(run.bytes or 0 for run in succeeded)
+    latencies = sorted(run.duration_ms for run in succeeded)
+
+    stage_ms = defaultdict(float)
+    for run in succeeded:
+        for name, ms in (run.stage_ms or {}).items():
+            stage_ms[name] += ms
+
+    return {
+        "files": len(runs),
+        "failed_files": len(runs) - len(succeeded),
+        "rows": rows,
+        "bad_rows": sum(run.bad_rows or 0 for run in succeeded),
+        "bytes": size,
+        "duration_ms": round(seconds * 1000, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "bytes_per_second": round(size / seconds, 1) if seconds else None,
+        "latency_ms": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "max": latencies[-1] if latencies else None,
+        },
+        "stage_ms": {name: round(ms, 3) for name, ms in sorted(stage_ms.items())},
+    }
+
+
+def _in_range(model, start_date, end_date, transport):
+    query = model.query.filter(
+        model.started_at >= datetime.combine(start_date, time.min),
+        model.started_at < datetime.combine(end_date + timedelta(days=1), time.min),
+    )
+    if transport:
+        query = query.filter(model.transport == transport)
+    return query
+
+
+class IngestionRunService:
+    @staticmethod
+    def throughput(start_date, end_date, transport=None):
+        """Aggregated throughput of the runs started in range, overall and per day"""
+        runs = (
+            _in_range(IngestionRun, start_date, end_date, transport)
+            .with_entities(
+                IngestionRun.started_at,
+                IngestionRun.status,
+                IngestionRun.rows,
+                IngestionRun.bad_rows,
+                IngestionRun.bytes,
+                IngestionRun.duration_ms,
+                IngestionRun.stage_ms,
+            )
+            .order_by(IngestionRun.started_at)
+            .all()
+        )
+
+        by_day = defaultdict(list)
+        for run in runs:
+            by_day[run.started_at.date()].append(run)
+
+        return {
+            "summary": _aggregate(runs),
+            "daily": [
+                {"date": day.isoformat(), **_aggregate(day_runs)}
+                for day, day_runs in by_day.items()
+            ],
+        }
+
+    @staticmethod
+    def runs(start_date, end_date, transport=None, status=None, limit=100):
+        """Most recent file runs started in range"""
+        query = _in_range(IngestionRun, start_date, end_date, transport)
+        if status:
+            query = query.filter(IngestionRun.status == status)
+        return [
+            run.to_dict()
+            for run in query.order_by(
+                IngestionRun.started_at.desc(), IngestionRun.id.desc()
+            )
+            .limit(limit)
+            .all()
+        ]
+
+    @staticmethod
+    def batches(start_date, end_date, transport=None, status=None, limit=100):
+        """Most recent batches started in range"""
+        query = _in_range(IngestionBatch, start_date, end_date, transport)
+        if status:
+            query = query.filter(IngestionBatch.status == status)
+        return [
+            batch.to_dict()
+            for batch in query.order_by(
+                IngestionBatch.started_at.desc(), IngestionBatch.id.desc()
+            )
+            .limit(limit)
+            .all()
+        ]
@@ -0,0 +1,289 @@
+"""Per-file stage timings for ingestion, exported as spans.
+
+trace_file(source) opens a trace for one file, as a root "ingest_file" span.
+Inside it, span(name) times a stage (sftp_connect, download, detect,
+commit, move_to_processed, ...) as a child of the innermost open span, and
+annotate() adds attributes such as bytes and rows to that span. Parsing and
+writing alternate batch by batch, so "parse" and "db_write" are timed with
+timed_iter() and timed(), which add up the busy time into one span per file.
+Outside a trace (tests, one-off calls) all of these are no-ops.
+
+Every finished trace is also recorded in the ingestion run history (see
+ingestion_runs), whatever the exporter.
+
+A finished trace goes to the exporter named by INGEST_TRACE_EXPORTER:
+"none" (default) drops them, "jsonl" appends one JSON line per span to
+INGEST_TRACE_PATH, "otel" hands the spans to the globally configured
+OpenTelemetry tracer provider (optional opentelemetry packages), and
+"package.module:Class" loads any class with an export(spans) method.
+"""
+
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from app.config import Config
+from app.services import ingestion_runs
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("ingestion_trace", default=None)
+_exporters = {}
+_exporters_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, trace_id, name, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = 0.0
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **counts):
+        for name, value in counts.items():
+            self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def fail(self, error):
+        self.status = "error"
+        self.error = str(error)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": datetime.fromtimestamp(self.start, timezone.utc).isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    def set(self, **attributes):
+        pass
+
+    def add(self, **counts):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class FileTrace:
+    def __init__(self, source, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self._stack = []
+        self._stages = {}
+        # Unset attributes (no batch_id outside a batch) are left out
+        attributes = {
+            name: value for name, value in attributes.items() if value is not None
+        }
+        self.root = self.open("ingest_file", {"source": source, **attributes})
+
+    def open(self, name, attributes=None):
+        parent = self._stack[-1].span_id if self._stack else None
+        span = Span(self.trace_id, name, parent, attributes)
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def close(self, span):
+        span.duration = time.perf_counter() - span._started
+        self._stack.remove(span)
+
+    def current(self):
+        return self._stack[-1]
+
+    def stage(self, name):
+        """The accumulating span of a stage, created under the root on first use"""
+        span = self._stages.get(name)
+        if span is None:
+            span = Span(self.trace_id, name, self.root.span_id)
+            self.spans.append(span)
+            self._stages[name] = span
+        return span
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per span to `path` (default INGEST_TRACE_PATH)"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        path = self.path or Config.INGEST_TRACE_PATH
+        if not path:
+            raise ValueError("INGEST_TRACE_PATH is not set")
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        directory = os.path.dirname(path)
+        with self._lock:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a") as f:
+                f.write(lines)
+
+
+class OpenTelemetryExporter:
+    """Replays the spans through the global OpenTelemetry tracer provider"""
+
+    def __init__(self):
+        from opentelemetry import trace
+
+        self.tracer = trace.get_tracer("pdc.ingestion")
+
+    def export(self, spans):
+        from opentelemetry import trace
+        from opentelemetry.trace import Status, StatusCode
+
+        started = {}
+        # Parents are opened before their children, so they come first
+        for span in spans:
+            parent = started.get(span.parent_id)
+            otel_span = self.tracer.start_span(
+                span.name,
+                context=trace.set_span_in_context(parent[0]) if parent else None,
+                start_time=int(span.start * 1e9),
+                attributes={
+                    name: value
+                    for name, value in span.attributes.items()
+                    if value is not None
+                },
+            )
+            if span.status == "error":
+                otel_span.set_status(Status(StatusCode.ERROR, span.error))
+            started[span.span_id] = (otel_span, span)
+
+        for otel_span, span in started.values():
+            otel_span.end(end_time=int((span.start + span.duration) * 1e9))
+
+
+EXPORTERS = {"jsonl": JsonLinesExporter, "otel": OpenTelemetryExporter}
+
+
+def get_exporter(name=None):
+    """The exporter for INGEST_TRACE_EXPORTER (or `name`); None if disabled"""
+    name = name or Config.INGEST_TRACE_EXPORTER
+    if name == "none":
+        return None
+    with _exporters_lock:
+        exporter = _exporters.get(name)
+        if exporter is None:
+            if name in EXPORTERS:
+                exporter_class = EXPORTERS[name]
+            elif ":" in name:
+                module, _, attribute = name.partition(":")
+                exporter_class = getattr(importlib.import_module(module), attribute)
+            else:
+                raise ValueError(f"Unknown ingestion trace exporter: {name}")
+            exporter = _exporters[name] = exporter_class()
+    return exporter
+
+
+@contextmanager
+def trace_file(source, **attributes):
+    """Trace the ingestion of one file; exports its spans and records the run
+    when the block exits"""
+    trace = FileTrace(source, **attributes)
+    token = _current.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.fail(e)
+        raise
+    finally:
+        _current.reset(token)
+        for span in list(trace._stack):
+            trace.close(span)
+        try:
+            exporter = get_exporter()
+            if exporter is not None:
+                exporter.export(trace.spans)
+        except Exception as e:
+            logger.error(f"Could not export ingestion trace for {source}: {str(e)}")
+        ingestion_runs.record(trace)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a stage of the traced file as a child of the innermost open span"""
+    trace = _current.get()
+    if trace is None:
+        yield _NULL_SPAN
+        return
+    current = trace.open(name, attributes)
+    try:
+        yield current
+    except Exception as e:
+        current.fail(e)
+        raise
+    finally:
+        trace.close(current)
+
+
+def annotate(**attributes):
+    """Set attributes on the innermost open span of the traced file"""
+    trace = _current.get()
+    if trace is not None:
+        trace.current().set(**attributes)
+
+
+@contextmanager
+def timed(name, **counts):
+    """Add the block's time (and counts) to the file's `name` stage span"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    stage = trace.stage(name)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        stage.fail(e)
+        raise
+    finally:
+        stage.duration += time.perf_counter() - started
+        stage.add(**counts)
+
+
+def timed_iter(name, iterable):
+    """Yield from `iterable`, adding the time spent producing items to `name`"""
+    if _current.get() is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with timed(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def add(name, **counts):
+    """Add counts to the file's `name` stage span"""
+    trace = _current.get()
+    if trace is not None:
+        trace.stage(name).add(**counts)
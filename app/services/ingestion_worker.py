@@ -2,6 +2,7 @@ import logging
 import os
 import tempfile
 
+from app.services import ingestion_runs, ingestion_trace
 from app.services.alerting_service import AlertingService
 from app.services.file_ingestion import FileIngestionService
 from app.services.sftp_service import SFTPService
@@ -18,36 +19,53 @@ class IngestionWorker:
     def process_files(self):
         """Process all files from SFTP server"""
         try:
-            files = self.sftp_service.list_files()
-            logger.info(f"Found {len(files)} files to process")
-
-            for filename in files:
-                try:
-                    self.process_file(filename)
-                except Exception as e:
-                    logger.error(f"Error processing file {filename}: {str(e)}")
-                    self.alerting_service.send_ingestion_failure_alert(filename, str(e))
+            with ingestion_runs.batch("sftp") as batch_id:
+                files = self.sftp_service.list_files()
+                logger.info(f"Found {len(files)} files to process")
+
+                for filename in files:
+                    try:
+                        self.process_file(filename, batch_id=batch_id)
+                    except Exception as e:
+                        logger.error(f"Error processing file {filename}: {str(e)}")
+                        self.alerting_service.send_ingestion_failure_alert(
+                            filename, str(e)
+                        )
         except Exception as e:
             logger.error(f"Error listing files from SFTP: {str(e)}")
             raise
 
-    def process_file(self, filename):
-        """Process a single file"""
+    def process_file(self, filename, batch_id=None):
+        """Process a single file, as part of batch `batch_id` if given"""
         with tempfile.NamedTemporaryFile(
             mode="w+", delete=False, suffix=".tmp"
         ) as tmp_file:
             tmp_path = tmp_file.name
 
         try:
-            # Download file
-            self.sftp_service.download_file(filename, tmp_path)
+            with ingestion_trace.trace_file(
+                filename, transport="sftp", batch_id=batch_id
+            ) as trace:
+                # Download file
+                with ingestion_trace.span("download") as span:
+                    self.sftp_service.download_file(filename, tmp_path)
+                    span.set(bytes=os.path.getsize(tmp_path))
 
-            # Ingest file
-            count = self.ingestion_service.ingest_file(tmp_path)
-            logger.info(f"Successfully processed {filename}: {count} trades ingested")
+                # Ingest file
+                count = self.ingestion_service.ingest_file(
+                    tmp_path, source_name=filename
+                )
+                trace.root.set(bytes=os.path.getsize(tmp_path), rows=count)
+                logger.info(
+                    f"Successfully processed {filename}: {count} trades ingested"
+                )
 
-            # Move to processed directory (using the local copy we already downloaded)
-            self.sftp_service.move_to_processed(filename, local_source_path=tmp_path)
+                # Move to processed directory (using the local copy we already
+                # downloaded)
+                with ingestion_trace.span("move_to_processed"):
+                    self.sftp_service.move_to_processed(
+                        filename, local_source_path=tmp_path
+                    )
 
         except Exception as e:
             logger.error(f"Error processing {filename}: {str(e)}")
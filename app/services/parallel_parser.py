@@ -0,0 +1,160 @@
+"""Parse one large local file on several cores.
+
+The file is split into byte ranges that end on newlines. Each range is
+parsed in a worker process, with the header line re-sent for formats that
+need it, and the resulting rows come back in file order for the bulk writer.
+"""
+
+import itertools
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import Config
+from app.services import formats
+from app.services.data_quality import DataQualityError, DataQualityReport
+from app.services.streams import detect_compression, iter_lines
+
+logger = logging.getLogger(__name__)
+
+_READ_SIZE = 1024 * 1024
+
+
+def split_ranges(path, parts, start=0):
+    """Split [start, EOF) into up to `parts` byte ranges aligned to line starts"""
+    size = os.path.getsize(path)
+    step = max(1, (size - start) // parts)
+    bounds = [start]
+
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            # Step back one byte so a boundary already on a line start is kept
+            f.seek(start + i * step - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _iter_range(f, length):
+    while length > 0:
+        chunk = f.read(min(_READ_SIZE, length))
+        if not chunk:
+            return
+        length -= len(chunk)
+        yield chunk
+
+
+def _parse_range(path, start, end, format_name, header, limits):
+    """Worker: parse one byte range, returning (rows, data-quality summary)"""
+    trade_format = formats.get_format(format_name)
+    max_bad_rows, sample_size, batch_size = limits
+    report = DataQualityReport(os.path.basename(path), max_bad_rows, sample_size)
+    rows = []
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = iter_lines(_iter_range(f, end - start))
+        if header:
+            lines = itertools.chain([header], lines)
+        try:
+            for batch in trade_format.iter_batches(lines, report, batch_size):
+                rows.extend(batch)
+        except DataQualityError:
+            # The parent merges the summary and rejects the file
+            pass
+
+    return rows, report.to_dict()
+
+
+class ParallelParser:
+    """Byte-range parallel parsing for large, uncompressed local files"""
+
+    def __init__(self, workers=None, min_bytes=None):
+        self.workers = workers or Config.INGEST_PARALLEL_WORKERS
+        self.min_bytes = (
+            Config.INGEST_PARALLEL_MIN_BYTES if min_bytes is None else min_bytes
+        )
+
+    def should_split(self, path):
+        """Worth splitting: parallelism enabled, big enough, and seekable text"""
+        if self.workers <= 1 or os.path.getsize(path) < self.min_bytes:
+            return False
+        with open(path, "rb") as f:
+            return detect_compression(f.read(4)) is None
+
+    def _read_header(self, path):
+        """First non-blank line and the byte offset just after it"""
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    return line.decode("utf-8"), f.tell()
+        return "", 0
+
+    def iter_batches(self, path, trade_format, report, batch_size=None):
+        """Yield row batches for the whole file, in file order"""
+        for batch, _ in self.iter_batch_offsets(path, trade_format, report, batch_size):
+            if batch:
+                yield batch
+
+    def iter_batch_offsets(self, path, trade_format, report, batch_size=None, start=0):
+        """Yield (batch, byte_offset) pairs in file order, starting at `start`.
+
+        byte_offset is the end of the range on a range's last batch and None
+        otherwise, since only range ends are safe places to resume from.
+        """
+        batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        header, data_start = "", 0
+        if trade_format.needs_header:
+            header, data_start = self._read_header(path)
+
+        # More ranges than workers keeps every core busy when ranges parse
+        # at different speeds, while bounding how many rows wait in memory
+        ranges = split_ranges(path, self.workers * 4, start=max(data_start, start))
+        limits = (report.max_bad_rows, report.sample_size, batch_size)
+        logger.info(
+            f"Parsing {path} as {trade_format.name} in {len(ranges)} ranges "
+            f"on {self.workers} processes"
+        )
+
+        ranges = iter(ranges)
+        pending = deque()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+
+            def submit_next():
+                for start, end in itertools.islice(ranges, 1):
+                    future = pool.submit(
+                        _parse_range,
+                        path,
+                        start,
+                        end,
+                        trade_format.name,
+                        header,
+                        limits,
+                    )
+                    pending.append((start, end, future))
+
+            for _ in range(self.workers * 2):
+                submit_next()
+
+            try:
+                while pending:
+                    start, end, future = pending.popleft()
+                    rows, summary = future.result()
+                    submit_next()
+                    report.merge(summary, range_start=start)
+                    if not rows:
+                        yield [], end
+                    for i in range(0, len(rows), batch_size):
+                        last = i + batch_size >= len(rows)
+                        yield rows[i : i + batch_size], end if last else None
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
@@ -0,0 +1,95 @@
+"""Trades as Parquet files, local or on S3.
+
+Shared by the cold-tier archive (trade_archive.py) and the analytics
+snapshots (analytics.py). Files are laid out by date,
+{root}/trade_date=YYYY-MM-DD/<name>.parquet, and written zstd-compressed
+with the trades table's columns.
+"""
+
+import io
+import logging
+import os
+
+from app.models import Trade
+from app.services.s3_service import S3Service
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = [column.name for column in Trade.__table__.columns]
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("trade_date", pa.date32()),
+            ("account_id", pa.string()),
+            ("ticker", pa.string()),
+            ("quantity", pa.int64()),
+            ("price", pa.decimal128(15, 2)),
+            ("market_value", pa.decimal128(15, 2)),
+            ("trade_type", pa.string()),
+            ("settlement_date", pa.date32()),
+            ("source_system", pa.string()),
+            ("created_at", pa.timestamp("us")),
+        ]
+    )
+
+
+def date_location(root, trade_date, name):
+    return f"{root.rstrip('/')}/trade_date={trade_date.isoformat()}/{name}.parquet"
+
+
+def to_parquet(trades):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pylist(
+        [{c: getattr(trade, c) for c in _COLUMNS} for trade in trades],
+        schema=_schema(),
+    )
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def from_parquet(data):
+    import pyarrow.parquet as pq
+
+    return [Trade(**row) for row in pq.read_table(io.BytesIO(data)).to_pylist()]
+
+
+def _split_s3(location):
+    bucket, _, key = location[len("s3://") :].partition("/")
+    return bucket, key
+
+
+def write_file(location, data):
+    if location.startswith("s3://"):
+        S3Service().put_bytes(*_split_s3(location), data)
+        return
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    partial = f"{location}.partial"
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, location)
+
+
+def read_file(location):
+    if location.startswith("s3://"):
+        return S3Service().get_bytes(*_split_s3(location))
+    with open(location, "rb") as f:
+        return f.read()
+
+
+def delete_file(location):
+    """Remove a replaced file; failures are only logged"""
+    try:
+        if location.startswith("s3://"):
+            S3Service().delete_object(*_split_s3(location))
+        else:
+            os.remove(location)
+    except Exception as e:
+        logger.warning(f"Could not delete replaced file {location}: {str(e)}")
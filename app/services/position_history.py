@@ -0,0 +1,317 @@
+"""Cumulative positions over time from snapshots plus daily deltas.
+
+Every ingestion writer folds its rows into position_deltas, one row per
+account, ticker and trade date. Snapshots of all holdings are built on a
+fixed grid of dates (see POSITION_SNAPSHOT_INTERVAL_DAYS). A position on any
+date is the latest snapshot before it plus the deltas since, so a history
+request never scans raw trades.
+
+Writers add up their deltas in memory (fold_rows) and apply them once per
+transaction, right before committing, sorted by key: the delta rows stay
+locked until the commit, so concurrent ingests of the same accounts wait on
+each other only briefly and always lock in the same order, never
+deadlocking. Snapshots on or after the earliest trade date applied are
+deleted at the same point, so a backdated file never leaves a stale
+snapshot behind; refresh_snapshots rebuilds them.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import Date, delete, func, insert, literal, select, union_all
+
+from app import db
+from app.config import Config
+from app.models import PositionDelta, PositionSnapshot, Trade, TradeArchive
+from app.services import sharding, sql
+from app.services.trade_archive import TradeArchiveService
+
+logger = logging.getLogger(__name__)
+
+
+def _upsert_statement(dialect):
+    return sql.upsert_statement(
+        dialect,
+        PositionDelta,
+        ["account_id", "ticker", "trade_date"],
+        lambda excluded: {
+            "quantity": PositionDelta.quantity + excluded.quantity,
+            "market_value": PositionDelta.market_value + excluded.market_value,
+            "trade_count": PositionDelta.trade_count + excluded.trade_count,
+        },
+    )
+
+
+def _snapshot_dates(start, end, interval):
+    """Grid dates d with start <= d < end; the grid is anchored on date ordinals"""
+    first = start + timedelta(days=-start.toordinal() % interval)
+    current = first
+    while current < end:
+        yield current
+        current += timedelta(days=interval)
+
+
+class PositionHistoryService:
+    @staticmethod
+    def fold_rows(totals, rows):
+        """Add a batch of Trade column dicts to `totals`, a dict of deltas by
+        (account, ticker, trade date), for apply_deltas"""
+        for row in rows:
+            key = (row["account_id"], row["ticker"], row["trade_date"])
+            delta = totals.get(key)
+            if delta is None:
+                delta = totals[key] = {
+                    "account_id": row["account_id"],
+                    "ticker": row["ticker"],
+                    "trade_date": row["trade_date"],
+                    "quantity": 0,
+                    "market_value": 0.0,
+                    "trade_count": 0,
+                }
+            delta["quantity"] += row["quantity"]
+            delta["market_value"] += float(row.get("market_value") or 0)
+            delta["trade_count"] += 1
+        return totals
+
+    @staticmethod
+    def apply_rows(rows):
+        """Fold a batch of Trade column dicts into the daily deltas"""
+        totals = PositionHistoryService.fold_rows({}, rows)
+        PositionHistoryService.apply_deltas(totals.values())
+
+    @staticmethod
+    def apply_deltas(deltas):
+        """Add per-(account, ticker, trade_date) totals to position_deltas.
+
+        Runs in the caller's transaction, so the deltas commit (or roll back)
+        together with the trades they describe. Call right before committing,
+        once per transaction: rows are upserted in key order and stay locked
+        until the commit.
+        """
+        deltas = sorted(
+            deltas, key=lambda d: (d["account_id"], d["ticker"], d["trade_date"])
+        )
+        if not deltas:
+            return
+
+        statement = _upsert_statement(db.session.get_bind().dialect.name)
+        if statement is not None:
+            db.session.execute(statement, deltas)
+        else:
+            for values in deltas:
+                existing = PositionDelta.query.filter_by(
+                    account_id=values["account_id"],
+                    ticker=values["ticker"],
+                    trade_date=values["trade_date"],
+                ).first()
+                if existing is None:
+                    db.session.add(PositionDelta(**values))
+                else:
+                    existing.quantity += values["quantity"]
+                    existing.market_value = float(existing.market_value) + float(
+                        values["market_value"]
+                    )
+                    existing.trade_count += values["trade_count"]
+
+        earliest = min(values["trade_date"] for values in deltas)
+        db.session.execute(
+            delete(PositionSnapshot).where(PositionSnapshot.as_of_date >= earliest)
+        )
+
+    @staticmethod
+    def build_snapshot(as_of_date, previous_date=None):
+        """Insert the snapshot for as_of_date from the previous one plus deltas"""
+        deltas = select(
+            PositionDelta.account_id,
+            PositionDelta.ticker,
+            PositionDelta.quantity,
+            PositionDelta.market_value,
+        ).where(PositionDelta.trade_date <= as_of_date)
+        sources = [deltas]
+
+        if previous_date is not None:
+            sources[0] = deltas.where(PositionDelta.trade_date > previous_date)
+            sources.append(
+                select(
+                    PositionSnapshot.account_id,
+                    PositionSnapshot.ticker,
+                    PositionSnapshot.quantity,
+                    PositionSnapshot.market_value,
+                ).where(PositionSnapshot.as_of_date == previous_date)
+            )
+
+        combined = union_all(*sources).subquery()
+        quantity = func.sum(combined.c.quantity)
+        market_value = func.sum(combined.c.market_value)
+        totals = (
+            select(
+                literal(as_of_date, Date),
+                combined.c.account_id,
+                combined.c.ticker,
+                quantity,
+                market_value,
+            )
+            .group_by(combined.c.account_id, combined.c.ticker)
+            .having((quantity != 0) | (market_value != 0))
+        )
+        db.session.execute(
+            insert(PositionSnapshot).from_select(
+                ["as_of_date", "account_id", "ticker", "quantity", "market_value"],
+                totals,
+            )
+        )
+
+    @staticmethod
+    def refresh_snapshots(interval=None):
+        """Build any missing grid snapshots before the latest trade date"""
+        interval = interval or Config.POSITION_SNAPSHOT_INTERVAL_DAYS
+        first, last = db.session.query(
+            func.min(PositionDelta.trade_date), func.max(PositionDelta.trade_date)
+        ).one()
+        if first is None:
+            return 0
+
+        # Snapshots are invalidated from a date onwards, so the ones that
+        # remain are always a prefix of the grid
+        latest = db.session.query(func.max(PositionSnapshot.as_of_date)).scalar()
+        start = latest + timedelta(days=1) if latest else first
+
+        built = 0
+        for as_of_date in _snapshot_dates(start, last, interval):
+            PositionHistoryService.build_snapshot(as_of_date, latest)
+            latest = as_of_date
+            built += 1
+
+        db.session.commit()
+        if built:
+            logger.info(f"Built {built} position snapshots up to {latest}")
+        return built
+
+    @staticmethod
+    def rebuild():
+        """Recompute all deltas and snapshots from the trades table and archives.
+
+        An archived date is folded in from its file plus its late hot rows,
+        as the read endpoints see it, so rebuilding after an archive run
+        keeps the cumulative positions.
+        """
+        columns = [
+            "account_id",
+            "ticker",
+            "trade_date",
+            "quantity",
+            "market_value",
+            "trade_count",
+        ]
+        archived = [
+            trade_date for (trade_date,) in db.session.query(TradeArchive.trade_date)
+        ]
+        totals = (
+            select(
+                Trade.account_id,
+                Trade.ticker,
+                Trade.trade_date,
+                func.sum(Trade.quantity),
+                func.sum(func.coalesce(Trade.market_value, 0)),
+                func.count(),
+            )
+            .where(Trade.trade_date.notin_(archived))
+            .group_by(Trade.account_id, Trade.ticker, Trade.trade_date)
+        )
+
+        db.session.execute(delete(PositionSnapshot))
+        db.session.execute(delete(PositionDelta))
+        if sharding.is_sharded():
+            # Trades live on the shards; an account's totals come from one
+            rows = sharding.gather(lambda session: session.execute(totals).all())
+            if rows:
+                db.session.execute(
+                    insert(PositionDelta), [dict(zip(columns, row)) for row in rows]
+                )
+        else:
+            db.session.execute(insert(PositionDelta).from_select(columns, totals))
+
+        for trade_date in archived:
+            trades = TradeArchiveService.read_trades(trade_date)
+            PositionHistoryService.apply_rows(
+                [
+                    {column: getattr(trade, column) for column in columns[:-1]}
+                    for trade in trades
+                ]
+            )
+        db.session.commit()
+        return PositionHistoryService.refresh_snapshots()
+
+    @staticmethod
+    def history(account_id, start_date, end_date, ticker=None):
+        """Opening position, daily changes and closing position per ticker.
+
+        The opening position is as of the end of the day before start_date;
+        each history point is the cumulative position after that trade date.
+        """
+        snapshot_date = (
+            db.session.query(func.max(PositionSnapshot.as_of_date))
+            .filter(PositionSnapshot.as_of_date < start_date)
+            .scalar()
+        )
+
+        running = defaultdict(lambda: [0, 0.0])
+        if snapshot_date is not None:
+            snapshot = PositionSnapshot.query.filter_by(
+                as_of_date=snapshot_date, account_id=account_id
+            )
+            if ticker:
+                snapshot = snapshot.filter_by(ticker=ticker)
+            for row in snapshot:
+                running[row.ticker] = [row.quantity, float(row.market_value)]
+
+        deltas = PositionDelta.query.filter(
+            PositionDelta.account_id == account_id,
+            PositionDelta.trade_date <= end_date,
+        )
+        if snapshot_date is not None:
+            deltas = deltas.filter(PositionDelta.trade_date > snapshot_date)
+        if ticker:
+            deltas = deltas.filter(PositionDelta.ticker == ticker)
+
+        opening = None
+        history = defaultdict(list)
+        for delta in deltas.order_by(PositionDelta.trade_date, PositionDelta.ticker):
+            if opening is None and delta.trade_date >= start_date:
+                opening = {t: list(values) for t, values in running.items()}
+            position = running[delta.ticker]
+            position[0] += delta.quantity
+            position[1] += float(delta.market_value)
+            if delta.trade_date >= start_date:
+                history[delta.ticker].append(
+                    {
+                        "date": delta.trade_date.isoformat(),
+                        "quantity": position[0],
+                        "market_value": round(position[1], 2),
+                    }
+                )
+        if opening is None:
+            opening = {t: list(values) for t, values in running.items()}
+
+        positions = []
+        for symbol in sorted(running):
+            start = opening.get(symbol, [0, 0.0])
+            end = running[symbol]
+            if not history[symbol] and not any(start):
+                continue
+            positions.append(
+                {
+                    "ticker": symbol,
+                    "opening": {
+                        "quantity": start[0],
+                        "market_value": round(start[1], 2),
+                    },
+                    "history": history[symbol],
+                    "closing": {
+                        "quantity": end[0],
+                        "market_value": round(end[1], 2),
+                    },
+                }
+            )
+        return positions
@@ -0,0 +1,344 @@
+"""Per-date position and concentration-alarm queries behind the API.
+
+Both queries need each (account, ticker) market value on one trade date and
+the account's total. Across all accounts, the default "window" engine gets
+both from one grouped scan of the date's trades: the total is
+SUM(...) OVER (PARTITION BY account_id) over the ticker sums. The original
+"join" engine, kept for comparison (scripts/benchmark_positions.py), groups
+the date's trades into account totals in a subquery and joins them back to a
+second grouped scan. For an account filter, one grouped pass over
+those accounts' trades is enough: an account's total is the sum of its
+ticker values. That pass is a range read on the (trade_date, account_id)
+index, so its cost follows the accounts' trades rather than the whole day.
+
+Ticker exposure works the other way round. The requested tickers are read
+through the (trade_date, ticker) index. Totals are then summed only for the
+(date, account) pairs holding them, through the (trade_date, account_id)
+index.
+
+Archived trade dates (see trade_archive.py) are aggregated in Python from
+their Parquet file.
+
+On sharded storage, every query without an explicit session runs on the
+shards holding the requested accounts (all shards for date-wide queries) in
+parallel, and the per-shard results are concatenated. Accounts never span
+shards, so account totals need no cross-shard merge.
+"""
+
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from sqlalchemy import and_, func, or_, select
+
+from app import db
+from app.config import Config
+from app.models import Trade
+from app.services import sharding
+from app.services.trade_archive import TradeArchiveService
+
+# Longest date range a ticker exposure request may cover
+MAX_EXPOSURE_DAYS = 366
+
+TickerValue = namedtuple("TickerValue", "account_id ticker ticker_value total_value")
+
+
+def _all_accounts_join(query_date, session, threshold=None):
+    # Calculate total market value per account (use absolute values)
+    account_totals = (
+        session.query(
+            Trade.account_id,
+            func.sum(func.abs(Trade.market_value)).label("total_value"),
+        )
+        .filter(Trade.trade_date == query_date)
+        .group_by(Trade.account_id)
+        .subquery()
+    )
+
+    ticker_value = func.sum(func.abs(Trade.market_value))
+    query = (
+        session.query(
+            Trade.account_id,
+            Trade.ticker,
+            ticker_value.label("ticker_value"),
+            func.abs(account_totals.c.total_value).label("total_value"),
+        )
+        .join(account_totals, Trade.account_id == account_totals.c.account_id)
+        .filter(Trade.trade_date == query_date)
+        .group_by(Trade.account_id, Trade.ticker, account_totals.c.total_value)
+    )
+    if threshold is not None:
+        query = query.having(
+            (ticker_value / func.abs(account_totals.c.total_value) * 100) > threshold
+        )
+    return query.all()
+
+
+def _all_accounts_window(query_date, session, threshold=None):
+    ticker_value = func.sum(func.abs(Trade.market_value))
+    values = (
+        select(
+            Trade.account_id,
+            Trade.ticker,
+            ticker_value.label("ticker_value"),
+            func.sum(ticker_value)
+            .over(partition_by=Trade.account_id)
+            .label("total_value"),
+        )
+        .where(Trade.trade_date == query_date)
+        .group_by(Trade.account_id, Trade.ticker)
+    )
+    if threshold is None:
+        return session.execute(values).all()
+
+    # Window results can't be filtered in the same SELECT, so the threshold
+    # applies to the already computed columns one level up
+    values = values.subquery()
+    return session.execute(
+        select(values).where(
+            values.c.total_value > 0,
+            values.c.ticker_value / values.c.total_value * 100 > threshold,
+        )
+    ).all()
+
+
+QUERY_ENGINES = {"join": _all_accounts_join, "window": _all_accounts_window}
+
+
+def _all_accounts(query_date, session, threshold=None, engine=None):
+    engine = engine or Config.POSITION_QUERY_ENGINE
+    try:
+        query = QUERY_ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"Unknown position query engine: {engine}")
+    return query(query_date, session, threshold)
+
+
+def _some_accounts(query_date, account_ids, session):
+    rows = (
+        session.query(
+            Trade.account_id,
+            Trade.ticker,
+            func.sum(func.abs(Trade.market_value)).label("ticker_value"),
+        )
+        .filter(Trade.trade_date == query_date, Trade.account_id.in_(account_ids))
+        .group_by(Trade.account_id, Trade.ticker)
+        .all()
+    )
+
+    totals = defaultdict(float)
+    for row in rows:
+        totals[row.account_id] += float(row.ticker_value or 0)
+    return [
+        TickerValue(
+            row.account_id,
+            row.ticker,
+            float(row.ticker_value or 0),
+            totals[row.account_id],
+        )
+        for row in rows
+    ]
+
+
+def _archived_values(query_date, account_ids):
+    """TickerValues of an archived date, or None if the date is not archived"""
+    trades = TradeArchiveService.read_trades(query_date)
+    if trades is None:
+        return None
+
+    values = defaultdict(float)
+    for trade in trades:
+        if account_ids is None or trade.account_id in account_ids:
+            values[(trade.account_id, trade.ticker)] += abs(
+                float(trade.market_value or 0)
+            )
+    totals = defaultdict(float)
+    for (account_id, _), value in values.items():
+        totals[account_id] += value
+    return [
+        TickerValue(account_id, ticker, value, totals[account_id])
+        for (account_id, ticker), value in values.items()
+    ]
+
+
+def _scatter_gather(query, query_date, account_ids, **kwargs):
+    """Run a per-date query on the shards holding the accounts (all if None)"""
+    if account_ids is None:
+        return sharding.gather(
+            lambda session: query(query_date, session=session, **kwargs)
+        )
+    return sharding.gather(
+        lambda session, ids: query(query_date, ids, session=session, **kwargs),
+        sharding.group_by_shard(account_ids),
+    )
+
+
+def _percentage(row):
+    return (
+        (float(row.ticker_value) / float(row.total_value) * 100)
+        if row.total_value
+        else 0
+    )
+
+
+def get_trades(query_date):
+    """Every trade of a date, from its archive file, the shards or trades"""
+    trades = TradeArchiveService.read_trades(query_date)
+    if trades is not None:
+        return trades
+    if sharding.is_sharded():
+        return sharding.gather(
+            lambda session: session.query(Trade).filter_by(trade_date=query_date).all()
+        )
+    return Trade.query.filter_by(trade_date=query_date).all()
+
+
+def get_ticker_values(query_date, account_ids=None, session=None, engine=None):
+    """(account, ticker) values and account totals behind positions and alarms"""
+    rows = None if session else _archived_values(query_date, account_ids)
+    if rows is not None:
+        return rows
+    if session is None and sharding.is_sharded():
+        return _scatter_gather(
+            get_ticker_values, query_date, account_ids, engine=engine
+        )
+    session = session or db.session
+    if account_ids is None:
+        return _all_accounts(query_date, session, engine=engine)
+    return _some_accounts(query_date, account_ids, session)
+
+
+def format_positions(rows):
+    return [
+        {
+            "account_id": row.account_id,
+            "ticker": row.ticker,
+            "market_value": float(row.ticker_value),
+            "percentage": round(_percentage(row), 2),
+        }
+        for row in rows
+    ]
+
+
+def over_threshold(rows, threshold):
+    return [row for row in rows if _percentage(row) > threshold]
+
+
+def format_alarms(rows):
+    return [
+        {
+            "account_id": row.account_id,
+            "ticker": row.ticker,
+            "percentage": round(_percentage(row), 2),
+            "violation": True,
+        }
+        for row in rows
+    ]
+
+
+def get_positions(query_date, account_ids=None, session=None, engine=None):
+    """Market value and share of account total per (account, ticker)"""
+    return format_positions(
+        get_ticker_values(query_date, account_ids, session=session, engine=engine)
+    )
+
+
+def get_alarms(query_date, account_ids=None, session=None, threshold=None, engine=None):
+    """(account, ticker) pairs over `threshold` percent of the account's total"""
+    if threshold is None:
+        threshold = Config.ALARM_THRESHOLD_PERCENT
+
+    rows = None if session else _archived_values(query_date, account_ids)
+    if rows is not None:
+        rows = over_threshold(rows, threshold)
+    elif session is None and sharding.is_sharded():
+        return _scatter_gather(
+            get_alarms, query_date, account_ids, threshold=threshold, engine=engine
+        )
+    elif account_ids is None:
+        rows = _all_accounts(query_date, session or db.session, threshold, engine)
+    else:
+        rows = over_threshold(
+            _some_accounts(query_date, account_ids, session or db.session), threshold
+        )
+    return format_alarms(rows)
+
+
+def get_ticker_exposure(tickers, start_date, end_date=None, session=None):
+    """Every account's holding of `tickers` per date, with its share of the account"""
+    if session is None and sharding.is_sharded():
+        result = sharding.gather(
+            lambda session: get_ticker_exposure(tickers, start_date, end_date, session)
+        )
+        result.sort(key=_exposure_order)
+        return result
+    session = session or db.session
+    end_date = end_date or start_date
+    # Listing the dates makes both index columns equality lookups, where a
+    # date range would leave the ticker column to a filter
+    dates = [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
+
+    exposures = (
+        session.query(
+            Trade.trade_date,
+            Trade.account_id,
+            Trade.ticker,
+            func.sum(Trade.quantity).label("quantity"),
+            func.sum(func.abs(Trade.market_value)).label("ticker_value"),
+        )
+        .filter(Trade.trade_date.in_(dates), Trade.ticker.in_(tickers))
+        .group_by(Trade.trade_date, Trade.account_id, Trade.ticker)
+        .all()
+    )
+    if not exposures:
+        return []
+
+    holders = defaultdict(set)
+    for row in exposures:
+        holders[row.trade_date].add(row.account_id)
+
+    # One (trade_date, account_id IN ...) branch per date: each is a range
+    # read on the account index covering only the accounts that hold a ticker
+    totals = {
+        (row.trade_date, row.account_id): float(row.total_value or 0)
+        for row in session.query(
+            Trade.trade_date,
+            Trade.account_id,
+            func.sum(func.abs(Trade.market_value)).label("total_value"),
+        )
+        .filter(
+            or_(
+                *[
+                    and_(
+                        Trade.trade_date == trade_date,
+                        Trade.account_id.in_(sorted(accounts)),
+                    )
+                    for trade_date, accounts in holders.items()
+                ]
+            )
+        )
+        .group_by(Trade.trade_date, Trade.account_id)
+    }
+
+    result = []
+    for row in exposures:
+        value = float(row.ticker_value or 0)
+        total = totals[(row.trade_date, row.account_id)]
+        result.append(
+            {
+                "date": row.trade_date.isoformat(),
+                "ticker": row.ticker,
+                "account_id": row.account_id,
+                "quantity": int(row.quantity),
+                "market_value": value,
+                "percentage": round(value / total * 100, 2) if total else 0,
+            }
+        )
+    result.sort(key=_exposure_order)
+    return result
+
+
+def _exposure_order(exposure):
+    return exposure["date"], exposure["ticker"], -exposure["market_value"]
@@ -0,0 +1,127 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app.config import Config
+from app.services import ingestion_runs, ingestion_trace
+from app.services.alerting_service import AlertingService
+from app.services.file_ingestion import FileIngestionService
+from app.services.s3_service import S3Service
+
+logger = logging.getLogger(__name__)
+
+
+class S3IngestionWorker:
+    """Ingests a batch of S3 objects concurrently inside one warm process"""
+
+    def __init__(self, s3_service=None, concurrency=None):
+        self.s3_service = s3_service or S3Service()
+        self.ingestion_service = FileIngestionService()
+        self.alerting_service = AlertingService()
+        self.concurrency = concurrency or Config.INGEST_BATCH_CONCURRENCY
+
+    def expand_event(self, event):
+        """Turn an INGEST_EVENT payload into (bucket, key, processed_key) tuples.
+
+        Accepted shapes:
+          {"s3_bucket": "b", "s3_key": "k"}                      one object
+          {"s3_bucket": "b", "objects": [{"s3_key": "k"}, ...]}  a batch
+          [{"s3_bucket": "b", "s3_key": "k"}, ...]                a batch
+          {"s3_bucket": "b", "s3_prefix": "uploads/"}            drain a prefix
+
+        Objects drained from a prefix get a processed_key under
+        S3_PROCESSED_PREFIX so a successful ingest moves them out of the way.
+        Keys already under S3_PROCESSED_PREFIX are left alone, in case the
+        drained prefix contains it.
+        """
+        if isinstance(event, list):
+            event = {"objects": event}
+        if not isinstance(event, dict):
+            raise ValueError(f"INGEST_EVENT must be an object or a list: {event!r}")
+
+        default_bucket = event.get("s3_bucket")
+
+        if event.get("s3_prefix"):
+            prefix = event["s3_prefix"]
+            if not default_bucket:
+                raise ValueError("s3_prefix requires s3_bucket")
+            processed = Config.S3_PROCESSED_PREFIX
+            return [
+                (default_bucket, key, processed + key[len(prefix) :].lstrip("/"))
+                for key in self.s3_service.list_keys(default_bucket, prefix)
+                if not (processed and key.startswith(processed))
+            ]
+
+        references = event.get("objects")
+        if references is None:
+            references = [event]
+
+        objects = []
+        for reference in references:
+            bucket = reference.get("s3_bucket") or default_bucket
+            key = reference.get("s3_key")
+            if not bucket or not key:
+                raise ValueError(f"Missing s3_bucket or s3_key in {reference!r}")
+            objects.append((bucket, key, None))
+        return objects
+
+    def process_object(self, app, bucket, key, processed_key=None, batch_id=None):
+        """Ingest one object and report its outcome instead of raising"""
+        started = time.monotonic()
+        outcome = {"bucket": bucket, "key": key}
+
+        with app.app_context():
+            try:
+                with ingestion_trace.trace_file(
+                    f"s3://{bucket}/{key}", transport="s3", batch_id=batch_id
+                ) as trace:
+                    fingerprint = None
+                    if Config.INGEST_CHECKPOINT_ROWS:
+                        fingerprint = self.s3_service.object_fingerprint(bucket, key)
+                    # Annotates the root span with the object's size
+                    lines = self.s3_service.iter_object_lines(bucket, key)
+                    outcome["records"] = self.ingestion_service.ingest_stream(
+                        lines, key, fingerprint
+                    )
+                    trace.root.set(rows=outcome["records"])
+                    if processed_key:
+                        with ingestion_trace.span("move_to_processed"):
+                            self.s3_service.move_object(bucket, key, processed_key)
+                        outcome["processed_key"] = processed_key
+                outcome["status"] = "succeeded"
+            except Exception as e:
+                logger.error(f"Error processing s3://{bucket}/{key}: {str(e)}")
+                self.alerting_service.send_ingestion_failure_alert(key, str(e))
+                outcome["status"] = "failed"
+                outcome["error"] = str(e)
+
+        outcome["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return outcome
+
+    def process_objects(self, objects):
+        """Ingest (bucket, key, processed_key) tuples concurrently.
+
+        Each worker thread gets its own app context, and with it its own
+        session, while sharing the app's engine and connection pool.
+        """
+        app = current_app._get_current_object()
+        logger.info(
+            f"Ingesting {len(objects)} S3 objects with concurrency {self.concurrency}"
+        )
+
+        with ingestion_runs.batch("s3") as batch_id:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                outcomes = list(
+                    pool.map(
+                        lambda obj: self.process_object(app, *obj, batch_id=batch_id),
+                        objects,
+                    )
+                )
+
+        failed = sum(1 for outcome in outcomes if outcome["status"] == "failed")
+        logger.info(
+            f"S3 batch finished: {len(outcomes) - failed} succeeded, {failed} failed"
+        )
+        return outcomes
@@ -5,6 +5,8 @@ from pathlib import Path
 import paramiko
 
 from app.config import Config
+from app.services import ingestion_trace
+from app.services.streams import is_ingestible
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +22,10 @@ class SFTPService:
 
     def _get_ssh_client(self):
         """Create and return an SSH client with key authentication"""
+        with ingestion_trace.span("sftp_connect", host=self.host):
+            return self._connect()
+
+    def _connect(self):
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
@@ -58,7 +64,7 @@ class SFTPService:
         try:
             files = sftp.listdir(self.remote_path)
             logger.info(f"Found files in {self.remote_path}: {files}")
-            return [f for f in files if f.endswith((".csv", ".txt", ".psv"))]
+            return [f for f in files if is_ingestible(f)]
         finally:
             sftp.close()
             ssh.close()
@@ -0,0 +1,244 @@
+"""Account-hash sharding of trades across several databases.
+
+With SHARD_DATABASE_URLS set, each URL becomes a Flask-SQLAlchemy bind
+(shard0, shard1, ...) holding a `trades` table, and every trade goes to the
+shard picked by a stable hash of its account_id. An account's trades are
+always on one shard, so per-account queries touch one database and
+date-wide queries run on all shards in parallel and concatenate: no
+account's totals are split across shards.
+
+Position history, data versions and ingestion checkpoints stay on the
+primary database (SQLALCHEMY_DATABASE_URI). An ingest commits the shards
+first and the primary last. Each shard commit records the ids it inserted
+(shard_commits), and the primary transaction records an acknowledgement of
+it. When a shard or the primary commit fails partway, the shards that did
+commit hold unacknowledged rows; ShardWriter.recover() deletes them before
+the same source is ingested again (a retry, or a checkpoint resume), so the
+rows are never inserted twice.
+"""
+
+import logging
+import uuid
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import delete, insert, or_
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import TRADE_COLUMNS, ShardCommit, Trade
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def configure_binds(app):
+    """Register one bind per SHARD_DATABASE_URLS entry; call before init_app"""
+    urls = app.config.get("SHARD_DATABASE_URLS") or []
+    if urls:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds.update({f"shard{i}": url for i, url in enumerate(urls)})
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def create_tables():
+    """Create the trades (and shard_commits) tables on every shard that lacks them"""
+    for key in shard_keys():
+        Trade.__table__.create(db.engines[key], checkfirst=True)
+        ShardCommit.__table__.create(db.engines[key], checkfirst=True)
+
+
+def shard_keys():
+    return [
+        f"shard{i}" for i in range(len(current_app.config.get("SHARD_DATABASE_URLS")))
+    ]
+
+
+def is_sharded():
+    return bool(current_app.config.get("SHARD_DATABASE_URLS"))
+
+
+def shard_for(account_id, count=None):
+    """Bind key of the shard holding an account; stable across processes"""
+    count = count or len(current_app.config["SHARD_DATABASE_URLS"])
+    return f"shard{zlib.crc32(account_id.encode('utf-8')) % count}"
+
+
+def group_by_shard(account_ids):
+    """{shard key: [account_id, ...]} for the given accounts"""
+    count = len(current_app.config["SHARD_DATABASE_URLS"])
+    groups = defaultdict(list)
+    for account_id in account_ids:
+        groups[shard_for(account_id, count)].append(account_id)
+    return dict(groups)
+
+
+def _get_executor(shards):
+    global _executor
+    if _executor is None or _executor._max_workers < shards:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(4, shards * 2), thread_name_prefix="shard-query"
+        )
+    return _executor
+
+
+def _run(engine, fn, args):
+    with Session(engine) as session:
+        return fn(session, *args)
+
+
+def scatter(fn, shard_args=None):
+    """Call fn(session) on every shard in parallel, results in shard order.
+
+    With shard_args ({shard key: arg}), only those shards are queried, as
+    fn(session, arg); a single shard runs in the calling thread.
+    """
+    if shard_args is None:
+        calls = [(key, ()) for key in shard_keys()]
+    else:
+        calls = [(key, (arg,)) for key, arg in sorted(shard_args.items())]
+    engines = [(db.engines[key], args) for key, args in calls]
+
+    if len(engines) == 1:
+        return [_run(engines[0][0], fn, engines[0][1])]
+    executor = _get_executor(len(engines))
+    futures = [executor.submit(_run, engine, fn, args) for engine, args in engines]
+    return [future.result() for future in futures]
+
+
+def gather(fn, shard_args=None):
+    """scatter() with the per-shard result lists concatenated"""
+    return [row for rows in scatter(fn, shard_args) for row in rows]
+
+
+def _id_ranges(ids):
+    """[[first, last], ...] runs of consecutive ids"""
+    ranges = []
+    for trade_id in sorted(ids):
+        if ranges and trade_id == ranges[-1][1] + 1:
+            ranges[-1][1] = trade_id
+        else:
+            ranges.append([trade_id, trade_id])
+    return ranges
+
+
+class ShardWriter:
+    """Routes one ingest's trade rows to their shards inside open transactions"""
+
+    def __init__(self, source):
+        self.source = source
+        self.count = len(current_app.config["SHARD_DATABASE_URLS"])
+        self.sessions = {key: Session(db.engines[key]) for key in shard_keys()}
+        self.inserted = defaultdict(list)
+        self.token = None
+
+    def write(self, rows):
+        batches = defaultdict(list)
+        for row in rows:
+            batches[shard_for(row["account_id"], self.count)].append(
+                {c: row.get(c) for c in TRADE_COLUMNS}
+            )
+        for key, batch in batches.items():
+            self.inserted[key].extend(
+                self.sessions[key]
+                .execute(insert(Trade).returning(Trade.id), batch)
+                .scalars()
+            )
+
+    def recover(self):
+        """Delete this source's trades from shard commits the primary never
+        acknowledged; call before writing. Returns the number of trades deleted.
+
+        Assumes no other ingest of the same source is in flight.
+        """
+        markers = {
+            key: session.query(ShardCommit).filter_by(source=self.source).all()
+            for key, session in self.sessions.items()
+        }
+        tokens = {marker.token for rows in markers.values() for marker in rows}
+        if not tokens:
+            return 0
+        acknowledged = {
+            token
+            for (token,) in db.session.query(ShardCommit.token).filter(
+                ShardCommit.source == self.source, ShardCommit.token.in_(tokens)
+            )
+        }
+
+        deleted = 0
+        for key, rows in markers.items():
+            session = self.sessions[key]
+            for marker in rows:
+                if marker.token not in acknowledged:
+                    deleted += session.execute(
+                        delete(Trade).where(
+                            or_(
+                                *(
+                                    Trade.id.between(first, last)
+                                    for first, last in marker.trade_id_ranges
+                                )
+                            )
+                        )
+                    ).rowcount
+                session.delete(marker)
+            session.commit()
+        db.session.execute(delete(ShardCommit).where(ShardCommit.source == self.source))
+        db.session.commit()
+
+        if deleted:
+            logger.warning(
+                f"Deleted {deleted} trades of {self.source} from shard commits "
+                f"whose primary commit never landed"
+            )
+        return deleted
+
+    def commit(self):
+        """Commit every shard, recording the ids each inserted; call before
+        committing the primary session, whose transaction gets the
+        acknowledgement"""
+        self.token = uuid.uuid4().hex
+        for key, session in self.sessions.items():
+            if self.inserted[key]:
+                session.add(
+                    ShardCommit(
+                        token=self.token,
+                        source=self.source,
+                        trade_id_ranges=_id_ranges(self.inserted[key]),
+                    )
+                )
+            session.commit()
+        self.inserted.clear()
+        db.session.add(ShardCommit(token=self.token, source=self.source))
+
+    def forget(self):
+        """Drop the last commit's records once the primary has committed"""
+        if self.token is None:
+            return
+        try:
+            for session in self.sessions.values():
+                session.execute(
+                    delete(ShardCommit).where(ShardCommit.token == self.token)
+                )
+                session.commit()
+            db.session.execute(
+                delete(ShardCommit).where(ShardCommit.token == self.token)
+            )
+            db.session.commit()
+        except Exception as e:
+            # Acknowledged records are only dropped, never undone, by recover()
+            self.rollback()
+            db.session.rollback()
+            logger.warning(f"Could not clean up shard commit records: {str(e)}")
+        self.token = None
+
+    def rollback(self):
+        self.inserted.clear()
+        for session in self.sessions.values():
+            session.rollback()
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
@@ -0,0 +1,21 @@
+"""SQL construction shared by the services."""
+
+
+def upsert_statement(dialect, model, index_elements, updates):
+    """INSERT ... ON CONFLICT DO UPDATE into `model`, or None on databases
+    without it (callers then update row by row).
+
+    `updates(excluded)` returns the columns to set on conflict, given the
+    row that was being inserted.
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        return None
+
+    statement = upsert(model)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements, set_=updates(statement.excluded)
+    )
@@ -0,0 +1,150 @@
+"""Load a file into a staging table, then publish it to trades in one statement.
+
+Rows go into a temporary table first, which is never WAL-logged on
+PostgreSQL and is filled with COPY there. Once the whole file has loaded, one
+INSERT ... SELECT re-checks the rows and moves them into trades. Readers see
+the file's trades all at once, and the trades indexes are updated in a
+single pass instead of row by row during the load.
+"""
+
+import io
+import logging
+import uuid
+from collections import Counter
+
+from sqlalchemy import Column, MetaData, Table, and_, func, insert, select
+
+from app import db
+from app.models import TRADE_COLUMNS, Trade
+from app.services.data_versions import DataVersionService
+from app.services.position_history import PositionHistoryService
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_value(value):
+    """Render one value in PostgreSQL COPY text format"""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class StagingLoader:
+    """Stages one file's rows and publishes them to trades on request"""
+
+    def __init__(self, session=None):
+        self.session = session or db.session
+        self.connection = self.session.connection()
+        self.dialect = self.connection.dialect.name
+        self.rows = 0
+
+        columns = Trade.__table__.columns
+        self.table = Table(
+            f"trades_staging_{uuid.uuid4().hex[:12]}",
+            MetaData(),
+            # Same types as trades, but nullable: the publish step decides
+            *[Column(name, columns[name].type) for name in TRADE_COLUMNS],
+            prefixes=["TEMPORARY"],
+        )
+        self.table.create(self.connection)
+
+    def write_batch(self, rows):
+        """Append one batch of Trade column dicts to the staging table"""
+        if not rows:
+            return
+        if self.dialect == "postgresql":
+            self._copy(rows)
+        else:
+            self.connection.execute(
+                insert(self.table),
+                [{c: row.get(c) for c in TRADE_COLUMNS} for row in rows],
+            )
+        self.rows += len(rows)
+
+    def _copy(self, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row.get(c)) for c in TRADE_COLUMNS))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        dbapi_connection = self.connection.connection.dbapi_connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {self.table.name} ({', '.join(TRADE_COLUMNS)}) FROM STDIN",
+                buffer,
+            )
+
+    def _valid_rows(self):
+        staged = self.table.c
+        return and_(
+            staged.trade_date.isnot(None),
+            staged.account_id.isnot(None),
+            staged.account_id != "",
+            staged.ticker.isnot(None),
+            staged.ticker != "",
+            staged.quantity.isnot(None),
+        )
+
+    def publish(self, report):
+        """Move valid staged rows into trades with one INSERT ... SELECT.
+
+        Their position deltas are aggregated from the staging table as well,
+        and the versions and trade counts of their trade dates are updated.
+
+        Rows that fail the set-based check are added to `report`. The caller
+        commits, which makes the whole file visible at once; if it rolls back
+        instead, the staging table goes with the transaction.
+        """
+        valid = self._valid_rows()
+        rejected = self.connection.execute(
+            select(func.count()).select_from(self.table).where(~valid)
+        ).scalar()
+        if rejected:
+            report.merge(
+                {
+                    "bad_rows": rejected,
+                    "violations": {"rejected_at_publish": rejected},
+                    "samples": {},
+                }
+            )
+
+        staged = self.table.c
+        deltas = self.connection.execute(
+            select(
+                staged.account_id,
+                staged.ticker,
+                staged.trade_date,
+                func.sum(staged.quantity).label("quantity"),
+                func.sum(func.coalesce(staged.market_value, 0)).label("market_value"),
+                func.count().label("trade_count"),
+            )
+            .where(valid)
+            .group_by(staged.account_id, staged.ticker, staged.trade_date)
+        )
+        deltas = [dict(row._mapping) for row in deltas]
+
+        result = self.connection.execute(
+            insert(Trade).from_select(
+                TRADE_COLUMNS,
+                select(*[staged[name] for name in TRADE_COLUMNS]).where(valid),
+            )
+        )
+        self.table.drop(self.connection)
+        # Last, like the version bump: these rows stay locked until the commit
+        PositionHistoryService.apply_deltas(deltas)
+        trade_counts = Counter()
+        for delta in deltas:
+            trade_counts[delta["trade_date"]] += delta["trade_count"]
+        DataVersionService.bump(trade_counts)
+        logger.info(
+            f"Published {result.rowcount} of {self.rows} staged trades "
+            f"from {report.filename}"
+        )
+        return result.rowcount
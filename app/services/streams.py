@@ -0,0 +1,142 @@
+"""Helpers for feeding (possibly compressed) byte streams to the line-oriented parsers."""
+
+import gzip
+import io
+import zipfile
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+DATA_EXTENSIONS = (".csv", ".txt", ".psv", ".jsonl", ".dat")
+INGESTIBLE_EXTENSIONS = (
+    DATA_EXTENSIONS
+    + tuple(f"{ext}.gz" for ext in DATA_EXTENSIONS)
+    + tuple(f"{ext}.zst" for ext in DATA_EXTENSIONS)
+    + (".zip",)
+)
+
+_MAGIC_NUMBERS = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"PK\x03\x04", "zip"),
+)
+
+
+def is_ingestible(filename):
+    """True for plain data files and their gzip/zstd/zip compressed variants"""
+    return filename.lower().endswith(INGESTIBLE_EXTENSIONS)
+
+
+def detect_compression(head):
+    """Compression format from a stream's first bytes, or None for plain data"""
+    for magic, compression in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+class ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks"""
+
+    def __init__(self, chunks, head=b""):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(head)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _open_zip_member(fileobj):
+    if not fileobj.seekable():
+        raise ValueError("zip archives can only be read from a seekable source")
+
+    archive = zipfile.ZipFile(fileobj)
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    if len(members) != 1:
+        raise ValueError(
+            f"zip archives must contain exactly one data file, found {len(members)}"
+        )
+    return archive.open(members[0])
+
+
+def open_decompressed(fileobj):
+    """Wrap a binary file object so reads return decompressed bytes.
+
+    Compression is detected from magic bytes, and decompression happens
+    incrementally as the caller reads, so no decompressed copy is ever held
+    in full, in memory or on disk.
+    """
+    if fileobj.seekable():
+        position = fileobj.tell()
+        head = fileobj.read(4)
+        fileobj.seek(position)
+    elif hasattr(fileobj, "peek"):
+        head = fileobj.peek(4)[:4]
+    else:
+        head = fileobj.read(4)
+        fileobj = io.BufferedReader(ChunkStream(iter_chunks(fileobj), head=head))
+
+    compression = detect_compression(head)
+
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().stream_reader(
+            fileobj, read_across_frames=True
+        )
+    if compression == "zip":
+        return _open_zip_member(fileobj)
+    return fileobj
+
+
+def iter_chunks(fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Read a binary file-like object in fixed-size chunks"""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_lines(chunks, encoding="utf-8"):
+    """Reassemble arbitrary byte chunks into decoded text lines.
+
+    A line split across two chunks is carried over until its newline
+    arrives. Splitting on b"\\n" is safe for UTF-8 because the newline byte
+    never appears inside a multi-byte sequence. Lines keep their line ending,
+    like iterating over a text file opened with newline="".
+    """
+    remainder = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer = remainder + chunk if remainder else chunk
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            remainder = buffer
+            continue
+        remainder = buffer[end + 1 :]
+        lines = buffer[: end + 1].decode(encoding).split("\n")
+        lines.pop()
+        for line in lines:
+            yield line + "\n"
+
+    if remainder:
+        yield remainder.decode(encoding)
+
+
+def iter_file_lines(fileobj, encoding="utf-8"):
+    """Decoded text lines of a binary file object, decompressing transparently"""
+    return iter_lines(iter_chunks(open_decompressed(fileobj)), encoding)
@@ -0,0 +1,204 @@
+"""Cold-tier archival of old trade dates to compressed Parquet files.
+
+archive() moves every trade date before a cutoff out of the trades table
+(or each shard's) into one zstd-compressed Parquet file per date, under
+ARCHIVE_LOCATION (a local directory or s3://bucket/prefix), and records the
+file in trade_archives. The blotter, positions and alarms read an archived
+date from its file, so old dates keep answering while the hot table and its
+indexes stay small.
+
+Each archive records, per trades database, the highest trade id it holds.
+Rows that arrive for an archived date later sit above that watermark and
+are read from the hot table alongside the file; the next run folds them in
+with a rewritten file. Rows at or below the watermark are already in the
+file, so a delete that failed after the archive was recorded only leaves
+rows that reads skip and the next run removes.
+
+The watermark only holds if no row below it commits later. On PostgreSQL an
+ingest can take a lower id and commit after the archive read the date, so
+each date is archived with its trades tables locked against inserts (SHARE
+mode: in-flight ingests finish first, new ones wait for the commit).
+"""
+
+import logging
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session
+
+from app import db
+from app.config import Config
+from app.models import Trade, TradeArchive
+from app.services import parquet_store, sharding
+
+logger = logging.getLogger(__name__)
+
+# Longest an archive run waits for (or holds up) ingests per date; a lock
+# wait that spans databases (shards) is not detected as a deadlock
+LOCK_TIMEOUT = "30s"
+
+
+def _hot_sessions():
+    """{name: session} for every database holding trades"""
+    if sharding.is_sharded():
+        return {key: Session(db.engines[key]) for key in sharding.shard_keys()}
+    return {"default": db.session}
+
+
+def _lock_trades(session):
+    """Hold off inserts into trades until the session commits"""
+    if session.get_bind(mapper=Trade).dialect.name != "postgresql":
+        # SQLite assigns ids and commits under one database-wide write lock
+        return
+    session.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    session.execute(text("LOCK TABLE trades IN SHARE MODE"))
+
+
+class TradeArchiveService:
+    @staticmethod
+    def read_trades(trade_date):
+        """All trades of an archived date (file plus late hot rows), else None"""
+        record = db.session.get(TradeArchive, trade_date)
+        if record is None:
+            return None
+
+        trades = parquet_store.from_parquet(parquet_store.read_file(record.location))
+        marks = record.hot_watermarks or {}
+
+        def late_rows(session, mark):
+            return (
+                session.query(Trade)
+                .filter(Trade.trade_date == trade_date, Trade.id > mark)
+                .order_by(Trade.id)
+                .all()
+            )
+
+        if sharding.is_sharded():
+            trades.extend(
+                sharding.gather(
+                    late_rows,
+                    {key: marks.get(key, 0) for key in sharding.shard_keys()},
+                )
+            )
+        else:
+            trades.extend(late_rows(db.session, marks.get("default", 0)))
+        return trades
+
+    @staticmethod
+    def archive(before=None, location=None):
+        """Archive every trade date before `before`; returns (dates, rows)"""
+        location = location or Config.ARCHIVE_LOCATION
+        if not location:
+            raise ValueError("ARCHIVE_LOCATION is not set")
+        before = before or date.today() - timedelta(days=Config.ARCHIVE_AFTER_DAYS)
+
+        sessions = _hot_sessions()
+        try:
+            trade_dates = sorted(
+                {
+                    trade_date
+                    for session in sessions.values()
+                    for (trade_date,) in session.query(Trade.trade_date)
+                    .filter(Trade.trade_date < before)
+                    .distinct()
+                }
+            )
+            rows = 0
+            for trade_date in trade_dates:
+                rows += TradeArchiveService._archive_date(
+                    trade_date, sessions, location
+                )
+        finally:
+            for session in sessions.values():
+                if session is not db.session:
+                    session.close()
+
+        logger.info(
+            f"Archived {rows} trades from {len(trade_dates)} trade dates "
+            f"before {before} to {location}"
+        )
+        return len(trade_dates), rows
+
+    @staticmethod
+    def _archive_date(trade_date, sessions, root):
+        try:
+            for session in sessions.values():
+                _lock_trades(session)
+        except Exception:
+            for session in sessions.values():
+                session.rollback()
+            raise
+
+        record = db.session.get(TradeArchive, trade_date)
+        marks = dict(record.hot_watermarks) if record else {}
+
+        late = {
+            name: session.query(Trade)
+            .filter(Trade.trade_date == trade_date, Trade.id > marks.get(name, 0))
+            .order_by(Trade.id)
+            .all()
+            for name, session in sessions.items()
+        }
+        moved = sum(len(rows) for rows in late.values())
+
+        location = replaced = None
+        if moved:
+            trades = (
+                parquet_store.from_parquet(parquet_store.read_file(record.location))
+                if record
+                else []
+            )
+            for name, rows in late.items():
+                trades.extend(rows)
+                if rows:
+                    marks[name] = rows[-1].id
+
+            location = parquet_store.date_location(
+                root, trade_date, f"trades-{uuid.uuid4().hex[:12]}"
+            )
+            parquet_store.write_file(location, parquet_store.to_parquet(trades))
+
+            if record is None:
+                record = TradeArchive(trade_date=trade_date)
+                db.session.add(record)
+            else:
+                replaced = record.location
+            record.location = location
+            record.row_count = len(trades)
+            record.hot_watermarks = marks
+            record.archived_at = datetime.utcnow()
+
+        try:
+            for name, session in sessions.items():
+                session.execute(
+                    delete(Trade).where(
+                        Trade.trade_date == trade_date, Trade.id <= marks.get(name, 0)
+                    )
+                )
+            # Records the archive (and, unsharded, deletes the hot rows in the
+            # same transaction)
+            db.session.commit()
+        except Exception:
+            for session in sessions.values():
+                session.rollback()
+            if location:
+                parquet_store.delete_file(location)
+            raise
+
+        for name, session in sessions.items():
+            if session is db.session:
+                continue
+            try:
+                session.commit()
+            except Exception as e:
+                # Reads already skip these rows; the next run deletes them
+                session.rollback()
+                logger.warning(
+                    f"Archived {trade_date} but could not delete its trades "
+                    f"from {name}: {str(e)}"
+                )
+
+        if replaced:
+            parquet_store.delete_file(replaced)
+        return moved
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Move old trade dates out of the trades table into compressed Parquet files.
+Dates before the cutoff (default: ARCHIVE_AFTER_DAYS ago) are written to
+ARCHIVE_LOCATION, a local directory or s3://bucket/prefix, one file per
+date, and deleted from trades. The API keeps serving them from the files.
+Run it periodically, e.g. nightly from cron.
+
+Usage: python scripts/archive_trades.py [--before YYYY-MM-DD] [--location PATH]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.services.trade_archive import TradeArchiveService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--before', help='Archive trade dates before this date (YYYY-MM-DD)')
+    parser.add_argument('--location', help='Local directory or s3://bucket/prefix (default: ARCHIVE_LOCATION)')
+    args = parser.parse_args()
+
+    before = datetime.strptime(args.before, '%Y-%m-%d').date() if args.before else None
+
+    app = create_app()
+    with app.app_context():
+        try:
+            dates, rows = TradeArchiveService.archive(before, args.location)
+            print(f"✅ Archived {rows} trades from {dates} trade dates")
+        except Exception as e:
+            print(f"❌ Error archiving trades: {str(e)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark the positions/alarms query engines on synthetic trades.
+Compares the original subquery-and-join shape ("join") with the single-pass
+window function shape ("window") on the same data and checks they agree.
+
+Usage: python scripts/benchmark_positions.py [--accounts N] [--tickers N]
+                                              [--trades N] [--repeat N]
+Runs against an in-memory SQLite database unless --database-url is given.
+Never point it at a database whose trades table you care about: it
+creates and fills the tables it needs.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.config import Config
+from app.models import Trade
+from app.services import position_queries
+
+BENCHMARK_DATE = date(2025, 1, 15)
+
+
+def _config(database_url):
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+    return BenchmarkConfig
+
+
+def load_trades(accounts, tickers, trades):
+    """Fill trades with random rows on BENCHMARK_DATE"""
+    rng = random.Random(42)
+    batch = []
+    for i in range(trades):
+        quantity = rng.randint(-500, 1000)
+        price = round(rng.uniform(5, 500), 2)
+        batch.append({
+            'trade_date': BENCHMARK_DATE,
+            'account_id': f'ACC{rng.randrange(accounts):05d}',
+            'ticker': f'T{rng.randrange(tickers):04d}',
+            'quantity': quantity,
+            'price': price,
+            'market_value': quantity * price,
+        })
+        if len(batch) >= 10000 or i == trades - 1:
+            db.session.execute(insert(Trade), batch)
+            batch = []
+    db.session.commit()
+
+
+def time_query(label, query, repeat):
+    """Best-of-N wall time in milliseconds, plus the last result"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = query()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"  {label:<20} best {min(timings):8.1f} ms   median {sorted(timings)[len(timings) // 2]:8.1f} ms")
+    return result
+
+
+def _key(rows):
+    return sorted((r['account_id'], r['ticker'], r['percentage']) for r in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--trades', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default='sqlite:///:memory:')
+    args = parser.parse_args()
+
+    app = create_app(_config(args.database_url))
+    with app.app_context():
+        db.create_all()
+        print(f"Loading {args.trades} trades ({args.accounts} accounts, {args.tickers} tickers)...")
+        load_trades(args.accounts, args.tickers, args.trades)
+
+        results = {}
+        for name in ('positions', 'alarms'):
+            print(f"\n{name}:")
+            query = getattr(position_queries, f'get_{name}')
+            for engine in position_queries.QUERY_ENGINES:
+                results[name, engine] = time_query(
+                    engine, lambda: query(BENCHMARK_DATE, engine=engine), args.repeat
+                )
+            same = _key(results[name, 'join']) == _key(results[name, 'window'])
+            print(f"  results match: {same} ({len(results[name, 'window'])} rows)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Export trade dates to Parquet snapshots for the range analytics endpoints.
+Writes every trade date whose snapshot is missing or older than its latest
+ingest to ANALYTICS_SNAPSHOT_LOCATION, a local directory or
+s3://bucket/prefix, one file per date. Run it after ingestion, e.g. nightly
+from cron; dates without a current snapshot are read from the database.
+
+Usage: python scripts/export_trade_snapshots.py [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--location PATH]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.services.analytics import AnalyticsService
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--start', help='First trade date to export (YYYY-MM-DD)')
+    parser.add_argument('--end', help='Last trade date to export (YYYY-MM-DD)')
+    parser.add_argument('--location', help='Local directory or s3://bucket/prefix (default: ANALYTICS_SNAPSHOT_LOCATION)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            dates, rows = AnalyticsService.export_snapshots(
+                parse_date(args.start), parse_date(args.end), args.location
+            )
+            print(f"✅ Exported {rows} trades from {dates} trade dates")
+        except Exception as e:
+            print(f"❌ Error exporting snapshots: {str(e)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 """
 Script to trigger file ingestion.
-Supports three modes:
+Supports four modes:
   1. Local Disk Mode (EC2): Process all files from /home/sftp_user/uploads (RECOMMENDED for EC2)
-  2. SFTP Mode: Process all files from SFTP server
-  3. Event-Driven Mode: Process a single file from S3 (triggered by S3 ObjectCreated event)
+  2. Watch Mode (EC2): Long-running daemon that ingests uploads as soon as they are fully written
+  3. SFTP Mode: Process all files from SFTP server
+  4. Event-Driven Mode: Process one S3 object, a batch of objects, or drain a prefix (S3 events)
+
+Pass --profile to log a sampling profile and SQL timings of the whole run.
 """
+import argparse
 import sys
 import os
 import json
-import tempfile
-import boto3
+import signal
+import threading
 import shutil
 
 # Ensure the project root is on the Python path
@@ -18,10 +22,15 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from app import create_app
+from app import create_app, profiling
 from app.config import Config
+from app.services import ingestion_runs, ingestion_trace
 from app.services.ingestion_worker import IngestionWorker
 from app.services.file_ingestion import FileIngestionService
+from app.services.directory_watcher import DirectoryWatcher
+from app.services.s3_service import S3Service
+from app.services.s3_ingestion_worker import S3IngestionWorker
+from app.services.streams import INGESTIBLE_EXTENSIONS
 import logging
 
 logging.basicConfig(
@@ -31,6 +40,37 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+UPLOADS_DIR = "/home/sftp_user/uploads"
+PROCESSED_DIR = "/home/sftp_user/processed"
+# Plain .csv/.txt/.psv files plus their .gz/.zst/.zip compressed variants
+INGEST_EXTENSIONS = INGESTIBLE_EXTENSIONS
+
+
+def _ingest_local_file(ingestion_service, filename, uploads_dir, processed_dir, batch_id=None):
+    """Ingest one file from the uploads directory and move it to processed."""
+    file_path = os.path.join(uploads_dir, filename)
+    processed_path = os.path.join(processed_dir, filename)
+
+    try:
+        logger.info(f"Processing {filename}...")
+
+        with ingestion_trace.trace_file(filename, transport="local", batch_id=batch_id,
+                                        bytes=os.path.getsize(file_path)) as trace:
+            # Ingest the file
+            count = ingestion_service.ingest_file(file_path)
+            trace.root.set(rows=count)
+            logger.info(f"Successfully ingested {filename}: {count} records")
+
+            # Move to processed directory
+            with ingestion_trace.span("move_to_processed"):
+                shutil.move(file_path, processed_path)
+            logger.info(f"Moved {filename} to {processed_dir}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error processing {filename}: {str(e)}")
+        return False
+
 
 def ingest_from_local_disk():
     """
@@ -40,8 +80,8 @@ def ingest_from_local_disk():
     """
     logger.info("Starting local disk ingestion (EC2 mode)")
     
-    uploads_dir = "/home/sftp_user/uploads"
-    processed_dir = "/home/sftp_user/processed"
+    uploads_dir = UPLOADS_DIR
+    processed_dir = PROCESSED_DIR
     
     # Create directories if they don't exist
     os.makedirs(uploads_dir, exist_ok=True)
@@ -51,7 +91,7 @@ def ingest_from_local_disk():
         # List files
         files = [f for f in os.listdir(uploads_dir) 
                 if os.path.isfile(os.path.join(uploads_dir, f)) 
-                and f.endswith(('.csv', '.txt', '.psv'))]
+                and f.lower().endswith(INGEST_EXTENSIONS)]
         
         logger.info(f"Found {len(files)} files to process in {uploads_dir}")
         
@@ -61,28 +101,13 @@ def ingest_from_local_disk():
         
         app = create_app(Config)
         
-        with app.app_context():
+        with app.app_context(), ingestion_runs.batch("local") as batch_id:
             ingestion_service = FileIngestionService()
             
             for filename in files:
-                file_path = os.path.join(uploads_dir, filename)
-                processed_path = os.path.join(processed_dir, filename)
-                
-                try:
-                    logger.info(f"Processing {filename}...")
-                    
-                    # Ingest the file
-                    count = ingestion_service.ingest_file(file_path)
-                    logger.info(f"Successfully ingested {filename}: {count} records")
-                    
-                    # Move to processed directory
-                    shutil.move(file_path, processed_path)
-                    logger.info(f"Moved {filename} to {processed_dir}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing {filename}: {str(e)}")
-                    # Continue with next file instead of failing completely
-                    continue
+                # Continue with next file instead of failing completely
+                _ingest_local_file(ingestion_service, filename, uploads_dir, processed_dir,
+                                   batch_id=batch_id)
         
         logger.info("Local disk ingestion completed")
         
@@ -91,6 +116,35 @@ def ingest_from_local_disk():
         raise
 
 
+def watch_local_disk(stop_event=None):
+    """
+    Watch mode: long-running replacement for the 5-minute cron job.
+    Reacts to close-write/rename events on the uploads directory (polling
+    as a fallback) and ingests each file within seconds of it being fully
+    written, reusing one app and one database pool for the whole run.
+    """
+    logger.info("Starting local disk watcher (EC2 mode)")
+
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+
+    if stop_event is None:
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+
+    app = create_app(Config)
+    watcher = DirectoryWatcher(UPLOADS_DIR, extensions=INGEST_EXTENSIONS)
+
+    with app.app_context():
+        ingestion_service = FileIngestionService()
+
+        for filename in watcher.watch(should_stop=stop_event.is_set):
+            _ingest_local_file(ingestion_service, filename, UPLOADS_DIR, PROCESSED_DIR)
+
+    logger.info("Local disk watcher stopped")
+
+
 def ingest_from_sftp():
     """
     SFTP mode: Process all files from SFTP server (legacy/alternative mode).
@@ -116,6 +170,9 @@ def ingest_from_s3(bucket_name, object_key):
     Event-driven mode: Ingest a single file from S3.
     Triggered by S3 ObjectCreated event via EventBridge.
     
+    The object body is streamed straight into the parser (large objects are
+    fetched with concurrent ranged GETs), so nothing is written to disk.
+    
     Args:
         bucket_name: S3 bucket name
         object_key: S3 object key (path)
@@ -123,30 +180,20 @@ def ingest_from_s3(bucket_name, object_key):
     logger.info(f"Starting event-driven ingestion for s3://{bucket_name}/{object_key}")
     
     try:
-        # Download file from S3
-        s3_client = boto3.client('s3')
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(
-            mode='w+b', delete=False, suffix=os.path.splitext(object_key)[1]
-        ) as tmp_file:
-            tmp_path = tmp_file.name
-        
-        # Download from S3
-        logger.info(f"Downloading s3://{bucket_name}/{object_key} to {tmp_path}")
-        s3_client.download_file(bucket_name, object_key, tmp_path)
-        
-        # Ingest the file
         app = create_app(Config)
         with app.app_context():
-            ingestion_service = FileIngestionService()
-            count = ingestion_service.ingest_file(tmp_path)
+            s3_service = S3Service()
+            with ingestion_trace.trace_file(f"s3://{bucket_name}/{object_key}",
+                                            transport="s3") as trace:
+                fingerprint = None
+                if Config.INGEST_CHECKPOINT_ROWS:
+                    # Lets a retried event resume from the last committed chunk
+                    fingerprint = s3_service.object_fingerprint(bucket_name, object_key)
+                lines = s3_service.iter_object_lines(bucket_name, object_key)
+                count = FileIngestionService.ingest_stream(lines, object_key, fingerprint)
+                trace.root.set(rows=count)
             logger.info(f"Successfully ingested {object_key}: {count} records processed")
         
-        # Clean up
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-        
         return True
         
     except Exception as e:
@@ -154,24 +201,78 @@ def ingest_from_s3(bucket_name, object_key):
         raise
 
 
+def ingest_s3_batch(event):
+    """
+    Batched event-driven mode: ingest several S3 objects in one task.
+    Accepts a list of object references or a prefix to drain (see
+    S3IngestionWorker.expand_event). Objects are processed concurrently
+    with one app and one shared database pool.
+    
+    Returns:
+        List of per-object outcome dicts, or None if the event is invalid
+    """
+    app = create_app(Config)
+    
+    with app.app_context():
+        worker = S3IngestionWorker()
+        try:
+            objects = worker.expand_event(event)
+        except ValueError as e:
+            logger.error(f"Invalid INGEST_EVENT: {str(e)}")
+            return None
+        
+        if not objects:
+            logger.info("No S3 objects to process")
+            return []
+        
+        outcomes = worker.process_objects(objects)
+    
+    for outcome in outcomes:
+        logger.info(f"S3 object outcome: {json.dumps(outcome)}")
+    
+    return outcomes
+
+
 def main():
+    """Main entry point; --profile wraps the run in a profile."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the run (sampling profile of every thread plus SQL timings) and log it')
+    args = parser.parse_args()
+
+    if args.profile:
+        mode = os.getenv('INGEST_MODE', 'local').lower()
+        with profiling.profiled(f"ingest_files {'event' if os.getenv('INGEST_EVENT') else mode}"):
+            run()
+    else:
+        run()
+
+
+def run():
     """
-    Main entry point.
     Determines which ingestion mode to use based on environment.
     
     Priority:
-    1. INGEST_EVENT → S3 mode (single file from event)
+    1. INGEST_EVENT → S3 mode (single object, batch of objects, or prefix drain)
     2. INGEST_MODE=local → Local disk mode (EC2)
-    3. INGEST_MODE=sftp → SFTP mode (remote)
-    4. Default → Local disk mode (EC2)
+    3. INGEST_MODE=watch → Local disk watcher daemon (EC2)
+    4. INGEST_MODE=sftp → SFTP mode (remote)
+    5. Default → Local disk mode (EC2)
     """
     ingest_event_json = os.getenv('INGEST_EVENT')
     ingest_mode = os.getenv('INGEST_MODE', 'local').lower()
     
     if ingest_event_json:
-        # Event-driven mode (S3)
+        # Event-driven mode (S3). Only a malformed event is reported as
+        # such; ingestion errors take the normal failure path.
         try:
             event = json.loads(ingest_event_json)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse INGEST_EVENT JSON: {str(e)}")
+            sys.exit(1)
+        
+        if isinstance(event, dict) and 'objects' not in event and 's3_prefix' not in event:
+            # Single object (one S3 ObjectCreated event)
             bucket = event.get('s3_bucket')
             key = event.get('s3_key')
             
@@ -181,9 +282,21 @@ def main():
             
             ingest_from_s3(bucket, key)
             sys.exit(0)
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse INGEST_EVENT JSON: {str(e)}")
+        
+        # Batch of objects or a prefix to drain
+        outcomes = ingest_s3_batch(event)
+        if outcomes is None:
+            sys.exit(1)
+        failed = [o for o in outcomes if o['status'] != 'succeeded']
+        sys.exit(1 if failed else 0)
+    
+    elif ingest_mode == 'watch':
+        # Long-running watcher (replaces the cron job)
+        try:
+            watch_local_disk()
+            sys.exit(0)
+        except Exception as e:
+            logger.error(f"Local disk watcher failed: {str(e)}")
             sys.exit(1)
     
     elif ingest_mode == 'sftp':
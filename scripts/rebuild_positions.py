@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Rebuild position history (daily deltas and snapshots) from the trades table
+and archived trade dates.
+Run once after deploying position history onto an existing database, or to
+repair it after trades were changed outside the ingestion pipeline.
+Usage: python scripts/rebuild_positions.py
+"""
+import sys
+import os
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.services.position_history import PositionHistoryService
+
+def main():
+    """Main function"""
+    app = create_app()
+    with app.app_context():
+        try:
+            snapshots = PositionHistoryService.rebuild()
+            print(f"✅ Rebuilt position history ({snapshots} snapshots)")
+        except Exception as e:
+            print(f"❌ Error rebuilding position history: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Recount trades per trade date and correct the counts /metrics reports.
+Run once after deploying onto an existing database, then periodically
+(e.g. nightly from cron) to catch trades changed outside the ingestion
+pipeline. Dates whose count changed also get a new data version.
+Usage: python scripts/reconcile_trade_stats.py
+"""
+import sys
+import os
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.services.data_versions import DataVersionService
+
+def main():
+    """Main function"""
+    app = create_app()
+    with app.app_context():
+        try:
+            corrected = DataVersionService.reconcile()
+            total, latest = DataVersionService.totals()
+            print(f"✅ Reconciled trade counts ({corrected} dates corrected, "
+                  f"{total} trades, latest {latest})")
+        except Exception as e:
+            print(f"❌ Error reconciling trade counts: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
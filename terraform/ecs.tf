@@ -60,7 +60,7 @@ resource "aws_ecs_task_definition" "app" {
       }
 
       healthCheck = {
-        command     = ["CMD-SHELL", "curl -f http://localhost:5000/health || exit 1"]
+        command     = ["CMD-SHELL", "curl -f http://localhost:5000/health/live || exit 1"]
         interval    = 30
         timeout     = 10
         retries     = 3
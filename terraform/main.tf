@@ -353,7 +353,8 @@ resource "aws_lb_target_group" "app" {
     unhealthy_threshold = 3
     timeout             = 10
     interval            = 30
-    path                = "/health"
+    # Readiness ignores pool saturation, so a busy task is not replaced
+    path                = "/health/ready"
     matcher             = "200"
   }
 
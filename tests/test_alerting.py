@@ -56,3 +56,21 @@ class TestAlertingService:
             call_args = mock_post.call_args
             assert call_args[1]["json"]["alert_type"] == "data_quality"
             assert len(call_args[1]["json"]["data"]["issues"]) == 2
+
+    def test_send_data_quality_alert_with_summary(self):
+        service = AlertingService()
+
+        with patch("app.services.alerting_service.requests.post") as mock_post:
+            mock_response = MagicMock()
+            mock_response.raise_for_status = MagicMock()
+            mock_post.return_value = mock_response
+
+            summary = {"bad_rows": 12, "rejected": True}
+            result = service.send_data_quality_alert(
+                "file.csv", ["invalid_price: 12 rows"], summary=summary
+            )
+
+            assert result is True
+            data = mock_post.call_args[1]["json"]["data"]
+            assert data["summary"] == summary
+            assert data["severity"] == "medium"
@@ -0,0 +1,197 @@
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models import TradeDateVersion, TradeSnapshot
+from app.services import analytics
+from app.services.analytics import AnalyticsService
+from app.services.file_ingestion import FileIngestionService
+from app.services.trade_archive import TradeArchiveService
+
+HEADERS = {"X-API-Key": "test-api-key"}
+
+CSV_HEADER = "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+
+ROWS = [
+    "2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17\n",
+    "2025-01-15,ACC001,MSFT,10,420.25,BUY,2025-01-17\n",
+    "2025-01-15,ACC002,NVDA,40,505.30,BUY,2025-01-17\n",
+    "2025-01-15,ACC002,AAPL,5,185.50,SELL,2025-01-17\n",
+    "2025-01-16,ACC001,AAPL,20,186.00,SELL,2025-01-20\n",
+    "2025-01-16,ACC002,TSLA,3,250.00,BUY,2025-01-20\n",
+    "2025-01-16,ACC002,NVDA,1,505.30,BUY,2025-01-20\n",
+    "2025-01-17,ACC003,MSFT,8,421.00,BUY,2025-01-21\n",
+]
+
+DATES = ["2025-01-15", "2025-01-16", "2025-01-17"]
+
+needs_duckdb = pytest.mark.skipif(
+    not analytics.engine_available(), reason="duckdb is not installed"
+)
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def snapshot_location(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "ANALYTICS_SNAPSHOT_LOCATION", str(tmp_path / "snap"))
+
+
+@pytest.fixture
+def ingested(app, tmp_path):
+    path = tmp_path / "trades.csv"
+    path.write_text(CSV_HEADER + "".join(ROWS))
+    FileIngestionService.ingest_file(str(path))
+
+
+def _range(client, key, **params):
+    query = "&".join(f"{name}={value}" for name, value in params.items())
+    response = client.get(
+        f"/api/{key}/range?start_date=2025-01-15&end_date=2025-01-17&{query}",
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    return response.get_json()[key]
+
+
+def _per_date(client, key, **params):
+    """The same records, fetched one date at a time from the per-date endpoint"""
+    query = "".join(f"&{name}={value}" for name, value in params.items())
+    records = [
+        {"date": day, **record}
+        for day in DATES
+        for record in client.get(
+            f"/api/{key}?date={day}{query}", headers=HEADERS
+        ).get_json()[key]
+    ]
+    return sorted(records, key=lambda r: (r["date"], r["account_id"], r["ticker"]))
+
+
+class TestRangeAnalytics:
+    @needs_duckdb
+    def test_snapshots_match_per_date_endpoints(self, client, ingested, tmp_path):
+        assert AnalyticsService.export_snapshots(location=str(tmp_path / "snap")) == (
+            3,
+            len(ROWS),
+        )
+
+        with patch.object(
+            analytics.position_queries,
+            "get_positions",
+            side_effect=AssertionError("read from the database"),
+        ):
+            positions = _range(client, "positions")
+        assert positions == _per_date(client, "positions")
+        assert _range(client, "alarms", threshold=30) == _per_date(
+            client, "alarms", threshold=30
+        )
+
+    def test_database_fallback_matches(self, client, ingested):
+        assert _range(client, "positions") == _per_date(client, "positions")
+        assert _range(client, "alarms") == _per_date(client, "alarms")
+
+    @needs_duckdb
+    def test_stale_dates_read_from_database(self, app, client, ingested, tmp_path):
+        AnalyticsService.export_snapshots(location=str(tmp_path / "snap"))
+        late = tmp_path / "late.csv"
+        late.write_text(CSV_HEADER + "2025-01-16,ACC004,AMZN,2,178.00,BUY,2025-01-20\n")
+        FileIngestionService.ingest_file(str(late))
+
+        files, dates = analytics._plan(date(2025, 1, 15), date(2025, 1, 17))
+        assert len(files) == 2
+        assert dates == [date(2025, 1, 16)]
+        assert ("2025-01-16", "ACC004") in {
+            (p["date"], p["account_id"]) for p in _range(client, "positions")
+        }
+
+        first = db.session.get(TradeSnapshot, date(2025, 1, 16)).location
+        assert AnalyticsService.export_snapshots(location=str(tmp_path / "snap")) == (
+            1,
+            4,
+        )
+        assert not (tmp_path / first).exists()
+        assert analytics._plan(date(2025, 1, 15), date(2025, 1, 17))[1] == []
+
+    def test_account_filter_and_archived_dates(self, client, ingested, tmp_path):
+        TradeArchiveService.archive(date(2025, 1, 16), str(tmp_path / "archive"))
+        AnalyticsService.export_snapshots(location=str(tmp_path / "snap"))
+
+        positions = _range(client, "positions", account_id="ACC002")
+        assert {p["account_id"] for p in positions} == {"ACC002"}
+        assert {p["date"] for p in positions} == {"2025-01-15", "2025-01-16"}
+        assert positions == [
+            p for p in _per_date(client, "positions") if p["account_id"] == "ACC002"
+        ]
+
+    def test_range_validation(self, client):
+        response = client.get(
+            "/api/positions/range?start_date=2025-01-15", headers=HEADERS
+        )
+        assert response.status_code == 400
+        response = client.get(
+            "/api/alarms/range?start_date=2024-01-01&end_date=2025-06-01",
+            headers=HEADERS,
+        )
+        assert response.status_code == 400
+        assert "too long" in response.get_json()["error"]
+
+    def test_location_required(self, app, monkeypatch):
+        monkeypatch.setattr(Config, "ANALYTICS_SNAPSHOT_LOCATION", "")
+        with pytest.raises(ValueError):
+            AnalyticsService.export_snapshots()
+
+    def test_empty_location_disables_engine(
+        self, client, ingested, tmp_path, monkeypatch
+    ):
+        AnalyticsService.export_snapshots(location=str(tmp_path / "snap"))
+        monkeypatch.setattr(Config, "ANALYTICS_SNAPSHOT_LOCATION", "")
+
+        files, dates = analytics._plan(date(2025, 1, 15), date(2025, 1, 17))
+        assert files == []
+        assert dates == [date(2025, 1, 15), date(2025, 1, 16), date(2025, 1, 17)]
+        assert _range(client, "positions") == _per_date(client, "positions")
+
+    def test_dates_without_versions_read_from_database(self, client, ingested):
+        TradeDateVersion.query.delete()
+        db.session.commit()
+
+        positions = _range(client, "positions")
+        assert {p["date"] for p in positions} == set(DATES)
+        assert positions == _per_date(client, "positions")
+
+    @needs_duckdb
+    def test_one_database_per_process(self, app, monkeypatch):
+        monkeypatch.setattr(analytics, "_database", None)
+        monkeypatch.setattr(analytics, "_s3_ready", False)
+        with patch("duckdb.connect") as connect:
+            for _ in range(2):
+                analytics._connect(["s3://bucket/trade_date=2025-01-15/a.parquet"])
+
+        assert connect.call_count == 1
+        statements = [c.args[0] for c in connect.return_value.execute.call_args_list]
+        assert statements.count("INSTALL httpfs") == 1
+        assert (
+            statements.count("CREATE SECRET (TYPE s3, PROVIDER credential_chain)") == 1
+        )
+        assert connect.return_value.cursor.call_count == 2
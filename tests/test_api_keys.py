@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from app import api_keys, create_app, db
+from app.api_keys import ApiKey, ApiKeyRegistry
+from app.config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+    API_KEYS = json.dumps(
+        [
+            {"name": "reporting", "key": "reporting-key"},
+            {"name": "batch", "key": "batch-key", "rate_per_second": 1, "burst": 2},
+        ]
+    )
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(api_keys.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _blotter(client, key):
+    return client.get("/api/blotter?date=2025-01-15", headers={"X-API-Key": key})
+
+
+class TestApiKeys:
+    def test_every_configured_key_is_accepted(self, client):
+        for key in ("test-api-key", "reporting-key", "batch-key"):
+            assert _blotter(client, key).status_code == 200
+        assert _blotter(client, "other-key").status_code == 401
+
+    def test_limits_are_off_by_default(self, clock, client):
+        for _ in range(100):
+            assert _blotter(client, "test-api-key").status_code == 200
+
+    def test_rate_limit_returns_429_with_retry_after(self, clock, client):
+        assert _blotter(client, "batch-key").status_code == 200
+        assert _blotter(client, "batch-key").status_code == 200
+
+        response = _blotter(client, "batch-key")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+
+        # Other keys have their own buckets
+        assert _blotter(client, "reporting-key").status_code == 200
+
+        clock[0] += 1
+        assert _blotter(client, "batch-key").status_code == 200
+
+    def test_batch_is_charged_per_sub_query(self, clock, client):
+        queries = [{"path": "/api/positions?date=2025-01-15"}] * 3
+        response = client.post(
+            "/api/batch", json={"queries": queries}, headers={"X-API-Key": "batch-key"}
+        )
+        assert response.status_code == 200
+
+        # Three tokens taken from a burst of two: the next request waits for two
+        response = _blotter(client, "batch-key")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "2"
+
+        clock[0] += 2
+        assert _blotter(client, "batch-key").status_code == 200
+
+    def test_usage_counters_in_metrics(self, clock, client):
+        for _ in range(3):
+            _blotter(client, "batch-key")
+        _blotter(client, "reporting-key")
+
+        usage = client.get("/metrics").get_json()["api_keys"]
+        assert usage["batch"] == {
+            "requests": 2,
+            "rate_limited": 1,
+            "concurrency_limited": 0,
+            "in_flight": 0,
+        }
+        assert usage["reporting"]["requests"] == 1
+        assert usage["default"]["requests"] == 0
+
+    def test_concurrent_request_cap(self):
+        api_key = ApiKey("reporting", "reporting-key", max_concurrent=2)
+        assert api_key.acquire() == (True, None)
+        assert api_key.acquire() == (True, None)
+        assert api_key.acquire() == (False, 1)
+        api_key.release()
+        assert api_key.acquire() == (True, None)
+        assert api_key.usage()["concurrency_limited"] == 1
+
+    def test_keys_from_json_file(self, tmp_path):
+        path = tmp_path / "keys.json"
+        path.write_text(json.dumps([{"name": "ops", "key": "ops-key"}]))
+
+        registry = ApiKeyRegistry.from_config(
+            {"API_KEYS": str(path), "API_RATE_LIMIT_PER_SECOND": 5}
+        )
+        api_key = registry.lookup("ops-key")
+        assert api_key.name == "ops"
+        assert api_key.bucket.rate == 5
+        assert registry.lookup("dev-api-key-change-in-production") is None
+
+    def test_invalid_api_keys_setting_is_ignored(self):
+        registry = ApiKeyRegistry.from_config(
+            {"API_KEY": "main", "API_KEYS": "not json"}
+        )
+        assert list(registry.usage()) == ["default"]
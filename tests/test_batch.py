@@ -0,0 +1,167 @@
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.services import position_queries
+from app.services.file_ingestion import FileIngestionService
+
+HEADERS = {"X-API-Key": "test-api-key"}
+
+CSV_HEADER = "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+
+ROWS = [
+    "2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17\n",
+    "2025-01-15,ACC001,MSFT,10,420.25,BUY,2025-01-17\n",
+    "2025-01-15,ACC002,NVDA,40,505.30,BUY,2025-01-17\n",
+    "2025-01-15,ACC002,AAPL,5,185.50,SELL,2025-01-17\n",
+    "2025-01-16,ACC001,AAPL,20,186.00,SELL,2025-01-20\n",
+    "2025-01-16,ACC003,TSLA,3,250.00,BUY,2025-01-20\n",
+    "2025-01-16,ACC003,NVDA,1,505.30,BUY,2025-01-20\n",
+]
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        path = tmp_path / "trades.csv"
+        path.write_text(CSV_HEADER + "".join(ROWS))
+        FileIngestionService.ingest_file(str(path))
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _batch(client, queries):
+    return client.post("/api/batch", json={"queries": queries}, headers=HEADERS)
+
+
+class TestBatch:
+    def test_results_match_individual_requests(self, client):
+        paths = [
+            "/api/blotter?date=2025-01-15",
+            "/api/positions?date=2025-01-15",
+            "/api/alarms?date=2025-01-15&threshold=30",
+            "/api/accounts/ACC002/positions?date=2025-01-15",
+            "/api/accounts/alarms?date=2025-01-16&account_id=ACC001,ACC003",
+            "/api/positions?date=2025-01-16",
+        ]
+        response = _batch(
+            client, [{"id": str(i), "path": path} for i, path in enumerate(paths)]
+        )
+
+        assert response.status_code == 200
+        results = response.get_json()["results"]
+        assert [r["id"] for r in results] == [str(i) for i in range(len(paths))]
+        for path, result in zip(paths, results):
+            assert result["status"] == 200
+            assert result["body"] == client.get(path, headers=HEADERS).get_json()
+
+    def test_params_object_and_repeated_values(self, client):
+        response = _batch(
+            client,
+            [
+                {
+                    "path": "/api/accounts/positions",
+                    "params": {
+                        "date": "2025-01-15",
+                        "account_id": ["ACC001", "ACC002"],
+                    },
+                }
+            ],
+        )
+        body = response.get_json()["results"][0]["body"]
+        assert body["account_ids"] == ["ACC001", "ACC002"]
+        assert {p["account_id"] for p in body["positions"]} == {"ACC001", "ACC002"}
+
+    def test_one_scan_per_date(self, client):
+        values = position_queries.get_ticker_values
+        with patch.object(
+            position_queries, "get_ticker_values", side_effect=values
+        ) as scans, patch.object(
+            position_queries, "get_trades", side_effect=position_queries.get_trades
+        ) as reads:
+            _batch(
+                client,
+                [
+                    {"path": "/api/positions?date=2025-01-15"},
+                    {"path": "/api/alarms?date=2025-01-15"},
+                    {"path": "/api/accounts/ACC001/alarms?date=2025-01-15"},
+                    {"path": "/api/blotter?date=2025-01-15"},
+                    {"path": "/api/blotter?date=2025-01-15"},
+                    {"path": "/api/accounts/ACC001/positions?date=2025-01-16"},
+                    {"path": "/api/accounts/ACC003/alarms?date=2025-01-16"},
+                ],
+            )
+
+        assert sorted((c.args[0].isoformat(), c.args[1]) for c in scans.mock_calls) == [
+            ("2025-01-15", None),
+            ("2025-01-16", ["ACC001", "ACC003"]),
+        ]
+        assert reads.call_count == 1
+
+    def test_invalid_sub_queries_fail_alone(self, client):
+        response = _batch(
+            client,
+            [
+                {"id": "a", "path": "/api/trades?date=2025-01-15"},
+                {"id": "b", "path": "/api/positions"},
+                {"id": "c", "path": "/api/alarms?date=2025-01-15&threshold=500"},
+                {"id": "d", "path": "/api/accounts/alarms?date=2025-01-15"},
+                {"id": "e", "path": "/api/positions?date=2025-01-15"},
+            ],
+        )
+
+        assert response.status_code == 200
+        results = {r["id"]: r for r in response.get_json()["results"]}
+        assert results["a"]["status"] == 404
+        assert results["b"]["body"] == {"error": "date parameter is required"}
+        assert results["c"]["status"] == 400
+        assert results["d"]["status"] == 400
+        assert results["e"]["status"] == 200
+
+    def test_errors_match_individual_requests(self, client):
+        paths = [
+            "/api/accounts/alarms?threshold=abc",
+            "/api/accounts/positions?date=15-01-2025",
+            "/api/accounts/alarms?date=2025-01-15&threshold=abc",
+            "/api/accounts/alarms?date=2025-01-15&account_id=ACC001&threshold=nan",
+            "/api/alarms?date=2025-01-15&threshold=-5",
+        ]
+        response = _batch(client, [{"path": path} for path in paths])
+
+        for path, result in zip(paths, response.get_json()["results"]):
+            individual = client.get(path, headers=HEADERS)
+            assert result["status"] == individual.status_code == 400
+            assert result["body"] == individual.get_json()
+        assert [r["body"]["error"] for r in response.get_json()["results"][:3]] == [
+            "date parameter is required",
+            "Invalid date format. Use YYYY-MM-DD",
+            "account_id parameter is required",
+        ]
+
+    def test_request_validation(self, client, monkeypatch):
+        assert _batch(client, []).status_code == 400
+        assert client.post("/api/batch", headers=HEADERS).status_code == 400
+
+        monkeypatch.setattr(Config, "BATCH_MAX_QUERIES", 2)
+        response = _batch(client, [{"path": "/api/positions?date=2025-01-15"}] * 3)
+        assert response.status_code == 400
+        assert "at most 2" in response.get_json()["error"]
+
+    def test_requires_api_key(self, client):
+        response = client.post("/api/batch", json={"queries": []})
+        assert response.status_code == 401
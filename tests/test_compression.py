@@ -0,0 +1,160 @@
+import gzip
+import json
+from datetime import date
+
+import pytest
+import zstandard
+from flask import Response
+
+from app import compression, create_app, db
+from app.config import Config
+from app.models import Trade
+from app.services import position_queries
+from app.services.data_versions import DataVersionService
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+
+    @app.route("/api/test-stream")
+    def stream():
+        return Response((f"line {i}\n" for i in range(1000)), mimetype="text/plain")
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    compression.clear_cache()
+    yield
+    compression.clear_cache()
+
+
+@pytest.fixture
+def busy_date(app):
+    db.session.add_all(
+        Trade(
+            trade_date=date(2025, 1, 15),
+            account_id=f"ACC{i:03d}",
+            ticker="AAPL",
+            quantity=i,
+            price=185.50,
+            market_value=185.50 * i,
+            trade_type="BUY",
+        )
+        for i in range(1, 101)
+    )
+    db.session.commit()
+
+
+def _get(client, url, **headers):
+    return client.get(url, headers={"X-API-Key": "test-api-key", **headers})
+
+
+class TestResponseCompression:
+    def test_gzip_round_trip(self, client, busy_date):
+        url = "/api/blotter?date=2025-01-15"
+        plain = _get(client, url)
+        assert "Content-Encoding" not in plain.headers
+
+        response = _get(client, url, **{"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert len(response.data) < len(plain.data)
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+
+    def test_negotiation_follows_quality_values(self, client, busy_date):
+        url = "/api/positions?date=2025-01-15"
+        response = _get(client, url, **{"Accept-Encoding": "gzip, zstd"})
+        assert response.headers["Content-Encoding"] == "zstd"
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(response.data)
+        assert json.loads(body)["date"] == "2025-01-15"
+
+        response = _get(client, url, **{"Accept-Encoding": "gzip;q=1, zstd;q=0.5"})
+        assert response.headers["Content-Encoding"] == "gzip"
+
+        response = _get(client, url, **{"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+
+    def test_small_bodies_are_sent_as_is(self, client):
+        response = _get(
+            client, "/api/blotter?date=2025-01-15", **{"Accept-Encoding": "gzip"}
+        )
+        assert "Content-Encoding" not in response.headers
+
+    def test_level_zero_disables_compression(self, client, busy_date, monkeypatch):
+        monkeypatch.setattr(Config, "RESPONSE_COMPRESSION_LEVEL", 0)
+        response = _get(
+            client, "/api/blotter?date=2025-01-15", **{"Accept-Encoding": "gzip"}
+        )
+        assert "Content-Encoding" not in response.headers
+
+    def test_streamed_response(self, client):
+        response = _get(client, "/api/test-stream", **{"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in response.headers
+        lines = gzip.decompress(response.data).decode().splitlines()
+        assert lines[0] == "line 0" and lines[-1] == "line 999"
+
+
+class TestCompressedResponseCache:
+    url = "/api/positions?date=2025-01-15"
+
+    def test_hot_response_served_from_cache(self, client, busy_date, monkeypatch):
+        first = _get(client, self.url, **{"Accept-Encoding": "gzip"})
+        assert first.headers["ETag"] == '"2025-01-15.0+gzip"'
+
+        def fail(*args, **kwargs):
+            raise AssertionError("view ran for a cached response")
+
+        monkeypatch.setattr(position_queries, "get_positions", fail)
+        cached = _get(client, self.url, **{"Accept-Encoding": "gzip"})
+        assert cached.status_code == 200
+        assert cached.data == first.data
+        assert cached.headers["ETag"] == first.headers["ETag"]
+
+        response = _get(
+            client,
+            self.url,
+            **{"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]},
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == first.headers["ETag"]
+
+    def test_new_version_bypasses_cache(self, client, busy_date):
+        first = _get(client, self.url, **{"Accept-Encoding": "gzip"})
+
+        db.session.add(
+            Trade(
+                trade_date=date(2025, 1, 15),
+                account_id="ACC999",
+                ticker="MSFT",
+                quantity=1,
+                market_value=420.0,
+            )
+        )
+        DataVersionService.bump({date(2025, 1, 15): 1})
+        db.session.commit()
+
+        response = _get(client, self.url, **{"Accept-Encoding": "gzip"})
+        assert response.headers["ETag"] == '"2025-01-15.1+gzip"'
+        positions = json.loads(gzip.decompress(response.data))["positions"]
+        assert (
+            len(positions)
+            == len(json.loads(gzip.decompress(first.data))["positions"]) + 1
+        )
@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.data_quality import DataQualityError, DataQualityReport
+
+
+class TestDataQualityReport:
+    def test_counts_violations_per_rule(self):
+        report = DataQualityReport("file.csv", max_bad_rows=0, sample_size=2)
+
+        for line in range(5):
+            report.record("invalid_price", line, "row", "bad price")
+        report.record("missing_ticker", 9, "row", "ticker is empty")
+
+        assert report.bad_rows == 6
+        assert report.violations == {"invalid_price": 5, "missing_ticker": 1}
+        assert report.issues() == ["invalid_price: 5 rows", "missing_ticker: 1 rows"]
+
+    def test_sample_retention_is_bounded(self):
+        report = DataQualityReport("file.csv", max_bad_rows=0, sample_size=2)
+
+        for line in range(100):
+            report.record("invalid_price", line, "x" * 1000, "bad price")
+
+        samples = report.to_dict()["samples"]["invalid_price"]
+        assert len(samples) == 2
+        assert samples[0]["line"] == 0
+        assert len(samples[0]["row"]) == 200
+
+    def test_rejects_after_max_bad_rows(self):
+        report = DataQualityReport("file.csv", max_bad_rows=3)
+
+        for line in range(3):
+            report.record("invalid_quantity", line, "row", "bad quantity")
+
+        with pytest.raises(DataQualityError) as exc_info:
+            report.record("invalid_quantity", 4, "row", "bad quantity")
+
+        assert exc_info.value.report is report
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import pytest
+
+from app.services.directory_watcher import DirectoryWatcher
+
+
+def _write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class TestDirectoryWatcher:
+    def test_poll_waits_until_file_is_stable(self, tmp_path):
+        watcher = DirectoryWatcher(str(tmp_path), settle_seconds=0, use_inotify=False)
+        _write(tmp_path / "trades.csv", "partial")
+
+        assert watcher.poll() == []
+
+        assert watcher.poll() == ["trades.csv"]
+        # Not handed out twice while unchanged
+        assert watcher.poll() == []
+
+    def test_poll_ignores_other_extensions_and_growing_files(self, tmp_path):
+        watcher = DirectoryWatcher(str(tmp_path), settle_seconds=0, use_inotify=False)
+        _write(tmp_path / "trades.csv.filepart", "x")
+        _write(tmp_path / "growing.txt", "a")
+
+        assert watcher.poll() == []
+        _write(tmp_path / "growing.txt", "ab")
+        assert watcher.poll() == []
+        assert watcher.poll() == ["growing.txt"]
+
+    def test_poll_respects_settle_time(self, tmp_path):
+        watcher = DirectoryWatcher(
+            str(tmp_path), settle_seconds=3600, use_inotify=False
+        )
+        _write(tmp_path / "trades.csv", "data")
+
+        watcher.poll()
+        assert watcher.poll() == []
+
+    @pytest.mark.skipif(
+        not os.uname().sysname == "Linux", reason="inotify is Linux only"
+    )
+    def test_inotify_yields_file_on_close_write(self, tmp_path):
+        _write(tmp_path / "existing.txt", "old")
+        watcher = DirectoryWatcher(str(tmp_path), poll_interval=0.05, settle_seconds=0)
+        stop = threading.Event()
+        events = watcher.watch(should_stop=stop.is_set)
+
+        assert next(events) == "existing.txt"
+
+        timer = threading.Timer(0.1, _write, (tmp_path / "new.csv", "data"))
+        timer.start()
+        try:
+            assert next(events) == "new.csv"
+        finally:
+            timer.cancel()
+            stop.set()
+            events.close()
+
+    @pytest.mark.skipif(
+        not os.uname().sysname == "Linux", reason="inotify is Linux only"
+    )
+    def test_inotify_yields_file_still_settling_at_startup(self, tmp_path):
+        _write(tmp_path / "fresh.csv", "data")
+        watcher = DirectoryWatcher(
+            str(tmp_path), poll_interval=0.05, settle_seconds=0.3
+        )
+        stop = threading.Event()
+        events = watcher.watch(should_stop=stop.is_set)
+
+        timer = threading.Timer(5, stop.set)
+        timer.start()
+        try:
+            assert next(events) == "fresh.csv"
+        finally:
+            timer.cancel()
+            stop.set()
+            events.close()
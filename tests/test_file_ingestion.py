@@ -1,11 +1,15 @@
 from datetime import date
+from unittest.mock import patch
 
 import pytest
 
 from app import create_app, db
-from app.config import Config
-from app.models import Trade
+from app.config import Config, load_choice_setting
+from app.models import IngestionCheckpoint, PositionDelta, Trade
+from app.services.data_quality import DataQualityError, DataQualityReport
+from app.services.data_versions import DataVersionService
 from app.services.file_ingestion import FileIngestionService
+from app.services.staging_loader import StagingLoader
 
 
 class TestConfig(Config):
@@ -115,3 +119,355 @@ class TestFileIngestion:
             assert trade.source_system == "CUSTODIAN_A"
         finally:
             os.remove(tmp_path)
+
+    def test_parse_format1_counts_bad_rows(self, app):
+        file_content = """TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate
+2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17
+15/01/2025,ACC001,MSFT,50,420.25,BUY,2025-01-17
+2025-01-15,ACC001,MSFT,fifty,420.25,BUY,2025-01-17
+2025-01-15,,MSFT,50,420.25,BUY,2025-01-17"""
+        report = DataQualityReport("file.csv", max_bad_rows=0)
+
+        trades = FileIngestionService.parse_format1(file_content, report)
+
+        assert len(trades) == 1
+        assert report.violations == {
+            "invalid_trade_date": 1,
+            "invalid_quantity": 1,
+            "missing_account_id": 1,
+        }
+        assert report.samples["invalid_trade_date"][0]["line"] == 3
+
+    def test_parse_format2_skips_header(self, app):
+        file_content = """REPORT_DATE|ACCOUNT_ID|SECURITY_TICKER|SHARES|MARKET_VALUE|SOURCE_SYSTEM
+20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A"""
+        report = DataQualityReport("file.txt")
+
+        trades = FileIngestionService.parse_format2(file_content, report)
+
+        assert len(trades) == 1
+        assert not report.has_issues
+
+    def test_parse_format2_counts_malformed_rows(self, app):
+        file_content = """20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A
+20250115|ACC001|MSFT
+20250115|ACC001|MSFT|50|n/a|CUSTODIAN_A"""
+        report = DataQualityReport("file.txt", max_bad_rows=0)
+
+        trades = FileIngestionService.parse_format2(file_content, report)
+
+        assert len(trades) == 1
+        assert report.violations == {"malformed_row": 1, "invalid_market_value": 1}
+
+    def test_ingest_file_sends_one_quality_alert(self, app):
+        import os
+        import tempfile
+
+        bad_rows = "\n".join(
+            "20250115|ACC001|AAPL|x|1.00|CUSTODIAN_A" for _ in range(50)
+        )
+        file_content = "20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A\n" + bad_rows
+
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".txt") as f:
+            f.write(file_content)
+            tmp_path = f.name
+
+        try:
+            with patch(
+                "app.services.file_ingestion.AlertingService.send_data_quality_alert"
+            ) as mock_alert:
+                count = FileIngestionService.ingest_file(tmp_path)
+
+            assert count == 1
+            mock_alert.assert_called_once()
+            assert mock_alert.call_args[0][1] == ["invalid_quantity: 50 rows"]
+            assert mock_alert.call_args[1]["summary"]["rejected"] is False
+        finally:
+            os.remove(tmp_path)
+
+    def test_ingest_file_rejects_clearly_bad_file(self, app):
+        import os
+        import tempfile
+
+        file_content = "\n".join(
+            "20250115|ACC001|AAPL|x|1.00|CUSTODIAN_A" for _ in range(20)
+        )
+
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".txt") as f:
+            f.write(file_content)
+            tmp_path = f.name
+
+        try:
+            with patch(
+                "app.services.file_ingestion.AlertingService.send_data_quality_alert"
+            ) as mock_alert, patch(
+                "app.services.data_quality.Config.DATA_QUALITY_MAX_BAD_ROWS", 5
+            ):
+                with pytest.raises(DataQualityError):
+                    FileIngestionService.ingest_file(tmp_path)
+
+            mock_alert.assert_called_once()
+            assert mock_alert.call_args[1]["summary"]["rejected"] is True
+            assert Trade.query.count() == 0
+        finally:
+            os.remove(tmp_path)
+
+    @pytest.mark.parametrize("compression", ["gzip", "zstd", "zip"])
+    def test_ingest_compressed_file(self, app, tmp_path, compression):
+        import gzip
+        import zipfile
+
+        import zstandard
+
+        file_content = b"""TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate
+2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17
+2025-01-15,ACC002,MSFT,50,420.25,SELL,2025-01-17
+"""
+        # Name without a telling extension: detection goes by magic bytes
+        path = tmp_path / "upload.tmp"
+        if compression == "gzip":
+            path.write_bytes(gzip.compress(file_content))
+        elif compression == "zstd":
+            path.write_bytes(zstandard.ZstdCompressor().compress(file_content))
+        else:
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("trades.csv", file_content)
+
+        count = FileIngestionService.ingest_file(str(path))
+
+        assert count == 2
+        assert Trade.query.filter_by(account_id="ACC002").one().quantity == -50
+
+
+def _format1_rows(count, start=1):
+    return "".join(
+        f"2025-01-15,ACC{i:03d},AAPL,{i},185.50,BUY,2025-01-17\n"
+        for i in range(start, start + count)
+    )
+
+
+class TestCheckpointedIngestion:
+    header = "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+
+    @pytest.fixture(autouse=True)
+    def chunked(self, monkeypatch):
+        monkeypatch.setattr(Config, "INGEST_CHECKPOINT_ROWS", 10)
+        monkeypatch.setattr(Config, "INGEST_BATCH_SIZE", 10)
+
+    def _fail_on_write(self, call):
+        write_batch = FileIngestionService.write_batch
+        calls = []
+
+        def failing(rows, shards=None, position_deltas=None):
+            calls.append(rows)
+            if len(calls) == call:
+                raise RuntimeError("database went away")
+            write_batch(rows, shards, position_deltas)
+
+        return patch.object(FileIngestionService, "write_batch", side_effect=failing)
+
+    @pytest.mark.parametrize("compression", [None, "gzip"])
+    def test_resumes_after_last_committed_chunk(self, app, tmp_path, compression):
+        import gzip
+
+        content = ("\n" + self.header + _format1_rows(50)).encode()
+        path = tmp_path / "trades.csv"
+        path.write_bytes(gzip.compress(content) if compression else content)
+
+        with self._fail_on_write(3), pytest.raises(RuntimeError):
+            FileIngestionService.ingest_file(str(path))
+
+        checkpoint = IngestionCheckpoint.query.one()
+        assert checkpoint.status == "in_progress"
+        assert checkpoint.rows_committed == 20
+        assert Trade.query.count() == 20
+
+        count = FileIngestionService.ingest_file(str(path))
+
+        assert count == 30
+        quantities = [t.quantity for t in Trade.query.order_by(Trade.id).all()]
+        assert quantities == list(range(1, 51))
+        checkpoint = IngestionCheckpoint.query.one()
+        assert checkpoint.status == "complete"
+        assert checkpoint.rows_committed == 50
+        assert checkpoint.byte_offset == len(content)
+
+    def test_parallel_parse_resumes_from_range_end(self, app, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "INGEST_PARALLEL_WORKERS", 2)
+        monkeypatch.setattr(Config, "INGEST_PARALLEL_MIN_BYTES", 0)
+        path = tmp_path / "trades.csv"
+        path.write_text(self.header + _format1_rows(200))
+
+        with self._fail_on_write(12), pytest.raises(RuntimeError):
+            FileIngestionService.ingest_file(str(path))
+        committed = Trade.query.count()
+        assert 0 < committed < 200
+
+        assert FileIngestionService.ingest_file(str(path)) == 200 - committed
+        quantities = [t.quantity for t in Trade.query.order_by(Trade.id).all()]
+        assert quantities == list(range(1, 201))
+
+    def test_completed_file_is_not_ingested_twice(self, app, tmp_path):
+        path = tmp_path / "trades.csv"
+        path.write_text(self.header + _format1_rows(15))
+
+        assert FileIngestionService.ingest_file(str(path)) == 15
+        assert FileIngestionService.ingest_file(str(path)) == 0
+
+        # A different file under the same name starts a fresh checkpoint
+        path.write_text(self.header + _format1_rows(5, start=100))
+        assert FileIngestionService.ingest_file(str(path)) == 5
+        assert Trade.query.count() == 20
+        assert IngestionCheckpoint.query.one().rows_committed == 5
+
+    def test_correction_past_the_first_bytes_is_ingested(self, app, tmp_path):
+        path = tmp_path / "trades.csv"
+        rows = _format1_rows(3000)
+        path.write_text(self.header + rows)
+        assert FileIngestionService.ingest_file(str(path)) == 3000
+
+        # Same name and size, only the last row's quantity differs
+        corrected = rows[: -len("3000,185.50,BUY,2025-01-17\n")]
+        path.write_text(self.header + corrected + "3001,185.50,BUY,2025-01-17\n")
+        assert FileIngestionService.ingest_file(str(path)) == 3000
+        assert IngestionCheckpoint.query.one().status == "complete"
+
+    def test_bad_rows_count_across_resumes(self, app, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "DATA_QUALITY_MAX_BAD_ROWS", 3)
+        bad = "2025-01-15,ACC999,AAPL,oops,185.50,BUY,2025-01-17\n"
+        path = tmp_path / "trades.csv"
+        path.write_text(
+            self.header
+            + bad * 2
+            + _format1_rows(20)
+            + bad * 2
+            + _format1_rows(10, start=21)
+        )
+
+        with patch(
+            "app.services.file_ingestion.AlertingService.send_data_quality_alert"
+        ), patch(
+            "app.services.file_ingestion.AlertingService.send_ingestion_failure_alert"
+        ) as failure_alert:
+            with self._fail_on_write(2), pytest.raises(RuntimeError):
+                FileIngestionService.ingest_file(str(path))
+            assert IngestionCheckpoint.query.one().bad_rows == 2
+
+            # The resumed run sees 2 more bad rows: 4 in total, over the limit
+            with pytest.raises(DataQualityError):
+                FileIngestionService.ingest_file(str(path))
+
+            checkpoint = IngestionCheckpoint.query.one()
+            assert checkpoint.status == "rejected"
+            assert checkpoint.bad_rows == 4
+            assert Trade.query.count() == 20
+            failure_alert.assert_called_once()
+            assert "20 rows" in failure_alert.call_args.args[1]
+
+            # The same file is not retried until a corrected one arrives
+            assert FileIngestionService.ingest_file(str(path)) == 0
+            path.write_text(self.header + _format1_rows(10, start=21))
+            assert FileIngestionService.ingest_file(str(path)) == 10
+        assert IngestionCheckpoint.query.one().status == "complete"
+
+
+class TestStagingLoad:
+    def test_unknown_load_mode_is_rejected(self, monkeypatch):
+        monkeypatch.setenv("INGEST_LOAD_MODE", "Staging")
+        assert load_choice_setting("INGEST_LOAD_MODE", ("direct", "staging")) == (
+            "staging"
+        )
+        monkeypatch.setenv("INGEST_LOAD_MODE", "stage")
+        with pytest.raises(ValueError, match="INGEST_LOAD_MODE"):
+            load_choice_setting("INGEST_LOAD_MODE", ("direct", "staging"))
+
+    def test_staging_mode_publishes_whole_file(self, app, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "INGEST_LOAD_MODE", "staging")
+        monkeypatch.setattr(Config, "INGEST_BATCH_SIZE", 10)
+        path = tmp_path / "trades.csv"
+        path.write_text(
+            "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+            + _format1_rows(25)
+        )
+
+        with patch.object(FileIngestionService, "write_batch") as direct_write:
+            count = FileIngestionService.ingest_file(str(path))
+
+        direct_write.assert_not_called()
+        assert count == 25
+        quantities = [t.quantity for t in Trade.query.order_by(Trade.id).all()]
+        assert quantities == list(range(1, 26))
+        assert Trade.query.first().created_at is not None
+
+    def test_publish_rejects_rows_failing_set_based_checks(self, app):
+        good = {
+            "trade_date": date(2025, 1, 15),
+            "account_id": "ACC001",
+            "ticker": "AAPL",
+            "quantity": 10,
+        }
+        report = DataQualityReport("file.csv")
+        loader = StagingLoader()
+
+        loader.write_batch([good, dict(good, ticker=""), dict(good, quantity=None)])
+        published = loader.publish(report)
+        db.session.commit()
+
+        assert published == 1
+        assert Trade.query.count() == 1
+        assert report.violations == {"rejected_at_publish": 2}
+        assert PositionDelta.query.one().quantity == 10
+
+
+class TestDataVersions:
+    header = "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+
+    @pytest.mark.parametrize("load_mode", ["direct", "staging"])
+    def test_ingest_bumps_trade_date_version(
+        self, app, tmp_path, monkeypatch, load_mode
+    ):
+        monkeypatch.setattr(Config, "INGEST_LOAD_MODE", load_mode)
+        path = tmp_path / "trades.csv"
+        path.write_text(self.header + _format1_rows(5))
+
+        assert DataVersionService.get(date(2025, 1, 15)) == (0, None)
+        FileIngestionService.ingest_file(str(path))
+        version, updated_at = DataVersionService.get(date(2025, 1, 15))
+        assert version == 1 and updated_at is not None
+
+        FileIngestionService.ingest_file(str(path))
+        assert DataVersionService.get(date(2025, 1, 15))[0] == 2
+        assert DataVersionService.get(date(2025, 1, 16)) == (0, None)
+        assert DataVersionService.totals() == (10, date(2025, 1, 15))
+
+    def test_failed_ingest_leaves_version_unchanged(self, app, tmp_path):
+        path = tmp_path / "trades.csv"
+        path.write_text(self.header + _format1_rows(5))
+
+        with patch.object(
+            FileIngestionService, "write_batch", side_effect=RuntimeError("boom")
+        ), pytest.raises(RuntimeError):
+            FileIngestionService.ingest_file(str(path))
+
+        assert DataVersionService.get(date(2025, 1, 15)) == (0, None)
+
+    def test_reconcile_corrects_drifted_counts(self, app, tmp_path):
+        path = tmp_path / "trades.csv"
+        path.write_text(self.header + _format1_rows(5))
+        FileIngestionService.ingest_file(str(path))
+        assert DataVersionService.reconcile() == 0
+
+        db.session.delete(Trade.query.first())
+        db.session.add(
+            Trade(
+                trade_date=date(2025, 1, 20),
+                account_id="ACC001",
+                ticker="MSFT",
+                quantity=1,
+            )
+        )
+        db.session.commit()
+
+        assert DataVersionService.reconcile() == 2
+        assert DataVersionService.totals() == (5, date(2025, 1, 20))
+        assert DataVersionService.get(date(2025, 1, 15))[0] == 2
@@ -0,0 +1,163 @@
+from datetime import date
+
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models import Trade
+from app.services import formats
+from app.services.data_quality import DataQualityReport
+from app.services.file_ingestion import FileIngestionService
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def _fixed_width(trade_date, account, ticker, quantity, market_value, source):
+    return (
+        f"{trade_date:<8}{account:<12}{ticker:<10}{quantity:>12}"
+        f"{market_value:>18}{source:<12}\n"
+    )
+
+
+class TestFormatRegistry:
+    def test_detects_builtin_formats_from_head(self):
+        assert formats.detect_format("TradeDate,AccountID,Ticker\n").name == "format1"
+        assert formats.detect_format("20250115|ACC001|AAPL|1|1|X\n").name == "format2"
+        assert (
+            formats.detect_format('{"account_id": "ACC001", "ticker": "AAPL"}\n').name
+            == "jsonl"
+        )
+        line = _fixed_width("20250115", "ACC001", "AAPL", "100", "18550.00", "CUST_C")
+        assert formats.detect_format(line).name == "fixed_width"
+        with pytest.raises(ValueError):
+            formats.detect_format("no idea what this is\n")
+
+    def test_peek_head_does_not_consume_lines(self):
+        lines = ["\n"] + [f"line {i}\n" for i in range(2000)]
+
+        head, rest = formats.peek_head(iter(lines), size=100)
+
+        assert head.startswith("line 0\n")
+        assert len(head) < 200
+        assert list(rest) == lines[1:]
+
+    def test_batches_are_bounded(self):
+        lines = [f"20250115|ACC{i:03d}|AAPL|1|1.00|X\n" for i in range(25)]
+        report = DataQualityReport("file.txt")
+
+        batches = list(
+            formats.get_format("format2").iter_batches(lines, report, batch_size=10)
+        )
+
+        assert [len(batch) for batch in batches] == [10, 10, 5]
+
+    def test_plugged_in_format_needs_no_pipeline_change(self, app):
+        class SemicolonFormat(formats.TradeFormat):
+            name = "semicolon_test"
+            priority = 1
+
+            def sniff(self, head):
+                return head.startswith("SEMI;")
+
+            def iter_records(self, lines):
+                for number, line in enumerate(lines, start=1):
+                    if number > 1:
+                        yield number, line.strip().split(";")
+
+            def parse_record(self, fields):
+                return {
+                    "trade_date": date(2025, 1, 15),
+                    "account_id": fields[0],
+                    "ticker": fields[1],
+                    "quantity": int(fields[2]),
+                    "market_value": float(fields[3]),
+                }
+
+        formats.register_format(SemicolonFormat())
+        try:
+            count = FileIngestionService.ingest_stream(
+                ["SEMI;v1\n", "ACC001;AAPL;10;1855.00\n"], "semi.txt"
+            )
+        finally:
+            formats.unregister_format("semicolon_test")
+
+        assert count == 1
+        assert Trade.query.one().market_value == 1855
+
+
+class TestNewFormats:
+    def test_ingest_json_lines(self, app):
+        lines = [
+            '{"trade_date": "2025-01-15", "account_id": "ACC001", "ticker": "AAPL",'
+            ' "quantity": 100, "price": 185.5, "trade_type": "BUY"}\n',
+            '{"trade_date": "2025-01-15", "account_id": "ACC001", "ticker": "MSFT",'
+            ' "quantity": 5, "price": 400, "trade_type": "SELL"}\n',
+            '{"trade_date": "2025-01-15", "account_id": "ACC001"}\n',
+        ]
+
+        count = FileIngestionService.ingest_stream(lines, "trades.jsonl")
+
+        assert count == 2
+        msft = Trade.query.filter_by(ticker="MSFT").one()
+        assert msft.quantity == -5
+        assert float(msft.market_value) == -2000.0
+
+    def test_ingest_fixed_width(self, app):
+        lines = [
+            _fixed_width("20250115", "ACC001", "AAPL", "100", "18550.00", "CUST_C"),
+            _fixed_width("20250115", "ACC002", "NVDA", "-10", "-5053.00", "CUST_C"),
+        ]
+
+        count = FileIngestionService.ingest_stream(lines, "trades.dat")
+
+        assert count == 2
+        nvda = Trade.query.filter_by(ticker="NVDA").one()
+        assert nvda.account_id == "ACC002"
+        assert float(nvda.price) == 505.30
+        assert nvda.source_system == "CUST_C"
+
+
+class TestSourceMappings:
+    def test_mapped_delimited_source(self, app):
+        formats.register_source_mappings(
+            [
+                {
+                    "name": "custodian_b",
+                    "delimiter": ";",
+                    "date_format": "%m/%d/%Y",
+                    "source_system": "CUSTODIAN_B",
+                    "columns": {
+                        "Trade Dt": "TradeDate",
+                        "Acct": "AccountID",
+                        "Symbol": "Ticker",
+                        "Qty": "Quantity",
+                        "Px": "Price",
+                    },
+                }
+            ]
+        )
+        try:
+            lines = ["Trade Dt;Acct;Symbol;Qty;Px\n", "01/15/2025;ACC009;IBM;10;150\n"]
+            assert formats.detect_format(lines[0]).name == "custodian_b"
+
+            count = FileIngestionService.ingest_stream(lines, "custb.csv")
+        finally:
+            formats.unregister_format("custodian_b")
+
+        assert count == 1
+        trade = Trade.query.one()
+        assert trade.trade_date == date(2025, 1, 15)
+        assert trade.source_system == "CUSTODIAN_B"
+        assert float(trade.market_value) == 1500.0
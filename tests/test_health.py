@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app import create_app, db, health
+from app.config import Config
+
+
+class TestConfig(Config):
+    # Not TESTING, so the app starts its prober as it would in production
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+def _wait_for_probe(monitor):
+    deadline = time.monotonic() + 5
+    while monitor.snapshot is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # Keep the background prober out of the way; tests probe explicitly
+    monkeypatch.setattr(Config, "HEALTH_PROBE_INTERVAL_SECONDS", 3600)
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def monitor(app):
+    return app.extensions["health"]
+
+
+class TestHealthChecks:
+    def test_ready_and_live_from_snapshot(self, client, monitor):
+        client.get("/health/live")
+        _wait_for_probe(monitor)
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["status"] == "ready"
+        assert data["database"] == "healthy"
+        assert "pool" in data
+
+        assert client.get("/health/live").status_code == 200
+        assert monitor.is_alive()
+
+    def test_probes_do_not_use_the_database(self, client, monitor):
+        client.get("/health")
+        _wait_for_probe(monitor)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("health route opened a connection")
+
+        with patch.object(db.engine, "connect", fail):
+            assert client.get("/health/ready").status_code == 200
+            assert client.get("/health/live").status_code == 200
+            assert client.get("/health").get_json()["status"] == "healthy"
+
+    def test_stale_snapshot_is_not_ready(self, client, monitor):
+        client.get("/health")
+        _wait_for_probe(monitor)
+        monitor.snapshot["checked_at"] -= timedelta(minutes=5)
+
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert "last health probe" in response.get_json()["reasons"][0]
+        # Liveness doesn't depend on the database
+        assert client.get("/health/live").status_code == 200
+
+    def test_saturated_pool_and_failed_probe(self, client, monitor, monkeypatch):
+        # Let the prober's own first probe finish before probing by hand
+        client.get("/health/live")
+        _wait_for_probe(monitor)
+        monkeypatch.setattr(
+            health,
+            "pool_status",
+            lambda engine: {"size": 5, "checked_out": 5, "saturation": 1.0},
+        )
+        monitor.probe()
+        # A saturated pool is a warning, not a reason to take the task out
+        assert monitor.readiness() == (True, [])
+        assert monitor.warnings() == ["connection pool 100% checked out"]
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.get_json()["warnings"] == monitor.warnings()
+
+        with patch.object(db.engine, "connect", side_effect=OSError("down")):
+            monitor.probe()
+        assert monitor.snapshot["database"] == "unhealthy: down"
+        assert client.get("/health").get_json()["status"] == "degraded"
+
+    def test_not_ready_before_first_probe(self, monitor):
+        assert monitor.readiness() == (False, ["no health probe has completed"])
+
+    def test_first_request_does_not_wait_for_a_probe(self, client, monitor):
+        release = threading.Event()
+        probe = monitor.probe
+
+        def slow_probe():
+            release.wait(5)
+            return probe()
+
+        with patch.object(monitor, "probe", slow_probe):
+            try:
+                assert client.get("/").status_code == 200
+                assert monitor.is_alive()
+                assert client.get("/health/live").status_code == 200
+                response = client.get("/health/ready")
+                assert response.status_code == 503
+                assert response.get_json()["reasons"] == [
+                    "no health probe has completed"
+                ]
+            finally:
+                release.set()
+            _wait_for_probe(monitor)
+        assert client.get("/health/ready").status_code == 200
+
+    def test_probe_connects_outside_the_pool(self, monitor):
+        engine = MagicMock()
+        engine.dialect.name = "postgresql"
+        with patch.object(health, "create_engine") as create:
+            assert monitor._engine_for_probe(engine) is create.return_value
+            assert monitor._engine_for_probe(engine) is create.return_value
+        create.assert_called_once_with(engine.url, poolclass=NullPool)
+
+    def test_pool_status(self, tmp_path):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=QueuePool,
+            pool_size=2,
+            max_overflow=2,
+        )
+        with engine.connect():
+            status = health.pool_status(engine)
+        assert status == {"size": 2, "checked_out": 1, "saturation": 0.25}
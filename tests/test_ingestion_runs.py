@@ -0,0 +1,199 @@
+import shutil
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models import IngestionBatch, IngestionRun
+from app.services.ingestion_runs import IngestionRunService
+from app.services.ingestion_worker import IngestionWorker
+
+CSV = (
+    "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+    "2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17\n"
+    "2025-01-15,ACC002,MSFT,10,420.25,BUY,2025-01-17\n"
+    "2025-01-15,ACC003,NVDA,bad,505.30,BUY,2025-01-17\n"
+)
+
+HEADERS = {"X-API-Key": "test-api-key"}
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, "INGEST_TRACE_EXPORTER", "none")
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def worker(tmp_path):
+    upload = tmp_path / "trades.csv"
+    upload.write_text(CSV)
+
+    def download(name, local):
+        if name == "missing.csv":
+            raise FileNotFoundError(name)
+        shutil.copy(upload, local)
+
+    worker = IngestionWorker()
+    worker.sftp_service = MagicMock()
+    worker.sftp_service.list_files.return_value = ["trades.csv", "missing.csv"]
+    worker.sftp_service.download_file.side_effect = download
+    worker.alerting_service = MagicMock()
+    return worker
+
+
+def _run(started_at, duration_ms, rows, status="succeeded", **columns):
+    run = IngestionRun(
+        source=f"{started_at:%H%M%S}.csv",
+        transport="sftp",
+        status=status,
+        bytes=rows * 50,
+        rows=rows,
+        bad_rows=0,
+        duration_ms=duration_ms,
+        stage_ms={"parse": duration_ms / 2, "db_write": duration_ms / 2},
+        started_at=started_at,
+        **columns,
+    )
+    db.session.add(run)
+    return run
+
+
+class TestIngestionRunHistory:
+    def test_batch_records_each_file(self, app, worker):
+        worker.process_files()
+
+        batch = IngestionBatch.query.one()
+        assert batch.transport == "sftp"
+        assert batch.status == "failed"
+        assert (batch.files, batch.failed_files, batch.rows) == (2, 1, 2)
+        assert batch.bytes == len(CSV)
+        assert batch.finished_at is not None
+
+        runs = {run.source: run for run in IngestionRun.query}
+        good = runs["trades.csv"]
+        assert good.batch_id == batch.id
+        assert (good.status, good.rows, good.bad_rows) == ("succeeded", 2, 1)
+        assert good.bytes == len(CSV)
+        assert {"download", "detect", "parse", "db_write", "commit"} <= set(
+            good.stage_ms
+        )
+        assert good.duration_ms >= good.stage_ms["db_write"]
+
+        missing = runs["missing.csv"]
+        assert missing.status == "failed"
+        assert missing.error == "missing.csv"
+        assert missing.rows is None
+
+    def test_single_file_has_no_batch(self, app, worker):
+        worker.process_file("trades.csv")
+
+        run = IngestionRun.query.one()
+        assert run.batch_id is None
+        assert run.status == "succeeded"
+        assert IngestionBatch.query.count() == 0
+
+    def test_failed_listing_fails_batch(self, app, worker):
+        worker.sftp_service.list_files.side_effect = OSError("connection refused")
+        with pytest.raises(OSError):
+            worker.process_files()
+
+        batch = IngestionBatch.query.one()
+        assert (batch.status, batch.files) == ("failed", 0)
+
+    def test_throughput(self, app):
+        for second, duration_ms in enumerate([100, 200, 300, 400]):
+            _run(datetime(2025, 1, 15, 9, 0, second), duration_ms, rows=100)
+        _run(datetime(2025, 1, 16, 9), 1000, rows=1000)
+        _run(datetime(2025, 1, 16, 10), 50, rows=0, status="failed", error="boom")
+        _run(datetime(2025, 1, 18, 9), 1000, rows=1000)
+        db.session.commit()
+
+        stats = IngestionRunService.throughput(date(2025, 1, 15), date(2025, 1, 16))
+        summary = stats["summary"]
+        assert (summary["files"], summary["failed_files"]) == (6, 1)
+        assert summary["rows"] == 1400
+        assert summary["duration_ms"] == 2000
+        assert summary["rows_per_second"] == 700
+        assert summary["bytes_per_second"] == 35000
+        assert summary["latency_ms"] == {"p50": 300, "p95": 1000, "max": 1000}
+        assert summary["stage_ms"] == {"db_write": 1000, "parse": 1000}
+
+        daily = {day["date"]: day for day in stats["daily"]}
+        assert list(daily) == ["2025-01-15", "2025-01-16"]
+        assert daily["2025-01-15"]["rows_per_second"] == 400
+        assert daily["2025-01-16"]["failed_files"] == 1
+
+
+class TestIngestionsApi:
+    def test_requires_api_key(self, client):
+        assert client.get("/api/ingestions").status_code == 401
+
+    def test_throughput_and_recent_runs(self, client, worker):
+        worker.process_files()
+
+        response = client.get("/api/ingestions", headers=HEADERS)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["end_date"] == datetime.utcnow().date().isoformat()
+        assert data["summary"]["files"] == 2
+        assert data["summary"]["rows"] == 2
+        assert data["summary"]["rows_per_second"] > 0
+        assert len(data["daily"]) == 1
+        assert {run["source"] for run in data["runs"]} == {"trades.csv", "missing.csv"}
+        assert data["batches"][0]["failed_files"] == 1
+
+        response = client.get("/api/ingestions?status=failed&limit=1", headers=HEADERS)
+        data = response.get_json()
+        assert [run["source"] for run in data["runs"]] == ["missing.csv"]
+        assert len(data["batches"]) == 1
+
+    def test_date_range(self, app, client):
+        _run(datetime(2025, 1, 15, 9), 100, rows=10)
+        _run(datetime(2025, 2, 15, 9), 100, rows=20)
+        db.session.commit()
+
+        response = client.get(
+            "/api/ingestions?start_date=2025-01-01&end_date=2025-01-31",
+            headers=HEADERS,
+        )
+        data = response.get_json()
+        assert data["summary"]["rows"] == 10
+        assert [run["rows"] for run in data["runs"]] == [10]
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "start_date=2025-13-01",
+            "start_date=2025-02-01&end_date=2025-01-01",
+            "start_date=2024-01-01&end_date=2025-06-01",
+            "limit=0",
+            "limit=abc",
+        ],
+    )
+    def test_invalid_parameters(self, client, query):
+        response = client.get(f"/api/ingestions?{query}", headers=HEADERS)
+        assert response.status_code == 400
+
+    def test_date_errors_match_other_routes(self, client):
+        query = "start_date=2025-13-01&end_date=2025-01-31"
+        response = client.get(f"/api/ingestions?{query}", headers=HEADERS)
+        other = client.get(f"/api/positions/range?{query}", headers=HEADERS)
+        assert response.get_json() == other.get_json()
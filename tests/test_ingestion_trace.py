@@ -0,0 +1,154 @@
+import json
+import shutil
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.services import ingestion_trace
+from app.services.file_ingestion import FileIngestionService
+from app.services.ingestion_worker import IngestionWorker
+from app.services.sftp_service import SFTPService
+
+CSV = (
+    "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+    "2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17\n"
+    "2025-01-15,ACC002,MSFT,10,420.25,BUY,2025-01-17\n"
+    "2025-01-15,ACC003,NVDA,bad,505.30,BUY,2025-01-17\n"
+)
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+class ListExporter:
+    """Custom exporter, loaded by INGEST_TRACE_EXPORTER="module:Class" """
+
+    spans = []
+
+    def export(self, spans):
+        ListExporter.spans.extend(span.to_dict() for span in spans)
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "INGEST_TRACE_EXPORTER", "jsonl")
+    monkeypatch.setattr(Config, "INGEST_TRACE_PATH", str(tmp_path / "traces.jsonl"))
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / "trades.csv"
+    path.write_text(CSV)
+    return path
+
+
+@pytest.fixture
+def worker(upload):
+    worker = IngestionWorker()
+    worker.sftp_service = MagicMock()
+    worker.sftp_service.download_file.side_effect = lambda name, local: (
+        shutil.copy(upload, local)
+    )
+    return worker
+
+
+def _exported():
+    with open(Config.INGEST_TRACE_PATH) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestIngestionTrace:
+    def test_sftp_file_stages(self, app, worker, upload):
+        worker.process_file("trades.csv")
+
+        spans = {span["name"]: span for span in _exported()}
+        root = spans["ingest_file"]
+        assert root["attributes"] == {
+            "source": "trades.csv",
+            "transport": "sftp",
+            "bytes": len(CSV),
+            "rows": 2,
+        }
+        assert spans["download"]["attributes"]["bytes"] == len(CSV)
+        assert spans["detect"]["attributes"]["format"] == "format1"
+        assert spans["parse"]["attributes"]["bad_rows"] == 1
+        assert spans["db_write"]["attributes"]["rows"] == 2
+        assert spans["commit"]["attributes"]["commits"] == 1
+        assert set(spans) >= {"position_snapshots", "move_to_processed"}
+        assert all(
+            span["parent_id"] == root["span_id"]
+            for name, span in spans.items()
+            if name != "ingest_file"
+        )
+        assert all(span["status"] == "ok" for span in spans.values())
+
+    def test_connect_nests_under_stage(self, app):
+        service = SFTPService()
+        with patch.object(service, "_connect"), ingestion_trace.trace_file(
+            "trades.csv"
+        ):
+            with ingestion_trace.span("download"):
+                service._get_ssh_client()
+
+        spans = {span["name"]: span for span in _exported()}
+        assert spans["sftp_connect"]["parent_id"] == spans["download"]["span_id"]
+        assert spans["sftp_connect"]["attributes"]["host"] == Config.SFTP_HOST
+
+    def test_failure_marks_spans(self, app, worker):
+        worker.sftp_service.move_to_processed.side_effect = OSError("disk full")
+        with pytest.raises(OSError):
+            worker.process_file("trades.csv")
+
+        spans = {span["name"]: span for span in _exported()}
+        assert spans["move_to_processed"]["status"] == "error"
+        assert spans["ingest_file"]["error"] == "disk full"
+
+    def test_custom_exporter(self, app, upload, monkeypatch):
+        monkeypatch.setattr(
+            Config, "INGEST_TRACE_EXPORTER", f"{__name__}:{ListExporter.__name__}"
+        )
+        ListExporter.spans.clear()
+        with ingestion_trace.trace_file(str(upload)):
+            FileIngestionService.ingest_file(str(upload))
+
+        assert {"ingest_file", "detect", "parse", "db_write", "commit"} <= {
+            span["name"] for span in ListExporter.spans
+        }
+
+    def test_untraced_ingest_exports_nothing(self, app, upload):
+        assert FileIngestionService.ingest_file(str(upload)) == 2
+        with pytest.raises(FileNotFoundError):
+            _exported()
+
+    def test_jsonl_needs_a_path(self, app, monkeypatch):
+        monkeypatch.setattr(Config, "INGEST_TRACE_PATH", "")
+        with pytest.raises(ValueError):
+            ingestion_trace.JsonLinesExporter().export([])
+
+    def test_opentelemetry_exporter(self, app, upload, monkeypatch):
+        pytest.importorskip("opentelemetry.sdk")
+        from opentelemetry import trace
+        from opentelemetry.sdk.trace import TracerProvider, export
+        from opentelemetry.sdk.trace.export import in_memory_span_exporter
+
+        memory = in_memory_span_exporter.InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(export.SimpleSpanProcessor(memory))
+        monkeypatch.setattr(Config, "INGEST_TRACE_EXPORTER", "otel")
+        with patch.object(trace, "get_tracer", provider.get_tracer):
+            exporter = ingestion_trace.OpenTelemetryExporter()
+        with patch.object(ingestion_trace, "get_exporter", return_value=exporter):
+            with ingestion_trace.trace_file(str(upload)):
+                FileIngestionService.ingest_file(str(upload))
+
+        spans = {span.name: span for span in memory.get_finished_spans()}
+        assert spans["parse"].parent.span_id == spans["ingest_file"].context.span_id
@@ -0,0 +1,150 @@
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models import Trade
+from app.services import formats
+from app.services.data_quality import DataQualityError, DataQualityReport
+from app.services.file_ingestion import FileIngestionService
+from app.services.parallel_parser import ParallelParser, split_ranges
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def _format1_file(path, rows, bad_every=0):
+    lines = ["TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"]
+    for i in range(rows):
+        account = "" if bad_every and i % bad_every == 0 else f"ACC{i:05d}"
+        lines.append(f"2025-01-15,{account},AAPL,{i + 1},185.50,BUY,2025-01-17\n")
+    path.write_text("".join(lines))
+    return path
+
+
+def _serial_rows(path, format_name):
+    report = DataQualityReport(path.name)
+    with open(path) as f:
+        return [
+            row
+            for batch in formats.get_format(format_name).iter_batches(f, report)
+            for row in batch
+        ]
+
+
+class TestSplitRanges:
+    def test_ranges_cover_file_and_start_on_lines(self, tmp_path):
+        path = tmp_path / "trades.txt"
+        path.write_bytes(b"".join(b"x" * (i % 7) + b"\n" for i in range(500)))
+        data = path.read_bytes()
+
+        ranges = split_ranges(path, 8)
+
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+            assert data[start - 1 : start] == b"\n"
+
+    def test_small_file_gives_fewer_ranges(self, tmp_path):
+        path = tmp_path / "trades.txt"
+        path.write_bytes(b"one\ntwo\n")
+
+        assert split_ranges(path, 16) == [(0, 4), (4, 8)]
+
+
+class TestParallelParser:
+    def test_format1_matches_serial_parse(self, tmp_path):
+        path = _format1_file(tmp_path / "trades.csv", 1000)
+        report = DataQualityReport(path.name)
+
+        rows = [
+            row
+            for batch in ParallelParser(workers=2, min_bytes=0).iter_batches(
+                str(path), formats.get_format("format1"), report, batch_size=100
+            )
+            for row in batch
+        ]
+
+        assert rows == _serial_rows(path, "format1")
+        assert not report.has_issues
+
+    def test_format2_matches_serial_parse(self, tmp_path):
+        path = tmp_path / "trades.txt"
+        path.write_text(
+            "".join(
+                f"20250115|ACC{i:05d}|MSFT|{i}|{i * 10}.00|CUSTODIAN_A\n"
+                for i in range(1, 800)
+            )
+        )
+
+        rows = [
+            row
+            for batch in ParallelParser(workers=3, min_bytes=0).iter_batches(
+                str(path), formats.get_format("format2"), DataQualityReport(path.name)
+            )
+            for row in batch
+        ]
+
+        assert rows == _serial_rows(path, "format2")
+
+    def test_bad_rows_are_merged_across_ranges(self, tmp_path):
+        path = _format1_file(tmp_path / "trades.csv", 1000, bad_every=100)
+        report = DataQualityReport(path.name, max_bad_rows=0, sample_size=3)
+
+        rows = [
+            row
+            for batch in ParallelParser(workers=2, min_bytes=0).iter_batches(
+                str(path), formats.get_format("format1"), report
+            )
+            for row in batch
+        ]
+
+        assert len(rows) == 990
+        assert report.bad_rows == 10
+        assert report.violations == {"missing_account_id": 10}
+        assert len(report.samples["missing_account_id"]) == 3
+        assert "range_start" in report.samples["missing_account_id"][0]
+
+    def test_bad_row_limit_applies_to_whole_file(self, tmp_path):
+        path = _format1_file(tmp_path / "trades.csv", 1000, bad_every=100)
+        report = DataQualityReport(path.name, max_bad_rows=5)
+
+        with pytest.raises(DataQualityError):
+            for _ in ParallelParser(workers=2, min_bytes=0).iter_batches(
+                str(path), formats.get_format("format1"), report
+            ):
+                pass
+
+        assert report.rejected
+
+    def test_should_split(self, tmp_path):
+        path = _format1_file(tmp_path / "trades.csv", 10)
+
+        assert ParallelParser(workers=2, min_bytes=0).should_split(str(path))
+        assert not ParallelParser(workers=1, min_bytes=0).should_split(str(path))
+        assert not ParallelParser(workers=2, min_bytes=10**9).should_split(str(path))
+
+
+class TestParallelIngestion:
+    def test_ingest_file_splits_large_files(self, app, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "INGEST_PARALLEL_WORKERS", 2)
+        monkeypatch.setattr(Config, "INGEST_PARALLEL_MIN_BYTES", 0)
+        path = _format1_file(tmp_path / "trades.csv", 500)
+
+        count = FileIngestionService.ingest_file(str(path))
+
+        assert count == 500
+        assert Trade.query.count() == 500
+        quantities = [t.quantity for t in Trade.query.order_by(Trade.id).all()]
+        assert quantities == list(range(1, 501))
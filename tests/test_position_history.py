@@ -0,0 +1,190 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models import PositionDelta, PositionSnapshot, Trade
+from app.services.file_ingestion import FileIngestionService
+from app.services.position_history import PositionHistoryService
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _row(trade_date, account_id, ticker, quantity, price=10.0):
+    return {
+        "trade_date": trade_date,
+        "account_id": account_id,
+        "ticker": ticker,
+        "quantity": quantity,
+        "price": price,
+        "market_value": quantity * price,
+    }
+
+
+def _ingest(rows):
+    FileIngestionService.write_batch(rows)
+    db.session.commit()
+    FileIngestionService.refresh_position_snapshots()
+
+
+def _brute_force(account_id, ticker, as_of):
+    trades = Trade.query.filter(
+        Trade.account_id == account_id,
+        Trade.ticker == ticker,
+        Trade.trade_date <= as_of,
+    )
+    return sum(trade.quantity for trade in trades)
+
+
+class TestPositionHistory:
+    def test_history_matches_raw_trades(self, app):
+        start = date(2025, 1, 1)
+        for day in range(60):
+            trade_date = start + timedelta(days=day)
+            _ingest(
+                [
+                    _row(trade_date, "ACC001", "AAPL", 10 - day % 7),
+                    _row(trade_date, "ACC001", "MSFT", -3 if day % 2 else 5),
+                    _row(trade_date, "ACC002", "AAPL", 1),
+                ]
+            )
+        assert PositionSnapshot.query.count() > 0
+
+        positions = PositionHistoryService.history(
+            "ACC001", date(2025, 2, 10), date(2025, 2, 20)
+        )
+
+        by_ticker = {p["ticker"]: p for p in positions}
+        assert set(by_ticker) == {"AAPL", "MSFT"}
+        for ticker, position in by_ticker.items():
+            assert position["opening"]["quantity"] == _brute_force(
+                "ACC001", ticker, date(2025, 2, 9)
+            )
+            assert len(position["history"]) == 11
+            for point in position["history"]:
+                assert point["quantity"] == _brute_force(
+                    "ACC001", ticker, date.fromisoformat(point["date"])
+                )
+            assert (
+                position["closing"]["quantity"] == position["history"][-1]["quantity"]
+            )
+
+    def test_backdated_trades_invalidate_snapshots(self, app):
+        for day in range(30):
+            _ingest([_row(date(2025, 1, 1) + timedelta(days=day), "ACC001", "AAPL", 1)])
+        snapshots = PositionSnapshot.query.count()
+
+        _ingest([_row(date(2025, 1, 2), "ACC001", "AAPL", 100)])
+
+        assert PositionSnapshot.query.count() == snapshots
+        (position,) = PositionHistoryService.history(
+            "ACC001", date(2025, 1, 31), date(2025, 1, 31)
+        )
+        assert position["closing"]["quantity"] == 130
+
+    def test_deltas_applied_once_per_file_in_key_order(
+        self, app, tmp_path, monkeypatch
+    ):
+        monkeypatch.setattr(Config, "INGEST_BATCH_SIZE", 2)
+        path = tmp_path / "trades.csv"
+        path.write_text(
+            "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+            "2025-01-16,ACC002,MSFT,1,10.00,BUY,2025-01-20\n"
+            "2025-01-15,ACC001,TSLA,2,10.00,BUY,2025-01-17\n"
+            "2025-01-15,ACC001,AAPL,3,10.00,BUY,2025-01-17\n"
+            "2025-01-16,ACC002,MSFT,4,10.00,BUY,2025-01-20\n"
+        )
+
+        executed = []
+        execute = db.session.execute
+
+        def recording(statement, params=None, *args, **kwargs):
+            table = getattr(statement, "table", None)
+            if getattr(table, "name", None) == PositionDelta.__tablename__:
+                executed.append(params)
+            return execute(statement, params, *args, **kwargs)
+
+        with patch.object(db.session, "execute", side_effect=recording):
+            FileIngestionService.ingest_file(str(path))
+
+        (deltas,) = executed
+        assert [(d["account_id"], d["ticker"], d["quantity"]) for d in deltas] == [
+            ("ACC001", "AAPL", 3),
+            ("ACC001", "TSLA", 2),
+            ("ACC002", "MSFT", 5),
+        ]
+
+    def test_rebuild_from_trades(self, app):
+        db.session.add_all(
+            [
+                Trade(
+                    trade_date=date(2025, 1, 15),
+                    account_id="ACC001",
+                    ticker="AAPL",
+                    quantity=100,
+                    market_value=18550.00,
+                ),
+                Trade(
+                    trade_date=date(2025, 1, 15),
+                    account_id="ACC001",
+                    ticker="AAPL",
+                    quantity=-40,
+                    market_value=-7420.00,
+                ),
+            ]
+        )
+        db.session.commit()
+
+        PositionHistoryService.rebuild()
+
+        delta = PositionDelta.query.one()
+        assert (delta.quantity, delta.trade_count) == (60, 2)
+        assert float(delta.market_value) == 11130.00
+
+    def test_endpoint(self, client):
+        _ingest(
+            [
+                _row(date(2025, 1, 14), "ACC001", "AAPL", 100),
+                _row(date(2025, 1, 15), "ACC001", "AAPL", -40),
+            ]
+        )
+        headers = {"X-API-Key": "test-api-key"}
+
+        response = client.get(
+            "/api/positions/history?account_id=ACC001"
+            "&start_date=2025-01-15&end_date=2025-01-31",
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        (position,) = response.get_json()["positions"]
+        assert position["opening"] == {"quantity": 100, "market_value": 1000.0}
+        assert position["history"] == [
+            {"date": "2025-01-15", "quantity": 60, "market_value": 600.0}
+        ]
+
+        response = client.get(
+            "/api/positions/history?account_id=ACC001&start_date=2025-01-15",
+            headers=headers,
+        )
+        assert response.status_code == 400
@@ -0,0 +1,123 @@
+import json
+import logging
+import time
+
+import pytest
+
+from app import create_app, db, profiling
+from app.config import Config
+from app.models import Trade
+from app.services.file_ingestion import FileIngestionService
+
+HEADERS = {"X-API-Key": "test-api-key"}
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PROFILE_TOKEN", "profile-secret")
+    monkeypatch.setattr(Config, "PROFILE_SAMPLE_INTERVAL_MS", 1)
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        path = tmp_path / "trades.csv"
+        path.write_text(
+            "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+            "2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17\n"
+            "2025-01-15,ACC002,MSFT,10,420.25,BUY,2025-01-17\n"
+        )
+        FileIngestionService.ingest_file(str(path))
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _profile_logs(caplog):
+    return [
+        json.loads(r.getMessage().split(": ", 1)[1])
+        for r in caplog.records
+        if r.name == "app.profiling" and r.getMessage().startswith("Profile ")
+    ]
+
+
+class TestRequestProfiling:
+    def test_header_profiles_request(self, client, caplog):
+        caplog.set_level(logging.INFO, logger="app.profiling")
+        response = client.get(
+            "/api/positions?date=2025-01-15&api_key=test-api-key",
+            headers={"X-Profile": "profile-secret"},
+        )
+
+        assert response.status_code == 200
+        assert "sql;dur=" in response.headers["Server-Timing"]
+        (profile,) = _profile_logs(caplog)
+        assert profile["label"] == "GET /api/positions?date=2025-01-15"
+        assert profile["sql"]["count"] >= 1
+        # The logged summary lists the slowest statements first
+        assert any(
+            "FROM trades" in query["statement"] and "2025-01-15" in query["parameters"]
+            for query in profile["sql"]["queries"]
+        )
+
+    def test_wrong_or_missing_token_not_profiled(self, client, caplog):
+        caplog.set_level(logging.INFO, logger="app.profiling")
+        for headers in ({"X-Profile": "guess"}, {}):
+            response = client.get(
+                "/api/positions?date=2025-01-15", headers={**HEADERS, **headers}
+            )
+            assert "Server-Timing" not in response.headers
+        assert _profile_logs(caplog) == []
+
+    def test_sampled_requests_written_to_output_dir(
+        self, client, monkeypatch, tmp_path
+    ):
+        monkeypatch.setattr(Config, "PROFILE_SAMPLE_RATE", 1.0)
+        monkeypatch.setattr(Config, "PROFILE_OUTPUT_DIR", str(tmp_path / "profiles"))
+
+        response = client.get("/api/blotter?date=2025-01-15", headers=HEADERS)
+        assert "Server-Timing" in response.headers
+        assert "Server-Timing" not in client.get("/health/live").headers
+
+        (path,) = (tmp_path / "profiles").iterdir()
+        profile = json.loads(path.read_text())
+        assert profile["label"] == "GET /api/blotter?date=2025-01-15"
+        assert set(profile) >= {"duration_ms", "sql", "samples", "stacks"}
+
+
+class TestQueryHooks:
+    def test_slow_queries_logged_with_parameters(self, app, monkeypatch, caplog):
+        monkeypatch.setattr(Config, "SLOW_QUERY_LOG_MS", 0.000001)
+        with caplog.at_level(logging.WARNING, logger="app.profiling"):
+            Trade.query.filter_by(account_id="ACC002").all()
+
+        (record,) = [r for r in caplog.records if "Slow query" in r.getMessage()]
+        assert "ACC002" in record.getMessage()
+
+    def test_slow_query_log_off_by_default(self, app, caplog):
+        with caplog.at_level(logging.WARNING, logger="app.profiling"):
+            Trade.query.all()
+        assert not [r for r in caplog.records if "Slow query" in r.getMessage()]
+
+    def test_profiled_block_records_queries_and_stacks(self, app, caplog):
+        def busy_wait():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        caplog.set_level(logging.INFO, logger="app.profiling")
+        with profiling.profiled("ingest_files local") as profile:
+            Trade.query.count()
+            busy_wait()
+
+        assert profile.query_count == 1
+        assert any("busy_wait" in stack for stack in profile.profiler.stacks)
+        assert _profile_logs(caplog)[0]["label"] == "ingest_files local"
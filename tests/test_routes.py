@@ -5,6 +5,8 @@ import pytest
 from app import create_app, db
 from app.config import Config
 from app.models import Trade
+from app.services import position_queries
+from app.services.data_versions import DataVersionService
 
 
 class TestConfig(Config):
@@ -140,7 +142,9 @@ class TestRoutes:
         assert violations[0]["percentage"] > 20
         assert violations[0]["violation"] is True
 
-    def test_health_check(self, client):
+    def test_health_check(self, app, client):
+        # Test apps don't start the background prober
+        app.extensions["health"].probe()
         response = client.get("/health")
         assert response.status_code == 200
         data = response.get_json()
@@ -148,8 +152,183 @@ class TestRoutes:
         assert "database" in data
 
     def test_metrics(self, client, sample_trades):
+        # sample_trades bypasses ingestion, so count them in once
+        DataVersionService.reconcile()
         response = client.get("/metrics")
         assert response.status_code == 200
         data = response.get_json()
         assert "total_trades" in data
         assert data["total_trades"] == 5
+        assert data["latest_trade_date"] == "2025-01-15"
+
+    def test_account_positions_match_full_positions(self, client, sample_trades):
+        headers = {"X-API-Key": "test-api-key"}
+        everything = client.get(
+            "/api/positions?date=2025-01-15", headers=headers
+        ).get_json()["positions"]
+
+        response = client.get(
+            "/api/accounts/ACC001/positions?date=2025-01-15", headers=headers
+        )
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["account_ids"] == ["ACC001"]
+        assert sorted(data["positions"], key=lambda p: p["ticker"]) == sorted(
+            (p for p in everything if p["account_id"] == "ACC001"),
+            key=lambda p: p["ticker"],
+        )
+
+    def test_account_positions_for_several_accounts(self, client, sample_trades):
+        response = client.get(
+            "/api/accounts/positions?date=2025-01-15&account_id=ACC001,ACC003",
+            headers={"X-API-Key": "test-api-key"},
+        )
+
+        assert response.status_code == 200
+        accounts = {p["account_id"] for p in response.get_json()["positions"]}
+        assert accounts == {"ACC001", "ACC003"}
+
+    def test_account_alarms(self, client, sample_trades):
+        headers = {"X-API-Key": "test-api-key"}
+
+        response = client.get(
+            "/api/accounts/alarms?date=2025-01-15&account_id=ACC003", headers=headers
+        )
+        assert response.status_code == 200
+        alarms = response.get_json()["alarms"]
+        assert {(a["account_id"], a["ticker"]) for a in alarms} == {("ACC003", "NVDA")}
+
+        response = client.get("/api/accounts/alarms?date=2025-01-15", headers=headers)
+        assert response.status_code == 400
+
+    def test_ticker_exposure(self, client, sample_trades):
+        db.session.add(
+            Trade(
+                trade_date=date(2025, 1, 16),
+                account_id="ACC001",
+                ticker="AAPL",
+                quantity=10,
+                price=190.00,
+                market_value=1900.00,
+                trade_type="BUY",
+            )
+        )
+        db.session.commit()
+        headers = {"X-API-Key": "test-api-key"}
+
+        response = client.get(
+            "/api/tickers/AAPL/exposure?date=2025-01-15", headers=headers
+        )
+
+        assert response.status_code == 200
+        exposures = response.get_json()["exposures"]
+        assert [e["account_id"] for e in exposures] == ["ACC002", "ACC001"]
+        assert exposures[1]["percentage"] == round(18550 / (18550 + 21012.5) * 100, 2)
+        assert exposures[0]["percentage"] == 100.0
+
+        response = client.get(
+            "/api/tickers/exposure?ticker=AAPL,NVDA"
+            "&start_date=2025-01-15&end_date=2025-01-16",
+            headers=headers,
+        )
+        exposures = response.get_json()["exposures"]
+        assert [(e["date"], e["ticker"], e["account_id"]) for e in exposures] == [
+            ("2025-01-15", "AAPL", "ACC002"),
+            ("2025-01-15", "AAPL", "ACC001"),
+            ("2025-01-15", "NVDA", "ACC003"),
+            ("2025-01-16", "AAPL", "ACC001"),
+        ]
+        assert exposures[-1]["percentage"] == 100.0
+
+        response = client.get("/api/tickers/exposure?date=2025-01-15", headers=headers)
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("engine", ["join", "window"])
+    def test_query_engines_agree(self, client, sample_trades, monkeypatch, engine):
+        monkeypatch.setattr(Config, "POSITION_QUERY_ENGINE", engine)
+        headers = {"X-API-Key": "test-api-key"}
+
+        positions = client.get(
+            "/api/positions?date=2025-01-15", headers=headers
+        ).get_json()["positions"]
+        alarms = client.get(
+            "/api/alarms?date=2025-01-15&threshold=50", headers=headers
+        ).get_json()["alarms"]
+
+        acc001 = {
+            p["ticker"]: p["percentage"]
+            for p in positions
+            if p["account_id"] == "ACC001"
+        }
+        assert acc001 == {"AAPL": 46.89, "MSFT": 53.11}
+        assert len(positions) == 5
+        assert sorted((a["account_id"], a["ticker"]) for a in alarms) == [
+            ("ACC001", "MSFT"),
+            ("ACC002", "AAPL"),
+            ("ACC003", "NVDA"),
+        ]
+
+    def test_alarms_threshold_validation(self, client, sample_trades):
+        response = client.get(
+            "/api/alarms?date=2025-01-15&threshold=abc",
+            headers={"X-API-Key": "test-api-key"},
+        )
+        assert response.status_code == 400
+
+
+class TestConditionalRequests:
+    headers = {"X-API-Key": "test-api-key"}
+
+    @pytest.mark.parametrize("path", ["/api/blotter", "/api/positions", "/api/alarms"])
+    def test_unchanged_date_returns_304(self, client, sample_trades, path):
+        url = f"{path}?date=2025-01-15"
+        response = client.get(url, headers=self.headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert not etag.startswith("W/")
+
+        response = client.get(url, headers={**self.headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.data == b""
+
+    def test_304_skips_aggregation(self, client, sample_trades, monkeypatch):
+        url = "/api/positions?date=2025-01-15"
+        etag = client.get(url, headers=self.headers).headers["ETag"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("aggregation ran for an unchanged date")
+
+        monkeypatch.setattr(position_queries, "get_positions", fail)
+        response = client.get(url, headers={**self.headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+    def test_ingest_changes_etag_and_last_modified(self, client, sample_trades):
+        url = "/api/blotter?date=2025-01-15"
+        first = client.get(url, headers=self.headers)
+        assert "Last-Modified" not in first.headers
+
+        DataVersionService.bump({date(2025, 1, 15): 1})
+        db.session.commit()
+
+        response = client.get(
+            url, headers={**self.headers, "If-None-Match": first.headers["ETag"]}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != first.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        response = client.get(
+            url, headers={**self.headers, "If-Modified-Since": last_modified}
+        )
+        assert response.status_code == 304
+
+        # Other dates keep their version
+        other = client.get("/api/blotter?date=2025-01-16", headers=self.headers)
+        assert other.headers["ETag"] == '"2025-01-16.0"'
+
+    def test_errors_carry_no_etag(self, client):
+        response = client.get("/api/blotter?date=bad", headers=self.headers)
+        assert response.status_code == 400
+        assert "ETag" not in response.headers
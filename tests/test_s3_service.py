@@ -0,0 +1,206 @@
+import gzip
+import io
+import json
+import zipfile
+from unittest.mock import patch
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app import create_app, db
+from app.config import Config
+from app.models import IngestionBatch, IngestionRun, Trade
+from app.services.file_ingestion import FileIngestionService
+from app.services.s3_ingestion_worker import S3IngestionWorker
+from app.services.s3_service import S3Service
+from app.services.streams import iter_lines
+
+BUCKET = "pdc-test-bucket"
+
+FORMAT2_LINES = [
+    f"20250115|ACC{i:03d}|AAPL|{i + 1}|{(i + 1) * 185.5:.2f}|CUSTODIAN_A\n"
+    for i in range(200)
+]
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-2")
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-2")
+        client.create_bucket(
+            Bucket=BUCKET,
+            CreateBucketConfiguration={"LocationConstraint": "us-east-2"},
+        )
+        client.put_object(
+            Bucket=BUCKET, Key="uploads/trades.txt", Body="".join(FORMAT2_LINES)
+        )
+        yield client
+
+
+class TestStreams:
+    def test_iter_lines_reassembles_split_lines(self):
+        chunks = [b"a,b\r\nc", b"d\n", b"", b"\xc3", b"\xa9\nlast"]
+
+        assert list(iter_lines(chunks)) == ["a,b\r\n", "cd\n", "é\n", "last"]
+
+
+class TestS3Service:
+    def test_single_get_streams_lines(self, s3_client):
+        service = S3Service(client=s3_client)
+
+        lines = list(service.iter_object_lines(BUCKET, "uploads/trades.txt"))
+
+        assert lines == FORMAT2_LINES
+
+    def test_ranged_gets_reassemble_on_line_boundaries(self, s3_client):
+        service = S3Service(client=s3_client)
+        service.ranged_threshold = 0
+        service.part_size = 37  # never aligned with a line ending
+        service.concurrency = 4
+
+        lines = list(service.iter_object_lines(BUCKET, "uploads/trades.txt"))
+
+        assert lines == FORMAT2_LINES
+
+    def test_gzip_object_with_ranged_gets(self, s3_client):
+        s3_client.put_object(
+            Bucket=BUCKET,
+            Key="uploads/trades.txt.gz",
+            Body=gzip.compress("".join(FORMAT2_LINES).encode()),
+        )
+        service = S3Service(client=s3_client)
+        service.ranged_threshold = 0
+        service.part_size = 100
+
+        lines = list(service.iter_object_lines(BUCKET, "uploads/trades.txt.gz"))
+
+        assert lines == FORMAT2_LINES
+
+    def test_zip_object_is_read_through_ranged_reader(self, s3_client):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("trades.txt", "".join(FORMAT2_LINES))
+        s3_client.put_object(
+            Bucket=BUCKET, Key="uploads/trades.zip", Body=archive.getvalue()
+        )
+        service = S3Service(client=s3_client)
+        service.part_size = 256
+
+        lines = list(service.iter_object_lines(BUCKET, "uploads/trades.zip"))
+
+        assert lines == FORMAT2_LINES
+
+    def test_ingest_stream_from_s3(self, app, s3_client):
+        service = S3Service(client=s3_client)
+        service.ranged_threshold = 0
+        service.part_size = 1024
+
+        lines = service.iter_object_lines(BUCKET, "uploads/trades.txt")
+        count = FileIngestionService.ingest_stream(lines, "uploads/trades.txt")
+
+        assert count == 200
+        assert Trade.query.count() == 200
+        assert Trade.query.filter_by(account_id="ACC199").one().quantity == 200
+
+
+@pytest.fixture
+def batch_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "INGEST_TRACE_EXPORTER", "jsonl")
+    monkeypatch.setattr(Config, "INGEST_TRACE_PATH", str(tmp_path / "traces.jsonl"))
+
+    class BatchConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'batch.db'}"
+
+    app = create_app(BatchConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+class TestS3IngestionWorker:
+    def test_expand_event_shapes(self, s3_client):
+        worker = S3IngestionWorker(s3_service=S3Service(client=s3_client))
+
+        assert worker.expand_event({"s3_bucket": BUCKET, "s3_key": "a.txt"}) == [
+            (BUCKET, "a.txt", None)
+        ]
+        assert worker.expand_event(
+            {"s3_bucket": BUCKET, "objects": [{"s3_key": "a"}, {"s3_key": "b"}]}
+        ) == [(BUCKET, "a", None), (BUCKET, "b", None)]
+        assert worker.expand_event({"s3_bucket": BUCKET, "s3_prefix": "uploads/"}) == [
+            (BUCKET, "uploads/trades.txt", "processed/trades.txt")
+        ]
+        with pytest.raises(ValueError):
+            worker.expand_event([{"s3_key": "no-bucket"}])
+
+    def test_prefix_drain_skips_processed_objects(self, s3_client, monkeypatch):
+        monkeypatch.setattr(Config, "S3_PROCESSED_PREFIX", "uploads/processed/")
+        s3_client.put_object(Bucket=BUCKET, Key="uploads/processed/old.txt", Body=b"")
+        worker = S3IngestionWorker(s3_service=S3Service(client=s3_client))
+
+        assert worker.expand_event({"s3_bucket": BUCKET, "s3_prefix": "uploads/"}) == [
+            (BUCKET, "uploads/trades.txt", "uploads/processed/trades.txt")
+        ]
+
+    def test_process_batch_reports_per_object_outcomes(self, batch_app, s3_client):
+        s3_client.put_object(
+            Bucket=BUCKET, Key="uploads/more.txt", Body="".join(FORMAT2_LINES[:10])
+        )
+        s3_client.put_object(Bucket=BUCKET, Key="uploads/junk.txt", Body="junk\n")
+        worker = S3IngestionWorker(
+            s3_service=S3Service(client=s3_client), concurrency=2
+        )
+
+        with patch(
+            "app.services.s3_ingestion_worker.AlertingService.send_ingestion_failure_alert"
+        ) as mock_alert:
+            outcomes = worker.process_objects(
+                worker.expand_event({"s3_bucket": BUCKET, "s3_prefix": "uploads/"})
+            )
+
+        by_key = {outcome["key"]: outcome for outcome in outcomes}
+        assert by_key["uploads/trades.txt"]["status"] == "succeeded"
+        assert by_key["uploads/trades.txt"]["records"] == 200
+        assert by_key["uploads/more.txt"]["records"] == 10
+        assert by_key["uploads/junk.txt"]["status"] == "failed"
+        mock_alert.assert_called_once()
+        assert Trade.query.count() == 210
+
+        # Successful objects were drained out of the prefix, the failure stays
+        remaining = S3Service(client=s3_client).list_keys(BUCKET, "uploads/")
+        assert remaining == ["uploads/junk.txt"]
+
+        with open(Config.INGEST_TRACE_PATH) as f:
+            spans = [json.loads(line) for line in f]
+        roots = {s["attributes"]["source"]: s for s in spans if s["parent_id"] is None}
+        trades = roots[f"s3://{BUCKET}/uploads/trades.txt"]
+        assert trades["attributes"]["rows"] == 200
+        assert trades["attributes"]["bytes"] == len("".join(FORMAT2_LINES))
+        assert roots[f"s3://{BUCKET}/uploads/junk.txt"]["status"] == "error"
+        assert {"detect", "parse", "db_write", "commit", "move_to_processed"} <= {
+            s["name"] for s in spans if s["trace_id"] == trades["trace_id"]
+        }
+
+        batch = IngestionBatch.query.one()
+        assert (batch.transport, batch.files, batch.failed_files) == ("s3", 3, 1)
+        assert batch.rows == 210
+        assert IngestionRun.query.filter_by(batch_id=batch.id).count() == 3
@@ -0,0 +1,244 @@
+from collections import defaultdict
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import create_app, db
+from app.config import Config
+from app.models import IngestionCheckpoint, PositionDelta, ShardCommit, Trade
+from app.services import sharding
+from app.services.data_versions import DataVersionService
+from app.services.file_ingestion import FileIngestionService
+from app.services.position_history import PositionHistoryService
+from app.services.trade_archive import TradeArchiveService
+
+HEADERS = {"X-API-Key": "test-api-key"}
+
+# (account, ticker, quantity, price) on 2025-01-15
+TRADES = [
+    (f"ACC{account:03d}", ticker, quantity, price)
+    for account in range(1, 13)
+    for ticker, quantity, price in (
+        ("AAPL", 10 * account, 185.5),
+        ("MSFT", 5, 420.25),
+        ("NVDA", 1 if account % 2 else 200, 505.3),
+    )
+]
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+        SHARD_DATABASE_URLS = [
+            f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(3)
+        ]
+        API_KEY = "test-api-key"
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+        # init_app registers a metadata per bind on the shared db object
+        for key in sharding.shard_keys():
+            db.metadatas.pop(key, None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def ingested(app, tmp_path):
+    path = tmp_path / "trades.csv"
+    path.write_text(
+        "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+        + "".join(
+            f"2025-01-15,{account},{ticker},{quantity},{price},BUY,2025-01-17\n"
+            for account, ticker, quantity, price in TRADES
+        )
+    )
+    assert FileIngestionService.ingest_file(str(path)) == len(TRADES)
+
+
+def _shard_trades(key):
+    with Session(db.engines[key]) as session:
+        return session.query(Trade.account_id).all()
+
+
+def _expected_percentages():
+    values = defaultdict(dict)
+    for account, ticker, quantity, price in TRADES:
+        values[account][ticker] = quantity * price
+    return {
+        (account, ticker): round(value / sum(tickers.values()) * 100, 2)
+        for account, tickers in values.items()
+        for ticker, value in tickers.items()
+    }
+
+
+class TestSharding:
+    def test_rows_routed_by_account_hash(self, app, ingested):
+        assert Trade.query.count() == 0
+
+        total = 0
+        for key in sharding.shard_keys():
+            accounts = {account for (account,) in _shard_trades(key)}
+            assert all(sharding.shard_for(account) == key for account in accounts)
+            total += len(_shard_trades(key))
+        assert total == len(TRADES)
+        assert len({sharding.shard_for(account) for account, *_ in TRADES}) > 1
+
+    def test_date_wide_endpoints_gather_all_shards(self, client, ingested):
+        blotter = client.get("/api/blotter?date=2025-01-15", headers=HEADERS)
+        assert blotter.get_json()["count"] == len(TRADES)
+
+        positions = client.get("/api/positions?date=2025-01-15", headers=HEADERS)
+        assert {
+            (p["account_id"], p["ticker"]): p["percentage"]
+            for p in positions.get_json()["positions"]
+        } == _expected_percentages()
+
+        alarms = client.get("/api/alarms?date=2025-01-15", headers=HEADERS)
+        assert sorted(
+            (a["account_id"], a["ticker"]) for a in alarms.get_json()["alarms"]
+        ) == sorted(
+            key
+            for key, percentage in _expected_percentages().items()
+            if percentage > 20
+        )
+
+    def test_account_queries_hit_one_shard(self, client, ingested):
+        scatter = sharding.scatter
+        with patch.object(sharding, "scatter", side_effect=scatter) as spy:
+            response = client.get(
+                "/api/accounts/ACC007/positions?date=2025-01-15", headers=HEADERS
+            )
+
+        (_, shard_args), _ = spy.call_args
+        assert list(shard_args) == [sharding.shard_for("ACC007")]
+        assert {p["ticker"] for p in response.get_json()["positions"]} == {
+            "AAPL",
+            "MSFT",
+            "NVDA",
+        }
+
+    def test_ticker_exposure_merges_shards(self, client, ingested):
+        response = client.get(
+            "/api/tickers/NVDA/exposure?date=2025-01-15", headers=HEADERS
+        )
+        exposures = response.get_json()["exposures"]
+        assert len(exposures) == 12
+        values = [e["market_value"] for e in exposures]
+        assert values == sorted(values, reverse=True)
+
+    def test_counts_and_position_history_span_shards(self, app, ingested):
+        assert DataVersionService.reconcile() == 0
+        assert DataVersionService.totals()[0] == len(TRADES)
+
+        deltas = sorted(
+            (d.account_id, d.ticker, d.quantity) for d in PositionDelta.query
+        )
+        PositionHistoryService.rebuild()
+        assert (
+            sorted((d.account_id, d.ticker, d.quantity) for d in PositionDelta.query)
+            == deltas
+        )
+
+    def test_failed_ingest_rolls_back_every_shard(self, app, tmp_path):
+        path = tmp_path / "trades.csv"
+        path.write_text(
+            "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+            + "".join(
+                f"2025-01-15,ACC{i:03d},AAPL,1,10,BUY,2025-01-17\n" for i in range(20)
+            )
+        )
+
+        with patch.object(
+            DataVersionService, "bump", side_effect=RuntimeError("boom")
+        ), pytest.raises(RuntimeError):
+            FileIngestionService.ingest_file(str(path))
+
+        assert all(not _shard_trades(key) for key in sharding.shard_keys())
+
+    def _trades_file(self, tmp_path, count):
+        path = tmp_path / "trades.csv"
+        path.write_text(
+            "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+            + "".join(
+                f"2025-01-15,ACC{i:03d},AAPL,{i},10,BUY,2025-01-17\n"
+                for i in range(1, count + 1)
+            )
+        )
+        return path
+
+    def _all_quantities(self):
+        quantities = []
+        for key in sharding.shard_keys():
+            with Session(db.engines[key]) as session:
+                quantities.extend(q for (q,) in session.query(Trade.quantity))
+        return sorted(quantities)
+
+    def test_resume_after_one_shard_failed_to_commit(self, app, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "INGEST_CHECKPOINT_ROWS", 10)
+        monkeypatch.setattr(Config, "INGEST_BATCH_SIZE", 10)
+        path = self._trades_file(tmp_path, 30)
+
+        commit = sharding.ShardWriter.commit
+        calls = []
+
+        def shard1_fails_second_chunk(writer):
+            calls.append(writer)
+            if len(calls) == 2:
+                # shard0 commits the chunk, then shard1 fails
+                writer.sessions["shard1"].commit = MagicMock(
+                    side_effect=RuntimeError("shard1 went away")
+                )
+            commit(writer)
+
+        with patch.object(
+            sharding.ShardWriter, "commit", shard1_fails_second_chunk
+        ), pytest.raises(RuntimeError):
+            FileIngestionService.ingest_file(str(path))
+        assert IngestionCheckpoint.query.one().rows_committed == 10
+
+        assert FileIngestionService.ingest_file(str(path)) == 20
+        assert self._all_quantities() == list(range(1, 31))
+        assert DataVersionService.reconcile() == 0
+        for key in sharding.shard_keys():
+            with Session(db.engines[key]) as session:
+                assert session.query(ShardCommit).count() == 0
+
+    def test_retry_after_primary_failed_to_commit(self, app, tmp_path):
+        path = self._trades_file(tmp_path, 20)
+        commit = sharding.ShardWriter.commit
+
+        def primary_fails(writer):
+            commit(writer)
+            raise RuntimeError("primary went away")
+
+        with patch.object(sharding.ShardWriter, "commit", primary_fails), pytest.raises(
+            RuntimeError
+        ):
+            FileIngestionService.ingest_file(str(path))
+        assert len(self._all_quantities()) == 20
+
+        assert FileIngestionService.ingest_file(str(path)) == 20
+        assert self._all_quantities() == list(range(1, 21))
+
+    def test_archive_drains_every_shard(self, client, ingested, tmp_path):
+        positions = client.get("/api/positions?date=2025-01-15", headers=HEADERS)
+
+        assert TradeArchiveService.archive(
+            date(2025, 2, 1), str(tmp_path / "archive")
+        ) == (1, len(TRADES))
+        assert all(not _shard_trades(key) for key in sharding.shard_keys())
+        assert (
+            client.get("/api/positions?date=2025-01-15", headers=HEADERS).get_json()
+            == positions.get_json()
+        )
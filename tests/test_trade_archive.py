@@ -0,0 +1,160 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models import Trade, TradeArchive
+from app.services.data_versions import DataVersionService
+from app.services.file_ingestion import FileIngestionService
+from app.services.position_history import PositionHistoryService
+from app.services.trade_archive import TradeArchiveService, _lock_trades
+
+HEADERS = {"X-API-Key": "test-api-key"}
+
+CSV_HEADER = "TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate\n"
+
+ROWS = [
+    "2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17\n",
+    "2025-01-15,ACC001,MSFT,10,420.25,BUY,2025-01-17\n",
+    "2025-01-15,ACC002,NVDA,40,505.30,BUY,2025-01-17\n",
+    "2025-01-15,ACC002,AAPL,5,185.50,SELL,2025-01-17\n",
+    "2025-02-03,ACC001,AAPL,7,190.00,BUY,2025-02-05\n",
+]
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    API_KEY = "test-api-key"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _ingest(tmp_path, rows, name="trades.csv"):
+    path = tmp_path / name
+    path.write_text(CSV_HEADER + "".join(rows))
+    return FileIngestionService.ingest_file(str(path))
+
+
+def _snapshot(client, day="2025-01-15"):
+    def get(path):
+        return client.get(f"{path}?date={day}", headers=HEADERS).get_json()
+
+    return {
+        "blotter": sorted(
+            (r["account_id"], r["ticker"], r["quantity"], r["price"])
+            for r in get("/api/blotter")["records"]
+        ),
+        "positions": sorted(
+            (p["account_id"], p["ticker"], p["percentage"])
+            for p in get("/api/positions")["positions"]
+        ),
+        "alarms": sorted(
+            (a["account_id"], a["ticker"]) for a in get("/api/alarms")["alarms"]
+        ),
+    }
+
+
+class TestTradeArchive:
+    def test_archived_dates_read_the_same(self, app, client, tmp_path):
+        _ingest(tmp_path, ROWS)
+        before = _snapshot(client)
+
+        archive = tmp_path / "archive"
+        dates, rows = TradeArchiveService.archive(date(2025, 2, 1), str(archive))
+
+        assert (dates, rows) == (1, 4)
+        assert Trade.query.filter_by(trade_date=date(2025, 1, 15)).count() == 0
+        assert Trade.query.count() == 1
+        record = db.session.get(TradeArchive, date(2025, 1, 15))
+        assert record.location.startswith(f"{archive}/trade_date=2025-01-15/")
+        assert record.row_count == 4
+
+        assert _snapshot(client) == before
+        account = client.get(
+            "/api/accounts/ACC002/positions?date=2025-01-15", headers=HEADERS
+        ).get_json()
+        assert {p["ticker"] for p in account["positions"]} == {"NVDA", "AAPL"}
+
+    def test_late_rows_read_then_folded_in(self, app, client, tmp_path):
+        _ingest(tmp_path, ROWS)
+        TradeArchiveService.archive(date(2025, 2, 1), str(tmp_path / "archive"))
+        first = db.session.get(TradeArchive, date(2025, 1, 15)).location
+
+        _ingest(
+            tmp_path, ["2025-01-15,ACC003,TSLA,3,250.00,BUY,2025-01-17\n"], "late.csv"
+        )
+        late = _snapshot(client)
+        assert ("ACC003", "TSLA", 100.0) in late["positions"]
+        assert len(late["blotter"]) == 5
+
+        assert TradeArchiveService.archive(
+            date(2025, 2, 1), str(tmp_path / "archive")
+        ) == (1, 1)
+        record = db.session.get(TradeArchive, date(2025, 1, 15))
+        assert record.row_count == 5
+        assert record.location != first
+        assert not (tmp_path / first).exists()
+        assert _snapshot(client) == late
+
+    def test_counts_include_archived_rows(self, app, tmp_path):
+        _ingest(tmp_path, ROWS)
+        TradeArchiveService.archive(date(2025, 2, 1), str(tmp_path / "archive"))
+
+        assert DataVersionService.reconcile() == 0
+        assert DataVersionService.totals()[0] == len(ROWS)
+
+    def test_rebuild_keeps_archived_positions(self, app, client, tmp_path):
+        _ingest(tmp_path, ROWS)
+        TradeArchiveService.archive(date(2025, 2, 1), str(tmp_path / "archive"))
+        _ingest(
+            tmp_path, ["2025-01-15,ACC001,AAPL,3,185.50,BUY,2025-01-17\n"], "late.csv"
+        )
+
+        def history():
+            return client.get(
+                "/api/positions/history?account_id=ACC001"
+                "&start_date=2025-02-01&end_date=2025-02-28&ticker=AAPL",
+                headers=HEADERS,
+            ).get_json()["positions"]
+
+        before = history()
+        assert before[0]["opening"]["quantity"] == 103
+
+        PositionHistoryService.rebuild()
+        assert history() == before
+
+    def test_postgresql_locks_trades_against_inserts(self):
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = "postgresql"
+        _lock_trades(session)
+
+        statements = [str(call.args[0]) for call in session.execute.call_args_list]
+        assert statements[-1] == "LOCK TABLE trades IN SHARE MODE"
+
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = "sqlite"
+        _lock_trades(session)
+        session.execute.assert_not_called()
+
+    def test_unarchived_date_reads_hot_table(self, app):
+        assert TradeArchiveService.read_trades(date(2025, 1, 15)) is None
+
+    def test_location_required(self, app, monkeypatch):
+        monkeypatch.setattr(Config, "ARCHIVE_LOCATION", "")
+        with pytest.raises(ValueError):
+            TradeArchiveService.archive(date(2025, 2, 1))